@@ -0,0 +1,334 @@
+"""
+Toronto Real Estate Benchmark Suite
+
+Measures the throughput and latency of the main stages of the project on the bundled data, fully offline, so
+performance regressions show up as numbers instead of impressions.
+
+Benchmarks:
+- cleaning: rows/s of `clean_chunk` (numerical and letter encodings) and of `clean_file` end to end (CSV in and out)
+- subway distance: listings/s of `add_subway_distance` with the station index and with the line index
+- training: fit time of every model of `train_and_evaluate_models` (one worker, so fit times are not disturbed by
+  other fits)
+- inference: p50/p99 latency of `real_estate_model.pkl` for one row and for a batch of rows, through scikit-learn
+  and through the flattened model (see models/flat_ensemble.py), and of the web app's similar listings lookup
+- startup: cold-start time of the entry points, each imported in a fresh interpreter: import time of the prediction
+  service, the web app's model modules and the model comparison module, and the time from interpreter start to the
+  first prediction of the memory-mapped model artifact. The heavy libraries each entry point loaded are printed, so
+  an import that pulls in an unused ML framework is easy to spot.
+
+The bundled data has only a few thousand listings, so the cleaning and distance inputs are repeated `--scale` times to
+get stable timings. Every timed section is repeated `--repeat` times and the median is kept.
+
+Results are written as JSON (`data/benchmarks/results.json` by default). With `--baseline FILE`, they are compared
+with an earlier run and any metric more than `--tolerance` worse than the baseline is reported as a regression (exit
+code 1). `--save-baseline` stores the run as the new baseline.
+
+Usage:
+    python -m src.benchmark [--scale N] [--repeat N] [--skip GROUP ...] [--baseline FILE] [--save-baseline]
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from src.data_processing.cleaning_engine import clean_chunk, clean_file, read_raw_chunks
+from src.data_processing.storage import load_dataset
+from src.data_processing.similar_listings_index import SCALES, SimilarListingsIndex
+from src.data_processing.subway_distance_data_cleaning import add_subway_distance, load_subway_stations
+from src.models.flat_ensemble import FlatEnsemble
+from src.models.multiple_models import features, train_and_evaluate_models
+
+# Get the absolute path of the current script (app.py) and define the correct model path
+base_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(base_dir, ".."))
+raw_file_path = os.path.join(project_root, "data", "real-estate-data.csv")
+numerical_file_path = os.path.join(project_root, "data", "cleaned_real_estate_data_numerical.csv")
+subway_file_path = os.path.join(project_root, "data", "DMTI2012_Subway.shp")
+model_path = os.path.join(base_dir, "models", "real_estate_model.pkl")
+results_path = os.path.join(project_root, "data", "benchmarks", "results.json")
+baseline_path = os.path.join(project_root, "data", "benchmarks", "baseline.json")
+
+BENCHMARK_GROUPS = ["cleaning", "subway_distance", "training", "inference", "startup"]
+
+# Number of timed calls for the latency percentiles
+SINGLE_ROW_CALLS = 1000
+BATCH_CALLS = 100
+BATCH_SIZE = 1000
+
+# Entry points timed by the startup benchmark: name -> code run in a fresh interpreter
+STARTUP_ENTRY_POINTS = {
+    "prediction_service_import": "import src.prediction_service",
+    "web_app_model_import": "import src.models.model_artifact, src.models.partition_router, src.models.prediction_grid",
+    "multiple_models_import": "import src.models.multiple_models",
+    "first_prediction": "from src.models.model_artifact import ModelArtifact\n"
+                        "model = ModelArtifact.load()\n"
+                        "model.predict({feature: feature_range['min'] for feature, feature_range in "
+                        "zip(model.feature_names, model.features)})",
+}
+
+# Libraries reported when an entry point loads them
+HEAVY_MODULES = ["pandas", "scipy", "sklearn", "joblib", "xgboost", "lightgbm", "streamlit"]
+
+
+def median_time(function: Callable[[], object], repeat: int, setup: Optional[Callable[[], object]] = None) -> float:
+    """
+    Times a function several times and returns the median duration.
+
+    :param function: function to time (called with the result of setup, if any)
+    :param repeat: number of timed calls
+    :param setup: untimed function preparing the argument of each call
+    :return: median duration (s)
+    """
+    durations = []
+    for _ in range(repeat):
+        argument = setup() if setup is not None else None
+        start = time.perf_counter()
+        function(argument) if setup is not None else function()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def latency_percentiles(function: Callable[[], object], calls: int) -> dict:
+    """
+    Times many calls of a function.
+
+    :return: p50 and p99 latency (ms)
+    """
+    function()  # warm-up
+    durations = np.empty(calls)
+    for i in range(calls):
+        start = time.perf_counter()
+        function()
+        durations[i] = time.perf_counter() - start
+    p50, p99 = np.percentile(durations * 1000.0, [50, 99])
+    return {"p50": p50, "p99": p99}
+
+
+def metric(value: float, unit: str, higher_is_better: bool) -> dict:
+    return {"value": float(value), "unit": unit, "higher_is_better": higher_is_better}
+
+
+def benchmark_cleaning(scale: int, repeat: int) -> dict:
+    """
+    Measures the cleaning throughput on the raw data repeated `scale` times.
+    """
+    with read_raw_chunks(raw_file_path, chunksize=10 ** 9) as reader:
+        raw = pd.concat([next(reader)] * scale, ignore_index=True)
+
+    results = {}
+    for numerical in (True, False):
+        duration = median_time(lambda chunk: clean_chunk(chunk, numerical), repeat, setup=raw.copy)
+        encoding = "numerical" if numerical else "letters"
+        results[f"cleaning.clean_chunk_{encoding}.rows_per_s"] = metric(len(raw) / duration, "rows/s", True)
+
+    # End to end, including CSV parsing and writing
+    temp_dir = tempfile.mkdtemp()
+    try:
+        raw_path = os.path.join(temp_dir, "raw.csv")
+        pd.read_csv(raw_file_path, dtype=str, keep_default_na=False).pipe(
+            lambda df: pd.concat([df] * scale, ignore_index=True)).to_csv(raw_path, index=False)
+        output_path = os.path.join(temp_dir, "cleaned.csv")
+        duration = median_time(lambda: clean_file(raw_path, output_path), repeat)
+        results["cleaning.clean_file.rows_per_s"] = metric(len(raw) / duration, "rows/s", True)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return results
+
+
+def benchmark_subway_distance(scale: int, repeat: int) -> dict:
+    """
+    Measures the subway distance throughput on the cleaned listings repeated `scale` times.
+    """
+    listings = load_dataset(numerical_file_path, columns=["latitude", "longitude"])
+    listings = pd.concat([listings] * scale, ignore_index=True)
+
+    results = {}
+    for mode in ("station", "line"):
+        index = load_subway_stations(subway_file_path, mode)
+        duration = median_time(lambda df: add_subway_distance(df, index), repeat, setup=listings.copy)
+        results[f"subway_distance.{mode}.listings_per_s"] = metric(len(listings) / duration, "listings/s", True)
+    return results
+
+
+def benchmark_training() -> dict:
+    """
+    Measures the fit time of every compared model (single worker).
+    """
+    scores = train_and_evaluate_models(numerical_file_path, max_workers=1)
+    return {f"training.{name.lower().replace(' ', '_')}.fit_s": metric(row["Fit Time (s)"], "s", False)
+            for name, row in scores.iterrows()}
+
+
+def benchmark_inference() -> dict:
+    """
+    Measures single-row and batch prediction latency of the deployed model.
+    """
+    model = joblib.load(model_path)
+    flat_model = FlatEnsemble.from_model(model)
+    X = load_dataset(numerical_file_path, columns=features)[features].astype("float64")
+    batch = pd.concat([X] * int(np.ceil(BATCH_SIZE / len(X))), ignore_index=True).iloc[:BATCH_SIZE]
+    row, row_values, batch_values = X.iloc[:1], X.iloc[0].tolist(), batch.to_numpy()
+    similar_listings = SimilarListingsIndex.from_dataset(numerical_file_path)
+    similar_values = [row_values[features.index(column)] for column in SCALES]
+
+    timings = {
+        "sklearn.single_row": latency_percentiles(lambda: model.predict(row), SINGLE_ROW_CALLS),
+        "sklearn.batch": latency_percentiles(lambda: model.predict(batch), BATCH_CALLS),
+        "flat.single_row": latency_percentiles(lambda: flat_model.predict_one(row_values), SINGLE_ROW_CALLS),
+        "flat.batch": latency_percentiles(lambda: flat_model.predict(batch_values), BATCH_CALLS),
+        "similar_listings.top5": latency_percentiles(lambda: similar_listings.query(*similar_values, k=5),
+                                                     SINGLE_ROW_CALLS),
+    }
+    return {f"inference.{name}.{percentile}_ms": metric(value, "ms", False)
+            for name, percentiles in timings.items() for percentile, value in percentiles.items()}
+
+
+def time_cold_start(code: str) -> tuple:
+    """
+    Runs code in a fresh Python interpreter and times it from interpreter start.
+
+    :param code: Python code run from the project root
+    :return: (duration of the whole process (s), duration of the code (s), heavy libraries loaded by the code)
+    """
+    probe = (f"import time\nstart = time.perf_counter()\n{code}\nduration = time.perf_counter() - start\n"
+             f"import json, sys\nprint(json.dumps([duration, [name for name in {HEAVY_MODULES!r} "
+             f"if name in sys.modules]]))")
+    # The whole process (interpreter start-up included) is timed from here, the code from inside the child
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", probe], cwd=project_root, capture_output=True, text=True,
+                            check=True).stdout
+    total = time.perf_counter() - start
+    duration, modules = json.loads(output.strip().splitlines()[-1])
+    return total, duration, modules
+
+
+def benchmark_startup(repeat: int) -> dict:
+    """
+    Measures the cold-start time of the entry points, each in fresh interpreters.
+    """
+    results = {}
+    for name, code in STARTUP_ENTRY_POINTS.items():
+        runs = [time_cold_start(code) for _ in range(repeat)]
+        print(f"[benchmark] startup {name}: loads {', '.join(runs[0][2]) or 'no heavy libraries'}")
+        results[f"startup.{name}.code_s"] = metric(statistics.median(run[1] for run in runs), "s", False)
+        results[f"startup.{name}.process_s"] = metric(statistics.median(run[0] for run in runs), "s", False)
+    return results
+
+
+def run_benchmarks(groups: Optional[list] = None, scale: int = 20, repeat: int = 5) -> dict:
+    """
+    Runs the benchmark groups.
+
+    :param groups: benchmark groups to run (see BENCHMARK_GROUPS); all if None
+    :param scale: number of times the bundled listings are repeated for the cleaning and distance benchmarks
+    :param repeat: number of timed runs per throughput measurement (median kept)
+    :return: results with environment information and metrics
+    """
+    groups = groups or BENCHMARK_GROUPS
+    metrics = {}
+    for group in groups:
+        print(f"[benchmark] {group}")
+        if group == "cleaning":
+            metrics.update(benchmark_cleaning(scale, repeat))
+        elif group == "subway_distance":
+            metrics.update(benchmark_subway_distance(scale, repeat))
+        elif group == "training":
+            metrics.update(benchmark_training())
+        elif group == "inference":
+            metrics.update(benchmark_inference())
+        elif group == "startup":
+            metrics.update(benchmark_startup(repeat))
+        else:
+            raise ValueError(f"Unknown benchmark group: {group!r}")
+
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "processor": platform.processor() or platform.machine(), "cpu_count": os.cpu_count()},
+        "settings": {"groups": groups, "scale": scale, "repeat": repeat},
+        "metrics": metrics,
+    }
+
+
+def compare_with_baseline(results: dict, baseline: dict, tolerance: float = 0.2) -> list:
+    """
+    Compares benchmark results with a baseline run.
+
+    :param results: current results (see run_benchmarks)
+    :param baseline: earlier results
+    :param tolerance: relative slowdown tolerated before a metric counts as a regression (0.2 = 20%)
+    :return: list of (metric name, baseline value, current value, relative change, is regression); positive changes
+             are improvements
+    """
+    comparison = []
+    for name, current in results["metrics"].items():
+        previous = baseline.get("metrics", {}).get(name)
+        if previous is None or previous["value"] == 0:
+            continue
+        change = (current["value"] - previous["value"]) / previous["value"]
+        if not current["higher_is_better"]:
+            change = -change
+        comparison.append((name, previous["value"], current["value"], change, change < -tolerance))
+    return comparison
+
+
+def main(groups: Optional[list] = None, scale: int = 20, repeat: int = 5, output_path: str = results_path,
+         baseline: Optional[str] = None, save_baseline: bool = False, tolerance: float = 0.2) -> bool:
+    results = run_benchmarks(groups, scale, repeat)
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Benchmark results saved at: {output_path}")
+
+    regressions = []
+    if baseline is not None:
+        with open(baseline, encoding="utf-8") as f:
+            comparison = compare_with_baseline(results, json.load(f), tolerance)
+        for name, previous, current, change, regression in comparison:
+            flag = "REGRESSION" if regression else ""
+            print(f"{name:<55} {previous:>14,.3f} -> {current:>14,.3f} {change:+8.1%} {flag}")
+        regressions = [entry[0] for entry in comparison if entry[4]]
+        if regressions:
+            print(f"{len(regressions)} metric(s) regressed by more than {tolerance:.0%}.")
+    else:
+        for name, value in results["metrics"].items():
+            print(f"{name:<55} {value['value']:>14,.3f} {value['unit']}")
+
+    if save_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        shutil.copyfile(output_path, baseline_path)
+        print(f"Baseline saved at: {baseline_path}")
+    return not regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Toronto real estate project on the bundled data.")
+    parser.add_argument("--skip", nargs="*", default=[], choices=BENCHMARK_GROUPS, help="benchmark groups to skip")
+    parser.add_argument("--scale", type=int, default=20,
+                        help="times the bundled listings are repeated for the cleaning and distance benchmarks")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per throughput measurement (median kept)")
+    parser.add_argument("--output", default=results_path, help="JSON file the results are written to")
+    parser.add_argument("--baseline", nargs="?", const=baseline_path, default=None,
+                        help="compare with a baseline results file (the saved baseline if no file is given)")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="relative slowdown tolerated before a metric counts as a regression")
+    args = parser.parse_args()
+
+    selected = [group for group in BENCHMARK_GROUPS if group not in args.skip]
+    ok = main(selected, args.scale, args.repeat, args.output, args.baseline, args.save_baseline, args.tolerance)
+    if not ok:
+        raise SystemExit(1)
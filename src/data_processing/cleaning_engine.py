@@ -0,0 +1,190 @@
+"""
+Toronto Real Estate Data Cleaning Engine (Vectorized & Chunked)
+
+This module holds the cleaning transforms shared by the categorical and fully numerical cleaning scripts. Every
+transform works on whole columns at once (no row-wise `apply`), and the raw file is read in fixed-size chunks so memory
+use stays flat regardless of how many listings the feed contains.
+
+Steps (per chunk):
+1. Read a chunk of the raw CSV with a fixed schema so every chunk gets the same dtypes.
+2. Drop rows with any missing value.
+3. Extract the ward number, convert the size range to a size group and clean the property orientation.
+4. Encode the den and parking flags.
+5. Append the cleaned chunk to the output CSV (and, optionally, to the typed columnar dataset).
+
+Column Headers:
+"id", "ward_num", "num_beds", "num_baths", "has_den", "size_group", "has_parking",
+"property_orientation", "days_on_market", "building_age", "monthly_maintenance_fee",
+"listing_price", "latitude", "longitude"
+"""
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.data_processing.storage import write_dataset
+from src.instrumentation import add_rows
+
+# Cleaned column headers, in the order of the raw file columns
+COLUMN_HEADERS = [
+    "id", "ward_num", "num_beds", "num_baths", "has_den", "size_group", "has_parking",
+    "property_orientation", "days_on_market", "building_age", "monthly_maintenance_fee",
+    "listing_price", "latitude", "longitude"
+]
+
+# Fixed read schema so that each chunk is parsed identically (nullable ints survive missing values until dropna)
+RAW_COLUMN_DTYPES = {
+    "id": "Int64",
+    "ward_num": "object",
+    "num_beds": "float64",
+    "num_baths": "Int64",
+    "has_den": "object",
+    "size_group": "object",
+    "has_parking": "object",
+    "property_orientation": "object",
+    "days_on_market": "float64",
+    "building_age": "Int64",
+    "monthly_maintenance_fee": "float64",
+    "listing_price": "float64",
+    "latitude": "float64",
+    "longitude": "float64",
+}
+
+# Number of raw rows processed at a time
+DEFAULT_CHUNKSIZE = 100_000
+
+# Numerical property orientation mapping
+ORIENTATION_CODES = {"N": 0, "S": 1, "E": 2, "W": 3}
+
+
+def size_range_to_group(sizes: pd.Series) -> pd.Series:
+    """
+    Converts property size ranges (e.g. '500-999 sqft') to numerical size groups.
+
+    Size groups:
+    0. 0-499 sqft
+    1. 500-999 sqft
+    2. 1000-1499 sqft
+    3. 1500-1999 sqft
+    4. 2000-2499 sqft
+    5. 2500-2999 sqft
+    6. 3000-3499 sqft
+    7. 3500-3999 sqft
+    8. 4000+ sqft
+
+    :param sizes: column of size range strings (no missing values)
+    :return: column of integer size groups
+    """
+    lower_bounds = sizes.str.extract(r"^\s*(\d+)", expand=False).astype("int64")
+    groups = lower_bounds // 500
+    groups[sizes.str.contains("+", regex=False)] = 8  # indicating val of 4000+
+    return groups
+
+
+def orientation_to_code(orientations: pd.Series) -> pd.Series:
+    """
+    Converts property orientation into numerical values.
+    Mapping: {'N': 0, 'S': 1, 'E': 2, 'W': 3}; any other value becomes NaN.
+
+    :param orientations: column of dirty property orientation strings
+    :return: column of float orientation codes
+    """
+    return orientations.str.upper().map(ORIENTATION_CODES).astype("float64")
+
+
+def orientation_to_letter(orientations: pd.Series) -> pd.Series:
+    """
+    Cleans property orientation data to 'N', 'S', 'W', 'E'.
+    The first of 'n', 's', 'w', 'e' (in that priority) found in the lowercased value wins.
+
+    :param orientations: column of dirty property orientation strings
+    :return: column of cleaned orientation letters; None where no direction is found
+    """
+    lowered = orientations.str.lower()
+    conditions = [lowered.str.contains(letter, regex=False) for letter in ("n", "s", "w", "e")]
+    cleaned = np.select(conditions, ["N", "S", "W", "E"], default=None)
+    return pd.Series(cleaned, index=orientations.index, dtype="object")
+
+
+def clean_chunk(df: pd.DataFrame, numerical: bool = True) -> pd.DataFrame:
+    """
+    Cleans one chunk of raw listings. The chunk is modified in place, column by column.
+
+    :param df: raw listings using the cleaned column headers
+    :param numerical: encode categorical columns as numbers (True) or as letters/booleans (False)
+    :return: cleaned listings
+    """
+    df.dropna(inplace=True)  # remove all rows with NA
+
+    for column in ("id", "num_baths", "building_age"):
+        df[column] = df[column].astype("int64")
+
+    df["ward_num"] = df["ward_num"].str.extract(r"(\d+)", expand=False).astype(int)
+    df["size_group"] = size_range_to_group(df["size_group"])
+
+    if numerical:
+        df["property_orientation"] = orientation_to_code(df["property_orientation"])
+        # Convert boolean features to integer (0/1)
+        df["has_den"] = df["has_den"].str.strip().str.lower().map({"yes": 1, "no": 0})
+        df["has_parking"] = df["has_parking"].str.strip().str.lower().map({"yes": 1, "n": 0})
+    else:
+        df["property_orientation"] = orientation_to_letter(df["property_orientation"])
+        df["has_den"] = df["has_den"].map({"YES": True, "No": False})
+        df["has_parking"] = df["has_parking"].map({"Yes": True, "N": False})  # Assuming 'N' means No
+
+    return df
+
+
+def read_raw_chunks(file_path: str, chunksize: int = DEFAULT_CHUNKSIZE) -> pd.io.parsers.TextFileReader:
+    """
+    Reads the raw real estate CSV in chunks, renaming the columns to the cleaned headers.
+
+    :param file_path: path to the raw real estate CSV
+    :param chunksize: number of rows per chunk
+    :return: chunk reader (iterable and usable as a context manager)
+    """
+    return pd.read_csv(file_path, header=0, names=COLUMN_HEADERS, dtype=RAW_COLUMN_DTYPES,
+                       chunksize=chunksize)
+
+
+def iter_clean_chunks(file_path: str, numerical: bool = True,
+                      chunksize: int = DEFAULT_CHUNKSIZE) -> Iterator[pd.DataFrame]:
+    """
+    Yields cleaned chunks of the raw real estate CSV.
+
+    :param file_path: path to the raw real estate CSV
+    :param numerical: encode categorical columns as numbers (True) or as letters/booleans (False)
+    :param chunksize: number of raw rows per chunk
+    :return: iterator over cleaned chunks
+    """
+    with read_raw_chunks(file_path, chunksize) as reader:
+        for chunk in reader:
+            yield clean_chunk(chunk, numerical)
+
+
+def clean_file(input_path: str, output_path: str, numerical: bool = True,
+               chunksize: int = DEFAULT_CHUNKSIZE, dataset_path: Optional[str] = None) -> int:
+    """
+    Cleans the raw real estate CSV chunk by chunk and writes the result to a CSV file.
+
+    :param input_path: path to the raw real estate CSV
+    :param output_path: path of the cleaned CSV to write
+    :param numerical: encode categorical columns as numbers (True) or as letters/booleans (False)
+    :param chunksize: number of raw rows per chunk
+    :param dataset_path: if given, also write the cleaned rows to this typed columnar dataset (see storage.py)
+    :return: number of cleaned rows written
+    """
+    rows_written = 0
+    first_chunk = True
+    for cleaned in iter_clean_chunks(input_path, numerical, chunksize):
+        cleaned.to_csv(output_path, mode="w" if first_chunk else "a", header=first_chunk, index=False)
+        if dataset_path is not None:
+            write_dataset(cleaned, dataset_path, append=not first_chunk)
+        rows_written += len(cleaned)
+        add_rows(len(cleaned))
+        first_chunk = False
+
+    if first_chunk:  # empty input still produces a file with headers
+        pd.DataFrame(columns=COLUMN_HEADERS).to_csv(output_path, index=False)
+
+    return rows_written
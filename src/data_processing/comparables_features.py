@@ -0,0 +1,171 @@
+"""
+Creation of Real Estate Data With Nearest-Comparables Features
+
+This script adds location features computed from each listing's nearest neighbours (its "comparables") to the
+cleaned real estate data, since prices vary mostly at a fine spatial scale.
+
+Features computed per listing, over its k nearest other listings (the listing itself, and any earlier copy of it with
+the same id appended by incremental ingest, is left out, so its own price never leaks into its features):
+- `comparables_median_price`: median listing price of the comparables
+- `comparables_median_price_per_sqft`: median price per square foot of the comparables, taking the midpoint of each
+  comparable's size group as its size
+- `comparables_radius`: distance to the k-th comparable (m), i.e. how far the comparables had to be looked for
+
+Steps:
+1. Project the listing coordinates to the metric CRS of the subway indexes (NAD83(CSRS) / MTM zone 10) and build a
+   KD-tree over them once.
+2. Query the k + m nearest listings of every listing (m: most rows sharing one id) in fixed-size batches, with the
+   tree queries of each batch running in parallel over all cores, and drop the neighbours with the listing's own id.
+3. Aggregate the prices of the remaining k neighbours and save the dataset (CSV export and typed columnar dataset).
+
+Usage:
+    python -m src.data_processing.comparables_features [--k 10] [--workers N]
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from src.data_processing.storage import dataset_dir, write_dataset
+from src.data_processing.subway_station_index import project_to_metric
+
+# Get the absolute path of the current script (app.py) and define the correct model path
+base_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(base_dir, "..", ".."))
+real_estate_file_path = os.path.join(project_root, "data", "cleaned_real_estate_data_numerical.csv")
+updated_file_path = os.path.join(project_root, "data", "real_estate_data_with_comparables.csv")
+
+# Number of comparables per listing
+DEFAULT_K = 10
+
+# Number of listings queried at a time
+DEFAULT_BATCH_SIZE = 250_000
+
+# Width (sqft) of the size groups (see cleaning_engine.size_range_to_group)
+SIZE_GROUP_WIDTH = 500
+
+
+class ComparablesIndex:
+    """
+    KD-tree over listing positions in a metric projection, with the listing prices.
+
+    :param latitude: listing latitudes (degrees)
+    :param longitude: listing longitudes (degrees)
+    :param prices: listing prices
+    :param size_groups: listing size groups
+    :param ids: listing ids (rows sharing an id are copies of one listing); every row is its own listing if None
+    """
+
+    def __init__(self, latitude, longitude, prices, size_groups, ids=None):
+        self.points = project_to_metric(longitude, latitude)
+        self.ids = np.asarray(ids) if ids is not None else np.arange(len(self.points))
+        self.prices = np.asarray(prices, dtype=np.float64)
+        # Size of each listing at the middle of its size group's range
+        sqft = (np.asarray(size_groups, dtype=np.float64) + 0.5) * SIZE_GROUP_WIDTH
+        self.prices_per_sqft = self.prices / sqft
+        self.tree = cKDTree(self.points)
+
+    @classmethod
+    def from_listings(cls, listings: pd.DataFrame) -> "ComparablesIndex":
+        """
+        Builds the index of listings with latitude, longitude, listing_price and size_group (and id) columns.
+        """
+        return cls(listings["latitude"], listings["longitude"], listings["listing_price"], listings["size_group"],
+                   listings["id"] if "id" in listings.columns else None)
+
+    def _aggregate(self, distances: np.ndarray, neighbours: np.ndarray) -> dict:
+        return {"comparables_median_price": np.median(self.prices[neighbours], axis=1),
+                "comparables_median_price_per_sqft": np.median(self.prices_per_sqft[neighbours], axis=1),
+                "comparables_radius": distances[:, -1]}
+
+    def compute_features(self, k: int = DEFAULT_K, workers: int = -1,
+                         batch_size: int = DEFAULT_BATCH_SIZE) -> pd.DataFrame:
+        """
+        Computes the comparables features of every indexed listing, leaving the listing itself (every row with its id)
+        out.
+
+        :param k: number of comparables per listing
+        :param workers: number of parallel workers for the tree queries (-1 for all cores)
+        :param batch_size: number of listings queried at a time
+        :return: DataFrame of features, in the order of the indexed listings
+        """
+        n_listings = len(self.points)
+        # Most rows of one listing: that many extra neighbours are queried, so k others remain after dropping them
+        copies = int(np.unique(self.ids, return_counts=True)[1].max()) if n_listings else 1
+        k = min(k, n_listings - copies)
+        features = {name: np.empty(n_listings) for name in
+                    ("comparables_median_price", "comparables_median_price_per_sqft", "comparables_radius")}
+
+        for start in range(0, n_listings, batch_size):
+            stop = min(start + batch_size, n_listings)
+            distances, neighbours = self.tree.query(self.points[start:stop], k=k + copies, workers=workers)
+            distances, neighbours = distances.reshape(stop - start, -1), neighbours.reshape(stop - start, -1)
+
+            # Leave the rows of each listing out of its neighbours and keep the k nearest others (when other listings
+            # share its position, the tree may not return all of its rows, and the farthest extra neighbours go)
+            is_same = self.ids[neighbours] == self.ids[start:stop, None]
+            nearest_others = np.argsort(is_same, axis=1, kind="stable")[:, :k]
+            distances = np.take_along_axis(distances, nearest_others, axis=1)
+            neighbours = np.take_along_axis(neighbours, nearest_others, axis=1)
+
+            for name, values in self._aggregate(distances, neighbours).items():
+                features[name][start:stop] = values
+        return pd.DataFrame(features)
+
+    def query(self, latitude, longitude, k: int = DEFAULT_K, workers: int = -1) -> pd.DataFrame:
+        """
+        Computes the comparables features of new locations (all indexed listings are candidates).
+
+        :param latitude: array of latitudes (degrees)
+        :param longitude: array of longitudes (degrees)
+        :param k: number of comparables
+        :param workers: number of parallel workers for the tree query (-1 for all cores)
+        :return: DataFrame of features, one row per location
+        """
+        points = project_to_metric(np.atleast_1d(longitude), np.atleast_1d(latitude))
+        distances, neighbours = self.tree.query(points, k=max(k, 2), workers=workers)
+        return pd.DataFrame(self._aggregate(distances[:, :k], neighbours[:, :k]))
+
+
+def add_comparables_features(real_estate_data: pd.DataFrame, k: int = DEFAULT_K, workers: int = -1,
+                             batch_size: int = DEFAULT_BATCH_SIZE) -> pd.DataFrame:
+    """
+    Adds the nearest-comparables features to each listing (listings without coordinates get missing values).
+
+    :param real_estate_data: cleaned real estate listings with latitude, longitude, listing_price and size_group
+    :param k: number of comparables per listing
+    :param workers: number of parallel workers for the tree queries (-1 for all cores)
+    :param batch_size: number of listings queried at a time
+    :return: the listings with the added columns
+    """
+    located = real_estate_data[["latitude", "longitude"]].notna().all(axis=1).to_numpy()
+    index = ComparablesIndex.from_listings(real_estate_data[located])
+    features = index.compute_features(k, workers, batch_size)
+    for column in features.columns:
+        values = np.full(len(real_estate_data), np.nan)
+        values[located] = features[column].to_numpy()
+        real_estate_data[column] = values
+    return real_estate_data
+
+
+def main(real_estate_file_path: str = real_estate_file_path, updated_file_path: str = updated_file_path,
+         k: int = DEFAULT_K, workers: int = -1) -> None:
+    # Load the cleaned real estate dataset (the CSV export, with full-precision values)
+    real_estate_data = pd.read_csv(real_estate_file_path)
+
+    real_estate_data = add_comparables_features(real_estate_data, k, workers)
+
+    # Save the updated dataset with the comparables features
+    real_estate_data.to_csv(updated_file_path, index=False)
+    write_dataset(real_estate_data, dataset_dir(updated_file_path))
+    print(f"Updated dataset saved at: {updated_file_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add nearest-comparables features to the cleaned real estate data.")
+    parser.add_argument("--k", type=int, default=DEFAULT_K, help="number of comparables per listing")
+    parser.add_argument("--workers", type=int, default=-1, help="parallel workers for the tree queries (-1: all)")
+    args = parser.parse_args()
+    main(k=args.k, workers=args.workers)
@@ -0,0 +1,322 @@
+"""
+Incremental Ingest of New Real Estate Listings
+
+This script appends only new or changed listings from the raw real estate CSV to the cleaned datasets and to the
+dataset with subway distances, instead of reprocessing the full history on every run.
+
+A watermark is kept in `data/ingest_state/`:
+- `watermark.json` stores the byte offset of the raw file that has already been read, plus fingerprints of the raw
+  header and of the bytes just before the offset, so a rewritten (instead of appended) raw file is detected.
+- `processed_ids.npz` stores every processed listing id with a hash of its (latest) raw row, so a listing that
+  reappears in a later run with different values is treated as changed, and one that reappears unchanged is skipped.
+
+Steps:
+1. Load the watermark (on the first run, when no ingest state was saved yet, the outputs are rebuilt from the whole
+   raw file) and check that the raw file was only appended to since the last run (otherwise rescan it).
+2. Read the raw bytes after the watermark in blocks of complete lines.
+3. Drop rows without an id (as the full cleaning does), and keep only rows whose id is new or whose raw row hash
+   differs from the one processed by a previous run. Rows repeating an id within the new data are all kept, as in a
+   full clean.
+4. Clean them with the cleaning engine and append them to the cleaned CSVs and the subway distance CSV, and as new
+   parts of the typed columnar datasets (see storage.py).
+5. Save the new watermark.
+
+The byte watermark assumes the feed is append-only; use `--rescan` if earlier rows can be edited in place.
+Changed listings are appended as new rows; `compact_output` keeps only the latest row per id when a full rewrite of an
+output is wanted.
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+from src.data_processing.cleaning_engine import COLUMN_HEADERS, RAW_COLUMN_DTYPES, clean_chunk
+from src.data_processing.storage import dataset_dir, remove_dataset, write_dataset
+from src.data_processing.subway_distance_data_cleaning import add_subway_distance, load_subway_stations
+
+# Get the absolute path of the current script (app.py) and define the correct model path
+base_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(base_dir, "..", ".."))
+raw_file_path = os.path.join(project_root, "data", "real-estate-data.csv")
+cleaned_file_path = os.path.join(project_root, "data", "cleaned_real_estate_data.csv")
+numerical_file_path = os.path.join(project_root, "data", "cleaned_real_estate_data_numerical.csv")
+subway_distance_file_path = os.path.join(project_root, "data", "real_estate_data_with_subway_distance.csv")
+state_dir = os.path.join(project_root, "data", "ingest_state")
+
+# Number of raw bytes parsed at a time
+DEFAULT_BLOCK_SIZE = 64 * 1024 * 1024
+
+# Number of bytes before the watermark used to check that the raw file was only appended to
+FINGERPRINT_SIZE = 4096
+
+
+def _fingerprint(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _read_bytes(file_path: str, start: int, end: int) -> bytes:
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        return f.read(end - start)
+
+
+def _header_end(file_path: str) -> int:
+    """
+    Returns the byte offset just after the header line of the raw CSV.
+    """
+    with open(file_path, "rb") as f:
+        f.readline()
+        return f.tell()
+
+
+def _last_complete_line_end(file_path: str) -> int:
+    """
+    Returns the byte offset just after the last newline of the file, so a partially written last line is left for
+    the next run.
+    """
+    size = os.path.getsize(file_path)
+    with open(file_path, "rb") as f:
+        position = size
+        while position > 0:
+            step = min(FINGERPRINT_SIZE, position)
+            position -= step
+            f.seek(position)
+            block = f.read(step)
+            newline = block.rfind(b"\n")
+            if newline != -1:
+                return position + newline + 1
+    return 0
+
+
+def state_exists(directory: str = state_dir) -> bool:
+    """
+    Checks whether an ingest state was saved (an ingest ran before, even one that found no listings).
+
+    :param directory: directory holding the ingest state
+    """
+    return (os.path.exists(os.path.join(directory, "watermark.json"))
+            and os.path.exists(os.path.join(directory, "processed_ids.npz")))
+
+
+def load_state(directory: str = state_dir) -> dict:
+    """
+    Loads the ingest watermark and the processed id hashes.
+
+    :param directory: directory holding the ingest state
+    :return: state dictionary; an empty state if nothing was ingested yet
+    """
+    watermark_path = os.path.join(directory, "watermark.json")
+    ids_path = os.path.join(directory, "processed_ids.npz")
+    if not state_exists(directory):
+        return {"byte_offset": 0, "header_fingerprint": None, "tail_fingerprint": None,
+                "ids": np.empty(0, dtype=np.int64), "hashes": np.empty(0, dtype=np.uint64)}
+
+    with open(watermark_path) as f:
+        state = json.load(f)
+    with np.load(ids_path) as processed:
+        state["ids"] = processed["ids"]
+        state["hashes"] = processed["hashes"]
+    return state
+
+
+def save_state(state: dict, directory: str = state_dir) -> None:
+    """
+    Saves the ingest watermark and the processed id hashes. Files are replaced atomically.
+
+    :param state: state dictionary, as returned by load_state and updated by ingest_new_listings
+    :param directory: directory holding the ingest state
+    """
+    os.makedirs(directory, exist_ok=True)
+    ids_path = os.path.join(directory, "processed_ids.npz")
+    with open(ids_path + ".tmp", "wb") as f:
+        np.savez(f, ids=state["ids"], hashes=state["hashes"])
+    os.replace(ids_path + ".tmp", ids_path)
+
+    watermark_path = os.path.join(directory, "watermark.json")
+    watermark = {key: value for key, value in state.items() if key not in ("ids", "hashes")}
+    with open(watermark_path + ".tmp", "w") as f:
+        json.dump(watermark, f, indent=2)
+    os.replace(watermark_path + ".tmp", watermark_path)
+
+
+def iter_raw_blocks(file_path: str, start: int, end: int,
+                    block_size: int = DEFAULT_BLOCK_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Parses the raw CSV rows between two byte offsets in blocks of complete lines.
+
+    :param file_path: path to the raw real estate CSV
+    :param start: byte offset of the first row to read (just after the header or a previous watermark)
+    :param end: byte offset just after the last complete line to read
+    :param block_size: approximate number of bytes parsed at a time
+    :return: iterator over raw chunks using the cleaned column headers
+    """
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        position = start
+        carry = b""
+        while position < end:
+            block = f.read(min(block_size, end - position))
+            if not block:
+                break
+            position += len(block)
+            block = carry + block
+            cut = block.rfind(b"\n") + 1
+            block, carry = block[:cut], block[cut:]
+            if block:
+                yield pd.read_csv(io.BytesIO(block), header=None, names=COLUMN_HEADERS, dtype=RAW_COLUMN_DTYPES)
+
+
+def select_new_or_changed(raw: pd.DataFrame, ids: np.ndarray, hashes: np.ndarray) -> tuple:
+    """
+    Selects the raw rows whose id was never processed or whose raw values changed since it was processed. Rows
+    without an id are dropped (the cleaning drops them too). Every row of a new id is kept, as in a full clean; of an
+    already processed id, only the last row of the chunk is compared (earlier ones were superseded, e.g. on a rescan).
+
+    :param raw: raw chunk using the cleaned column headers
+    :param ids: sorted listing ids processed by previous runs
+    :param hashes: raw row hashes aligned with ids
+    :return: tuple of (selected raw rows, their ids, their row hashes, number of changed rows)
+    """
+    raw = raw[raw["id"].notna()]
+    row_ids = raw["id"].to_numpy(dtype=np.int64)
+    row_hashes = pd.util.hash_pandas_object(raw, index=False).to_numpy()
+
+    if len(ids):
+        positions = np.minimum(np.searchsorted(ids, row_ids), len(ids) - 1)
+        seen = ids[positions] == row_ids
+        latest = ~raw["id"].duplicated(keep="last").to_numpy()
+        changed = seen & latest & (hashes[positions] != row_hashes)
+    else:
+        seen = changed = np.zeros(len(raw), dtype=bool)
+    selected = ~seen | changed
+
+    return raw[selected], row_ids[selected], row_hashes[selected], int(changed.sum())
+
+
+def _merge_processed(ids: np.ndarray, hashes: np.ndarray, new_ids: np.ndarray, new_hashes: np.ndarray) -> tuple:
+    """
+    Merges newly processed id hashes (in file order) into the sorted processed arrays (newer hashes replace older
+    ones, and the last row of an id repeated in the new rows is the newest).
+    """
+    all_ids = np.concatenate([new_ids[::-1], ids])
+    all_hashes = np.concatenate([new_hashes[::-1], hashes])
+    unique_ids, first = np.unique(all_ids, return_index=True)  # first occurrence is the newest hash
+    return unique_ids, all_hashes[first]
+
+
+def _append_csv(df: pd.DataFrame, file_path: str) -> None:
+    write_header = not os.path.exists(file_path) or os.path.getsize(file_path) == 0
+    df.to_csv(file_path, mode="a", header=write_header, index=False)
+
+
+def ingest_new_listings(raw_path: str = raw_file_path, cleaned_path: str = cleaned_file_path,
+                        numerical_path: str = numerical_file_path,
+                        subway_distance_path: str = subway_distance_file_path,
+                        directory: str = state_dir, block_size: int = DEFAULT_BLOCK_SIZE,
+                        rescan: bool = False) -> dict:
+    """
+    Appends new or changed raw listings to the cleaned datasets and the subway distance dataset.
+    On the first run (no ingest state saved yet) the outputs are rebuilt from the whole raw file, as a full clean
+    would write them.
+
+    :param raw_path: path to the raw real estate CSV
+    :param cleaned_path: path to the cleaned (categorical) CSV
+    :param numerical_path: path to the cleaned (fully numerical) CSV
+    :param subway_distance_path: path to the CSV with subway distances
+    :param directory: directory holding the ingest state
+    :param block_size: approximate number of raw bytes parsed at a time
+    :param rescan: ignore the byte watermark and compare every raw row against the stored hashes (for feeds that
+                   edit earlier rows in place)
+    :return: summary with the number of raw rows read, rows appended and changed rows
+    """
+    state = load_state(directory)
+    if not state_exists(directory):
+        # First run: build the outputs from scratch so they match the ingest state
+        for output in (cleaned_path, numerical_path, subway_distance_path):
+            if os.path.exists(output):
+                os.remove(output)
+        for output in (numerical_path, subway_distance_path):
+            remove_dataset(dataset_dir(output))
+
+    header_end = _header_end(raw_path)
+    header_fingerprint = _fingerprint(_read_bytes(raw_path, 0, header_end))
+    end = _last_complete_line_end(raw_path)
+
+    # Only trust the byte watermark if the raw file still has the same header and the same bytes before it
+    start = 0 if rescan else state["byte_offset"]
+    if start:
+        tail_start = max(header_end, start - FINGERPRINT_SIZE)
+        if (state["header_fingerprint"] != header_fingerprint or start > end
+                or state["tail_fingerprint"] != _fingerprint(_read_bytes(raw_path, tail_start, start))):
+            start = 0
+    start = max(start, header_end)
+
+    # Rows are compared with the listings processed by previous runs only, so an id repeated in the new rows is kept
+    # every time it appears, whether the repeats fall in the same block or not
+    processed_ids, processed_hashes = state["ids"], state["hashes"]
+    subway_stations = None
+    summary = {"rows_read": 0, "rows_appended": 0, "rows_changed": 0}
+    for raw in iter_raw_blocks(raw_path, start, end, block_size):
+        summary["rows_read"] += len(raw)
+        selected, new_ids, new_hashes, n_changed = select_new_or_changed(raw, processed_ids, processed_hashes)
+        summary["rows_changed"] += n_changed
+        if not selected.empty:
+            categorical = clean_chunk(selected.copy(), numerical=False)
+            numerical = clean_chunk(selected.copy(), numerical=True)
+            _append_csv(categorical, cleaned_path)
+            _append_csv(numerical, numerical_path)
+
+            if not numerical.empty:
+                write_dataset(numerical, dataset_dir(numerical_path), append=True)
+                if subway_stations is None:
+                    subway_stations = load_subway_stations()
+                with_distance = add_subway_distance(numerical, subway_stations)
+                _append_csv(with_distance, subway_distance_path)
+                write_dataset(with_distance, dataset_dir(subway_distance_path), append=True)
+            summary["rows_appended"] += len(numerical)
+
+        state["ids"], state["hashes"] = _merge_processed(state["ids"], state["hashes"], new_ids, new_hashes)
+
+    state["byte_offset"] = end
+    state["header_fingerprint"] = header_fingerprint
+    state["tail_fingerprint"] = _fingerprint(_read_bytes(raw_path, max(header_end, end - FINGERPRINT_SIZE), end))
+    save_state(state, directory)
+    return summary
+
+
+def compact_output(file_path: str) -> int:
+    """
+    Rewrites an output CSV (and its typed columnar dataset, if any) keeping only the most recently appended row of
+    each listing id.
+
+    :param file_path: path to a cleaned or subway distance CSV
+    :return: number of rows removed
+    """
+    df = pd.read_csv(file_path)
+    compacted = df.drop_duplicates(subset="id", keep="last")
+    compacted.to_csv(file_path, index=False)
+    if file_path in (numerical_file_path, subway_distance_file_path):
+        write_dataset(compacted, dataset_dir(file_path))
+    return len(df) - len(compacted)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Append new or changed raw listings to the cleaned datasets.")
+    parser.add_argument("--rescan", action="store_true",
+                        help="compare every raw row against the stored hashes instead of reading from the watermark")
+    parser.add_argument("--compact", action="store_true",
+                        help="afterwards, keep only the latest row per listing id in each output")
+    args = parser.parse_args()
+
+    result = ingest_new_listings(rescan=args.rescan)
+    print(f"Read {result['rows_read']} raw rows, appended {result['rows_appended']} cleaned listings "
+          f"({result['rows_changed']} changed).")
+
+    if args.compact:
+        for output in (cleaned_file_path, numerical_file_path, subway_distance_file_path):
+            print(f"Removed {compact_output(output)} superseded rows from {output}")
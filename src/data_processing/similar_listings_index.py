@@ -0,0 +1,172 @@
+"""
+Similar Listings Index
+
+Finds the existing listings most similar to a property entered in the web app, without filtering the full dataset
+for every request.
+
+"Similar" is the Euclidean distance between scaled listing attributes: one bedroom, one bathroom, one size group and
+SCALES["monthly_maintenance_fee"] dollars of monthly maintenance fee each count as one unit. With a location, the
+distance between the two listings counts too (LOCATION_SCALE metres per unit), using a local equirectangular
+projection so the index does not need the geospatial libraries.
+
+Steps:
+1. Load the cleaned dataset (only the columns shown and compared).
+2. Build a KD-tree over the scaled attributes, and a second one over the scaled attributes and positions of the
+   listings with coordinates.
+3. Persist both trees and the listing columns with joblib, keyed by a hash of the dataset file. The web app loads the
+   index once per server process (shared by all sessions) and rebuilds it only when the dataset changed.
+
+Usage:
+    python -m src.data_processing.similar_listings_index
+"""
+import os
+from typing import Optional
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from src.models.prediction_grid import file_hash
+
+# Get the absolute path of the current script (app.py) and define the correct model path
+base_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(base_dir, "..", ".."))
+file_path = os.path.join(project_root, "data", "cleaned_real_estate_data_numerical.csv")
+index_file_path = os.path.join(project_root, "data", "similar_listings_index.joblib")
+
+# Size of one unit of similarity distance for each compared attribute
+SCALES = {"num_beds": 1.0, "num_baths": 1.0, "size_group": 1.0, "monthly_maintenance_fee": 200.0}
+
+# Distance (m) between two listings counted as one unit of similarity distance
+LOCATION_SCALE = 1000.0
+
+# Columns returned for each similar listing
+COLUMNS = ["id", "num_beds", "num_baths", "size_group", "monthly_maintenance_fee", "listing_price", "ward_num",
+           "latitude", "longitude"]
+
+# Mean radius of the Earth (m)
+EARTH_RADIUS = 6_371_000.0
+
+
+class SimilarListingsIndex:
+    """
+    KD-trees over the scaled attributes (and positions) of the listings of a dataset.
+
+    :param listings: mapping of column name -> array, with at least the COLUMNS
+    :param source_hash: hash of the dataset file the index was built from
+    """
+
+    def __init__(self, listings: dict, source_hash: Optional[str] = None):
+        self.listings = {column: np.asarray(listings[column]) for column in COLUMNS}
+        self.source_hash = source_hash
+        self.scales = np.array(list(SCALES.values()))
+
+        # Reference latitude of the local projection: the middle of the listings
+        latitude, longitude = self.listings["latitude"], self.listings["longitude"]
+        self.located = np.flatnonzero(~np.isnan(latitude) & ~np.isnan(longitude))
+        self.reference_latitude = float(np.median(latitude[self.located])) if len(self.located) else 0.0
+
+        attributes = self._scale_attributes(*(self.listings[column].astype(np.float64) for column in SCALES))
+        self.tree = cKDTree(attributes)
+        self.located_tree = cKDTree(np.column_stack(
+            [attributes[self.located], self._scale_location(latitude[self.located], longitude[self.located])]))
+
+    @classmethod
+    def from_dataset(cls, file_path: str = file_path) -> "SimilarListingsIndex":
+        """
+        Builds the index of the listings of a cleaned dataset.
+
+        :param file_path: Path to the cleaned real estate dataset (CSV export or typed columnar dataset directory).
+        :return: the index
+        """
+        from src.data_processing.storage import load_dataset
+
+        df = load_dataset(file_path, columns=COLUMNS)
+        source_hash = file_hash(file_path) if os.path.isfile(file_path) else None
+        return cls({column: df[column].to_numpy() for column in COLUMNS}, source_hash)
+
+    @classmethod
+    def load_or_build(cls, file_path: str = file_path,
+                      index_path: Optional[str] = index_file_path) -> "SimilarListingsIndex":
+        """
+        Loads the persisted index if it was built from the current dataset, otherwise builds and persists it.
+
+        :param file_path: Path to the cleaned real estate dataset CSV.
+        :param index_path: path of the persisted index (None to never persist)
+        :return: the index
+        """
+        source_hash = file_hash(file_path)
+        if index_path is not None and os.path.exists(index_path):
+            index = cls.load(index_path)
+            if index.source_hash == source_hash:
+                return index
+        index = cls.from_dataset(file_path)
+        if index_path is not None:
+            index.save(index_path)
+        return index
+
+    def save(self, index_path: str) -> None:
+        """
+        Persists the built trees and the listing columns (as plain objects, so loading does not depend on where this
+        class was imported from).
+
+        :param index_path: path of the joblib file
+        """
+        import joblib
+
+        joblib.dump(dict(self.__dict__), index_path)
+
+    @classmethod
+    def load(cls, index_path: str) -> "SimilarListingsIndex":
+        """
+        Loads an index saved with save, without rebuilding its trees.
+
+        :param index_path: path of the joblib file
+        :return: the index
+        """
+        import joblib
+
+        index = cls.__new__(cls)
+        index.__dict__.update(joblib.load(index_path))
+        return index
+
+    def _scale_attributes(self, num_beds, num_baths, size_group, monthly_maintenance_fee) -> np.ndarray:
+        return np.column_stack([num_beds, num_baths, size_group, monthly_maintenance_fee]) / self.scales
+
+    def _scale_location(self, latitude, longitude) -> np.ndarray:
+        # Local equirectangular projection (m), accurate to well under 1% across the city
+        y = np.radians(latitude) * EARTH_RADIUS
+        x = np.radians(longitude) * EARTH_RADIUS * np.cos(np.radians(self.reference_latitude))
+        return np.column_stack([x, y]) / LOCATION_SCALE
+
+    def query(self, num_beds: float, num_baths: float, size_group: float, monthly_maintenance_fee: float,
+              k: int = 5, latitude: Optional[float] = None, longitude: Optional[float] = None) -> list:
+        """
+        Finds the k listings most similar to a property.
+
+        :param latitude: latitude of the property (degrees); with longitude, the location is compared too
+        :param longitude: longitude of the property (degrees)
+        :return: list of listings (dictionaries of COLUMNS), most similar first, each with its "similarity_distance"
+        """
+        point = self._scale_attributes(num_beds, num_baths, size_group, monthly_maintenance_fee)[0]
+        if latitude is not None and longitude is not None:
+            point = np.concatenate([point, self._scale_location(latitude, longitude)[0]])
+            distances, positions = self.located_tree.query(point, k=min(k, len(self.located)))
+            rows = self.located[np.atleast_1d(positions)]
+        else:
+            distances, positions = self.tree.query(point, k=min(k, self.tree.n))
+            rows = np.atleast_1d(positions)
+
+        return [{**{column: self.listings[column][row].item() for column in COLUMNS},
+                 "similarity_distance": float(distance)}
+                for row, distance in zip(rows, np.atleast_1d(distances))]
+
+
+def main(file_path: str = file_path, index_path: str = index_file_path) -> None:
+    index = SimilarListingsIndex.from_dataset(file_path)
+    index.save(index_path)
+    print(f"Similar listings index of {index.tree.n} listings ({len(index.located)} with coordinates) saved at: "
+          f"{index_path}")
+
+
+if __name__ == "__main__":
+    main()
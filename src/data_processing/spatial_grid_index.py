@@ -0,0 +1,331 @@
+"""
+Multi-Resolution Spatial Grid Index of Listing Prices
+
+This module answers "price statistics near this location" (listing count, price quantiles, mean maintenance fee) for
+maps, features and analyst queries without going back to the raw listings.
+
+Listing coordinates are projected to the metric CRS of the subway indexes (NAD83(CSRS) / MTM zone 10, see
+subway_station_index.py) and assigned to square cells at several resolutions (250 m, 1 km and 4 km by default; every
+cell is split into 4 x 4 cells of the next finer level). For each non-empty cell the index stores:
+- the number of listings
+- the sum and count of the known maintenance fees (mean fee = sum / count)
+- a price sketch: a histogram of prices in logarithmic bins, each bin `(1 + ALPHA) / (1 - ALPHA)` times wider than
+  the previous one, so every quantile read from the sketch is within ALPHA (1%) of a true listing price
+
+All of these are sums, so cells (and whole indexes) merge by adding them: new listings are added incrementally with
+`add_listings`, and indexes built on separate chunks of data combine with `merge`, giving exactly the index of the
+combined data.
+
+Cells of a level are kept in arrays sorted by cell key, so point lookups are one vectorized binary search for any
+number of points, and bounding-box lookups select the cells whose centre lies inside the box and merge their sketches.
+
+Usage:
+    python -m src.data_processing.spatial_grid_index   # builds data/spatial_grid_index.npz from the cleaned data
+"""
+import os
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.data_processing.storage import load_dataset
+from src.data_processing.subway_station_index import project_to_metric
+
+# Get the absolute path of the current script (app.py) and define the correct model path
+base_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(base_dir, "..", ".."))
+file_path = os.path.join(project_root, "data", "cleaned_real_estate_data_numerical.csv")
+index_file_path = os.path.join(project_root, "data", "spatial_grid_index.npz")
+
+# Columns needed to build the index
+columns = ["latitude", "longitude", "listing_price", "monthly_maintenance_fee"]
+
+# Cell sizes (m) of the levels, finest first
+DEFAULT_CELL_SIZES = (250.0, 1000.0, 4000.0)
+
+# Relative accuracy of the price quantiles, and the price range of the sketch (prices outside are clamped)
+ALPHA = 0.01
+GAMMA = (1 + ALPHA) / (1 - ALPHA)
+MIN_PRICE = 1_000.0
+MAX_PRICE = 1_000_000_000.0
+N_PRICE_BINS = int(np.ceil(np.log(MAX_PRICE / MIN_PRICE) / np.log(GAMMA))) + 1
+
+# Cell keys pack (row, column) of a cell into one int64
+KEY_SHIFT = np.int64(1 << 32)
+
+
+def price_bins(prices) -> np.ndarray:
+    """
+    Maps prices to sketch bins: bin i holds the prices in (MIN_PRICE * GAMMA^(i-1), MIN_PRICE * GAMMA^i].
+    """
+    prices = np.clip(np.asarray(prices, dtype=np.float64), MIN_PRICE, MAX_PRICE)
+    return np.ceil(np.log(prices / MIN_PRICE) / np.log(GAMMA) - 1e-9).astype(np.int64).clip(0, N_PRICE_BINS - 1)
+
+
+def sketch_quantiles(histograms: np.ndarray, q: float) -> np.ndarray:
+    """
+    Reads a quantile from price sketches.
+
+    :param histograms: price histograms (n_sketches x N_PRICE_BINS)
+    :param q: quantile in [0, 1]
+    :return: quantile estimate of each sketch (NaN for empty sketches)
+    """
+    counts = histograms.sum(axis=1)
+    cumulative = histograms.cumsum(axis=1)
+    rank = np.floor(q * (counts - 1))
+    bins = (cumulative > rank[:, None]).argmax(axis=1)
+    # Estimate within ALPHA of every price in the bin
+    values = MIN_PRICE * 2 * GAMMA ** bins / (GAMMA + 1)
+    return np.where(counts > 0, values, np.nan)
+
+
+def sketch_statistics(counts: np.ndarray, fee_sums: np.ndarray, fee_counts: np.ndarray,
+                      histograms: np.ndarray) -> pd.DataFrame:
+    """
+    Summarizes cell statistics.
+
+    :return: count, price_p25, median_price, price_p75 and mean_maintenance_fee of each cell
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_fees = np.where(fee_counts > 0, fee_sums / np.maximum(fee_counts, 1), np.nan)
+    return pd.DataFrame({"count": counts,
+                         "price_p25": sketch_quantiles(histograms, 0.25),
+                         "median_price": sketch_quantiles(histograms, 0.5),
+                         "price_p75": sketch_quantiles(histograms, 0.75),
+                         "mean_maintenance_fee": mean_fees})
+
+
+class GridLevel:
+    """
+    The non-empty cells of one resolution, sorted by cell key.
+
+    :param cell_size: cell side (m)
+    :param keys: sorted cell keys (see cell_keys)
+    :param counts: number of listings of each cell
+    :param fee_sums: sum of the known maintenance fees of each cell
+    :param fee_counts: number of known maintenance fees of each cell
+    :param histograms: price sketch of each cell (n_cells x N_PRICE_BINS)
+    """
+
+    def __init__(self, cell_size: float, keys: np.ndarray, counts: np.ndarray, fee_sums: np.ndarray,
+                 fee_counts: np.ndarray, histograms: np.ndarray):
+        self.cell_size = float(cell_size)
+        self.keys = keys
+        self.counts = counts
+        self.fee_sums = fee_sums
+        self.fee_counts = fee_counts
+        self.histograms = histograms
+        self._statistics = None
+
+    @classmethod
+    def empty(cls, cell_size: float) -> "GridLevel":
+        return cls(cell_size, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0),
+                   np.empty(0, dtype=np.int64), np.empty((0, N_PRICE_BINS), dtype=np.uint32))
+
+    def cell_keys(self, points: np.ndarray) -> np.ndarray:
+        """
+        :param points: projected coordinates (n x 2, metres)
+        :return: key of the cell containing each point
+        """
+        cells = np.floor(points / self.cell_size).astype(np.int64)
+        return cells[:, 1] * KEY_SHIFT + cells[:, 0]
+
+    def merge_cells(self, keys: np.ndarray, counts: np.ndarray, fee_sums: np.ndarray, fee_counts: np.ndarray,
+                    histograms: np.ndarray) -> None:
+        """
+        Adds cell statistics (possibly for cells already in the level) to the level.
+        """
+        unique_keys = np.union1d(self.keys, keys)
+        merged_counts = np.zeros(len(unique_keys), dtype=np.int64)
+        merged_fee_sums = np.zeros(len(unique_keys))
+        merged_fee_counts = np.zeros(len(unique_keys), dtype=np.int64)
+        merged_histograms = np.zeros((len(unique_keys), N_PRICE_BINS), dtype=np.uint32)
+        # Keys are unique within each side, so each side adds to distinct rows
+        for side_keys, side_counts, side_fee_sums, side_fee_counts, side_histograms in (
+                (self.keys, self.counts, self.fee_sums, self.fee_counts, self.histograms),
+                (keys, counts, fee_sums, fee_counts, histograms)):
+            rows = np.searchsorted(unique_keys, side_keys)
+            merged_counts[rows] += side_counts
+            merged_fee_sums[rows] += side_fee_sums
+            merged_fee_counts[rows] += side_fee_counts
+            merged_histograms[rows] += side_histograms.astype(np.uint32)
+        self.keys, self.counts, self.fee_sums = unique_keys, merged_counts, merged_fee_sums
+        self.fee_counts, self.histograms = merged_fee_counts, merged_histograms
+        self._statistics = None
+
+    def add_points(self, points: np.ndarray, prices: np.ndarray, fees: np.ndarray) -> None:
+        """
+        Adds listings to the level.
+
+        :param points: projected coordinates (n x 2, metres)
+        :param prices: listing prices
+        :param fees: monthly maintenance fees (NaN when unknown)
+        """
+        keys, positions = np.unique(self.cell_keys(points), return_inverse=True)
+        known_fee = ~np.isnan(fees)
+        counts = np.bincount(positions, minlength=len(keys)).astype(np.int64)
+        fee_sums = np.bincount(positions[known_fee], weights=fees[known_fee], minlength=len(keys))
+        fee_counts = np.bincount(positions[known_fee], minlength=len(keys)).astype(np.int64)
+        histograms = np.bincount(positions * N_PRICE_BINS + price_bins(prices), minlength=len(keys) * N_PRICE_BINS)
+        histograms = histograms.reshape(len(keys), N_PRICE_BINS).astype(np.uint32)
+        self.merge_cells(keys, counts, fee_sums, fee_counts, histograms)
+
+    def statistics(self) -> pd.DataFrame:
+        """
+        :return: summary of every cell (see sketch_statistics), computed once per update of the level
+        """
+        if self._statistics is None:
+            self._statistics = sketch_statistics(self.counts, self.fee_sums, self.fee_counts, self.histograms)
+        return self._statistics
+
+    def find(self, keys: np.ndarray) -> np.ndarray:
+        """
+        :return: position of each cell key in the level (-1 for empty cells)
+        """
+        if len(self.keys) == 0:
+            return np.full(len(keys), -1)
+        positions = np.searchsorted(self.keys, keys).clip(0, len(self.keys) - 1)
+        return np.where(self.keys[positions] == keys, positions, -1)
+
+
+class SpatialGridIndex:
+    """
+    Multi-resolution grid of listing statistics (see the module docstring).
+
+    :param levels: grid levels, finest first
+    """
+
+    def __init__(self, levels: list):
+        self.levels = levels
+
+    @classmethod
+    def from_listings(cls, listings: pd.DataFrame,
+                      cell_sizes: Sequence[float] = DEFAULT_CELL_SIZES) -> "SpatialGridIndex":
+        """
+        Builds the index of listings.
+
+        :param listings: listings with latitude, longitude, listing_price and monthly_maintenance_fee columns
+        :param cell_sizes: cell sizes (m) of the levels, finest first
+        :return: the index
+        """
+        index = cls([GridLevel.empty(size) for size in cell_sizes])
+        index.add_listings(listings)
+        return index
+
+    def add_listings(self, listings: pd.DataFrame) -> None:
+        """
+        Adds listings to every level (listings without coordinates or price are ignored).
+        """
+        listings = listings.dropna(subset=["latitude", "longitude", "listing_price"])
+        if listings.empty:
+            return
+        points = project_to_metric(listings["longitude"], listings["latitude"])
+        prices = listings["listing_price"].to_numpy(dtype=np.float64)
+        fees = listings["monthly_maintenance_fee"].to_numpy(dtype=np.float64)
+        for level in self.levels:
+            level.add_points(points, prices, fees)
+
+    def merge(self, other: "SpatialGridIndex") -> None:
+        """
+        Adds the statistics of another index with the same cell sizes (e.g. built on another chunk of listings).
+        """
+        if [level.cell_size for level in self.levels] != [level.cell_size for level in other.levels]:
+            raise ValueError("Only indexes with the same cell sizes can be merged.")
+        for level, other_level in zip(self.levels, other.levels):
+            level.merge_cells(other_level.keys, other_level.counts, other_level.fee_sums, other_level.fee_counts,
+                              other_level.histograms)
+
+    def point_stats(self, latitude, longitude, level: Optional[int] = None, min_count: int = 1) -> pd.DataFrame:
+        """
+        Looks up the statistics of the cell containing each point.
+
+        :param latitude: array of latitudes (degrees)
+        :param longitude: array of longitudes (degrees)
+        :param level: level to read (0 = finest); if None, the finest level whose cell holds at least min_count
+                      listings is used for each point
+        :param min_count: smallest number of listings of a usable cell (level=None only)
+        :return: one row per point: count, price_p25, median_price, price_p75, mean_maintenance_fee and the
+                 cell_size (m) of the level used (count 0 and NaN statistics where no cell qualifies)
+        """
+        points = project_to_metric(np.atleast_1d(longitude), np.atleast_1d(latitude))
+        candidates = range(len(self.levels)) if level is None else [level]
+
+        level_used = np.full(len(points), -1)
+        positions = np.full(len(points), -1)
+        for candidate in candidates:
+            grid = self.levels[candidate]
+            if len(grid.keys) == 0:
+                continue  # no listings at this level
+            pending = level_used < 0
+            found = grid.find(grid.cell_keys(points[pending]))
+            usable = found >= 0
+            if level is None:
+                usable[usable] = grid.counts[found[usable]] >= min_count
+            level_used[np.flatnonzero(pending)[usable]] = candidate
+            positions[np.flatnonzero(pending)[usable]] = found[usable]
+
+        columns = list(self.levels[0].statistics().columns)
+        values = np.full((len(points), len(columns)), np.nan)
+        values[:, 0] = 0
+        for candidate in set(level_used[level_used >= 0].tolist()):
+            rows = level_used == candidate
+            values[rows] = self.levels[candidate].statistics().to_numpy(dtype=np.float64)[positions[rows]]
+
+        stats = pd.DataFrame(values, columns=columns).astype({"count": np.int64})
+        cell_sizes = np.array([grid.cell_size for grid in self.levels] + [np.nan])
+        stats["cell_size"] = cell_sizes[level_used]
+        return stats
+
+    def bbox_stats(self, south: float, west: float, north: float, east: float, level: int = 0) -> dict:
+        """
+        Merges the statistics of the cells whose centre lies in a bounding box.
+
+        :param south: southern latitude (degrees)
+        :param west: western longitude (degrees)
+        :param north: northern latitude (degrees)
+        :param east: eastern longitude (degrees)
+        :param level: level to read (0 = finest; coarser levels are faster but follow the box less closely)
+        :return: count, price_p25, median_price, price_p75, mean_maintenance_fee and the number of cells merged
+        """
+        grid = self.levels[level]
+        corners = project_to_metric([west, east, west, east], [south, south, north, north])
+        low, high = corners.min(axis=0), corners.max(axis=0)
+        rows, columns = np.divmod(grid.keys, KEY_SHIFT)
+        centres = np.column_stack([columns, rows]) * grid.cell_size + grid.cell_size / 2
+        inside = np.all((centres >= low) & (centres <= high), axis=1)
+
+        stats = sketch_statistics(grid.counts[inside].sum(keepdims=True), grid.fee_sums[inside].sum(keepdims=True),
+                                 grid.fee_counts[inside].sum(keepdims=True),
+                                 grid.histograms[inside].sum(axis=0, dtype=np.uint64)[None, :])
+        return {**stats.iloc[0].to_dict(), "cells": int(inside.sum())}
+
+    def save(self, path: str) -> None:
+        arrays = {}
+        for i, grid in enumerate(self.levels):
+            arrays.update({f"level{i}_cell_size": grid.cell_size, f"level{i}_keys": grid.keys,
+                           f"level{i}_counts": grid.counts, f"level{i}_fee_sums": grid.fee_sums,
+                           f"level{i}_fee_counts": grid.fee_counts, f"level{i}_histograms": grid.histograms})
+        np.savez_compressed(path, n_levels=len(self.levels), alpha=ALPHA, min_price=MIN_PRICE, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "SpatialGridIndex":
+        with np.load(path) as data:
+            if float(data["alpha"]) != ALPHA or float(data["min_price"]) != MIN_PRICE:
+                raise ValueError(f"{path} was built with other price sketch settings; rebuild it.")
+            levels = [GridLevel(float(data[f"level{i}_cell_size"]), data[f"level{i}_keys"], data[f"level{i}_counts"],
+                                data[f"level{i}_fee_sums"], data[f"level{i}_fee_counts"],
+                                data[f"level{i}_histograms"])
+                      for i in range(int(data["n_levels"]))]
+        return cls(levels)
+
+
+def main(file_path: str = file_path, index_path: str = index_file_path) -> None:
+    listings = load_dataset(file_path, columns=columns)
+    index = SpatialGridIndex.from_listings(listings)
+    index.save(index_path)
+    cells = ", ".join(f"{len(grid.keys)} cells of {grid.cell_size:g} m" for grid in index.levels)
+    print(f"Spatial grid index saved at: {index_path} ({cells})")
+
+
+if __name__ == "__main__":
+    main()
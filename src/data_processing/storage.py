@@ -0,0 +1,264 @@
+"""
+Typed Columnar Storage for the Cleaned Real Estate Datasets
+
+This module stores the cleaned datasets as Arrow IPC (Feather v2) files with compact column types, so downstream
+scripts load only the columns they need through memory mapping instead of re-parsing CSV text.
+
+The compact types are applied only when a dataset is written (`write_dataset`). CSV exports keep the cleaning scripts'
+full-precision values and 0/1 flags, so scripts that write a CSV export build it from the CSV they extend, not from
+`load_dataset`.
+
+A dataset is a directory next to its CSV export (e.g. `data/cleaned_real_estate_data_numerical/`) holding one or more
+uncompressed `part-NNNNN.arrow` files. New listings are appended as new part files, so incremental ingest never rewrites
+existing data.
+
+A partitioned dataset splits the rows by the values of some columns into one sub-directory per partition, named
+`column=value` (e.g. `ward_num=3/` or `ward_num=3/size_group=1/`), each an ordinary dataset. A query for one partition
+reads only that partition's files.
+
+Column types:
+- int8 for small categorical counts and codes (`ward_num`, `num_beds`, `num_baths`, `size_group`)
+- nullable booleans for the den and parking flags
+- float32 for fees, days on market, orientation codes and subway distances
+- float64 for the target `listing_price` and the coordinates (float32 would move listings by tens of centimetres)
+- int16 station counts and dictionary-encoded (category) subway route and feature names
+"""
+import glob
+import os
+from typing import Iterator, Optional, Sequence
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.feather as feather
+from pyarrow import fs
+
+from src.instrumentation import add_rows
+
+# Compact storage types of every known column
+COLUMN_DTYPES = {
+    "id": "int64",
+    "ward_num": "int8",
+    "num_beds": "int8",
+    "num_baths": "int8",
+    "has_den": "boolean",
+    "size_group": "int8",
+    "has_parking": "boolean",
+    "property_orientation": "float32",
+    "days_on_market": "float32",
+    "building_age": "int16",
+    "monthly_maintenance_fee": "float32",
+    "listing_price": "float64",
+    "latitude": "float64",
+    "longitude": "float64",
+    "distance_to_subway": "float32",
+    "nearest_subway_route": "category",
+    "subway_stations_within_500m": "int16",
+    "subway_stations_within_1km": "int16",
+    "nearest_subway_feature": "category",
+    "nearest_subway_line_id": "int32",
+}
+
+# Columns that are never stored (derivable from latitude/longitude)
+DROPPED_COLUMNS = ["geometry"]
+
+
+def dataset_dir(file_path: str) -> str:
+    """
+    Returns the dataset directory that stores the same data as a CSV export.
+
+    :param file_path: path to a CSV export, e.g. 'data/cleaned_real_estate_data_numerical.csv'
+    :return: path of the matching dataset directory, e.g. 'data/cleaned_real_estate_data_numerical'
+    """
+    root, extension = os.path.splitext(file_path)
+    return root if extension.lower() == ".csv" else file_path
+
+
+def to_storage_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Casts the known columns of a cleaned dataset to their compact storage types and drops derivable columns.
+
+    :param df: cleaned real estate listings
+    :return: a new DataFrame with compact column types
+    """
+    df = df.drop(columns=[column for column in DROPPED_COLUMNS if column in df.columns])
+    return df.astype({column: dtype for column, dtype in COLUMN_DTYPES.items() if column in df.columns})
+
+
+def _part_paths(directory: str) -> list:
+    return sorted(glob.glob(os.path.join(directory, "part-*.arrow")))
+
+
+def write_dataset(df: pd.DataFrame, directory: str, append: bool = False) -> str:
+    """
+    Writes a cleaned dataset (or one more part of it) as an uncompressed, memory-mappable Arrow file.
+
+    :param df: cleaned real estate listings
+    :param directory: dataset directory
+    :param append: add a new part next to the existing ones instead of replacing them
+    :return: path of the written part file
+    """
+    os.makedirs(directory, exist_ok=True)
+    existing_parts = _part_paths(directory)
+    if not append:
+        for part in existing_parts:
+            os.remove(part)
+        existing_parts = []
+
+    part_path = os.path.join(directory, f"part-{len(existing_parts):05d}.arrow")
+    table = pa.Table.from_pandas(to_storage_dtypes(df), preserve_index=False)
+    feather.write_feather(table, part_path, compression="uncompressed")
+    return part_path
+
+
+def partition_dir(directory: str, values: dict) -> str:
+    """
+    Returns the directory of one partition of a partitioned dataset.
+
+    :param directory: partitioned dataset directory
+    :param values: mapping of partition column -> value, in partitioning order
+    :return: e.g. 'data/cleaned_real_estate_data_by_ward/ward_num=3'
+    """
+    return os.path.join(directory, *(f"{column}={value}" for column, value in values.items()))
+
+
+def _partition_part_paths(directory: str, values: Optional[dict] = None) -> list:
+    pattern = "**" if not values else os.path.join(*(f"{column}={value}" for column, value in values.items()), "**")
+    return sorted(glob.glob(os.path.join(directory, pattern, "part-*.arrow"), recursive=True))
+
+
+def write_partitioned_dataset(df: pd.DataFrame, directory: str, partition_by: Sequence[str],
+                              append: bool = False) -> dict:
+    """
+    Writes a cleaned dataset split into one dataset per value of the partition columns.
+
+    :param df: cleaned real estate listings
+    :param directory: partitioned dataset directory
+    :param partition_by: partition columns, outermost first (e.g. ['ward_num'] or ['ward_num', 'size_group'])
+    :param append: add the rows as new parts of the existing partitions instead of replacing the whole dataset
+    :return: mapping of partition directory -> number of rows written
+    """
+    if not append:
+        for part in _partition_part_paths(directory):
+            os.remove(part)
+
+    written = {}
+    for key, rows in df.groupby(list(partition_by), sort=True):
+        key = key if isinstance(key, tuple) else (key,)
+        path = partition_dir(directory, {column: int(value) for column, value in zip(partition_by, key)})
+        write_dataset(rows, path, append=True)
+        written[path] = len(rows)
+    return written
+
+
+def list_partitions(directory: str) -> list:
+    """
+    Lists the partitions of a partitioned dataset that hold data.
+
+    :param directory: partitioned dataset directory
+    :return: list of mappings of partition column -> value (integers), sorted
+    """
+    partitions = set()
+    for part in _partition_part_paths(directory):
+        relative = os.path.relpath(os.path.dirname(part), directory)
+        if relative != os.curdir:
+            partitions.add(tuple((column, int(value)) for column, value in
+                                 (name.split("=", 1) for name in relative.split(os.sep))))
+    return [dict(partition) for partition in sorted(partitions)]
+
+
+def load_partition(directory: str, values: dict, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """
+    Loads the rows of one partition (or of every partition under a prefix of the partition columns), reading only
+    its files.
+
+    :param directory: partitioned dataset directory
+    :param values: mapping of partition column -> value, outermost first (e.g. {'ward_num': 3})
+    :param columns: columns to load; all stored columns if None
+    :return: DataFrame with compact column types (empty if the partition does not exist)
+    """
+    parts = _partition_part_paths(directory, values)
+    if not parts:
+        return pd.DataFrame(columns=list(columns) if columns is not None else None)
+    dataset = ds.dataset(parts, format="ipc", filesystem=fs.LocalFileSystem(use_mmap=True))
+    table = dataset.to_table(columns=list(columns) if columns is not None else None)
+    add_rows(table.num_rows)
+    return table.to_pandas(split_blocks=True)
+
+
+def remove_dataset(directory: str) -> None:
+    """
+    Removes every part file of a dataset.
+
+    :param directory: dataset directory
+    """
+    for part in _part_paths(directory):
+        os.remove(part)
+
+
+def load_dataset(file_path: str, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """
+    Loads a cleaned dataset with compact column types, reading only the requested columns.
+
+    The Arrow dataset directory matching `file_path` is memory-mapped when it exists (all partitions of a partitioned
+    dataset); otherwise the CSV export is parsed and cast to the same types.
+
+    :param file_path: path to a CSV export or to a dataset directory
+    :param columns: columns to load; all stored columns if None
+    :return: DataFrame with compact column types
+    """
+    directory = dataset_dir(file_path)
+    parts = (_part_paths(directory) or _partition_part_paths(directory)) if os.path.isdir(directory) else []
+    if parts:
+        dataset = ds.dataset(parts, format="ipc", filesystem=fs.LocalFileSystem(use_mmap=True))
+        table = dataset.to_table(columns=list(columns) if columns is not None else None)
+        add_rows(table.num_rows)
+        return table.to_pandas(split_blocks=True)
+
+    csv_path = directory + ".csv" if file_path == directory else file_path
+    df = pd.read_csv(csv_path, usecols=list(columns) if columns is not None else None)
+    add_rows(len(df))
+    return to_storage_dtypes(df)
+
+
+def dataset_parts(file_path: str) -> list:
+    """
+    Lists the Arrow part files of a (partitioned) dataset, for readers that memory-map the parts themselves.
+
+    :param file_path: path to a CSV export or to a dataset directory
+    :return: part file paths (empty if the dataset has only a CSV export)
+    """
+    directory = dataset_dir(file_path)
+    return (_part_paths(directory) or _partition_part_paths(directory)) if os.path.isdir(directory) else []
+
+
+def iter_batches(file_path: str, columns: Optional[Sequence[str]] = None,
+                 batch_size: int = 1_000_000) -> Iterator[pd.DataFrame]:
+    """
+    Streams a cleaned dataset in batches of rows, so datasets larger than memory can be processed chunk by chunk.
+
+    The Arrow parts are memory-mapped and read one record batch at a time; without them, the CSV export is parsed in
+    chunks and cast to the compact types.
+
+    :param file_path: path to a CSV export or to a (partitioned) dataset directory
+    :param columns: columns to load; all stored columns if None
+    :param batch_size: largest number of rows per batch
+    :return: iterator over DataFrames with compact column types
+    """
+    parts = dataset_parts(file_path)
+    if parts:
+        dataset = ds.dataset(parts, format="ipc", filesystem=fs.LocalFileSystem(use_mmap=True))
+        for batch in dataset.to_batches(columns=list(columns) if columns is not None else None,
+                                        batch_size=batch_size):
+            if batch.num_rows:
+                add_rows(batch.num_rows)
+                yield batch.to_pandas(split_blocks=True)
+        return
+
+    directory = dataset_dir(file_path)
+    csv_path = directory + ".csv" if file_path == directory else file_path
+    with pd.read_csv(csv_path, usecols=list(columns) if columns is not None else None,
+                     chunksize=batch_size) as reader:
+        for chunk in reader:
+            add_rows(len(chunk))
+            yield to_storage_dtypes(chunk)
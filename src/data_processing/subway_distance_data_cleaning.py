@@ -4,58 +4,87 @@ Creation of Real Estate Data With Subway Distance
 This script creates a csv file adding the distance from the subway for each real estate
 listing. It uses data from the TTC.
 
+Distances are computed in metres (in a metric projection for Toronto) with a persisted nearest-station index that
+answers batched, parallel queries (see subway_station_index.py). With `--mode line`, the exact distance to the
+nearest subway line segment is computed instead, using a bulk STRtree query over the full line geometries.
+
 Author: Lillian Toe
 Date: 2025-03-01
 Generated with assistance from ChatGPT (OpenAI)
 """
+import argparse
 import os
+from typing import Union
+
 import pandas as pd
-import geopandas as gpd
-from shapely.geometry import Point
-from scipy.spatial import cKDTree
-import numpy as np
+
+from src.data_processing.storage import dataset_dir, write_dataset
+from src.data_processing.subway_station_index import (SubwayLineIndex, SubwayStationIndex, index_file_path,
+                                                      line_index_file_path)
 
 # Get the absolute path of the current script (app.py) and define the correct model path
 base_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(base_dir, "..", ".."))
 real_estate_file_path = os.path.join(project_root, "data", "cleaned_real_estate_data_numerical.csv")
+subway_file_path = os.path.join(project_root, "data", "DMTI2012_Subway.shp")
+updated_file_path = os.path.join(project_root, "data", "real_estate_data_with_subway_distance.csv")
 
-# Load the real estate dataset
-real_estate_data = pd.read_csv(real_estate_file_path)
 
-# Get the absolute path of the current script (app.py) and define the correct model path
-base_dir = os.path.dirname(os.path.abspath(__file__))
-project_root = os.path.abspath(os.path.join(base_dir, "..", ".."))
-subway_file_path = os.path.join(project_root, "data", "DMTI2012_Subway.shp")
+def load_subway_stations(file_path: str = subway_file_path,
+                         mode: str = "station") -> Union[SubwayStationIndex, SubwayLineIndex]:
+    """
+    Loads the persisted subway index, building it from the TTC subway shapefile if it is missing or outdated.
+
+    Modes:
+    - 'station': each subway LineString is represented by its midpoint (nearest station distance and station counts)
+    - 'line': the full LineString geometries are kept (exact distance to the nearest line segment)
+
+    :param file_path: path to the TTC subway shapefile
+    :param mode: 'station' or 'line'
+    :return: metric nearest-station or nearest-line index
+    """
+    if mode == "station":
+        return SubwayStationIndex.load_or_build(file_path, index_file_path)
+    if mode == "line":
+        return SubwayLineIndex.load_or_build(file_path, line_index_file_path)
+    raise ValueError(f"Unknown subway distance mode: {mode!r} (expected 'station' or 'line')")
+
 
-# Load the Toronto subway station locations
-subway_stations = gpd.read_file(subway_file_path)
+def add_subway_distance(real_estate_data: pd.DataFrame,
+                        subway_stations: Union[SubwayStationIndex, SubwayLineIndex]) -> pd.DataFrame:
+    """
+    Adds the distance (in metres) to the nearest subway station or line, and its attributes, to each real estate
+    listing. With a station index, the number of stations within 500 m and 1 km is added too.
 
-# Convert real estate listings to GeoDataFrame
-real_estate_data['geometry'] = real_estate_data.apply(lambda row: Point(row['longitude'], row['latitude']), axis=1)
-real_estate_gdf = gpd.GeoDataFrame(real_estate_data, geometry='geometry', crs=subway_stations.crs)
+    :param real_estate_data: cleaned real estate listings with latitude and longitude columns
+    :param subway_stations: subway index, as returned by load_subway_stations
+    :return: the listings with the added subway columns
+    """
+    features = subway_stations.compute_features(real_estate_data['latitude'].to_numpy(),
+                                                real_estate_data['longitude'].to_numpy())
+    for column in features.columns:
+        real_estate_data[column] = features[column].to_numpy()
+    return real_estate_data
 
-# Convert LineString geometries to representative Points (midpoints)
-subway_stations['geometry'] = subway_stations.geometry.apply(
-    lambda geom: geom.interpolate(0.5, normalized=True) if geom.geom_type == 'LineString' else geom
-)
 
-# Extract coordinates for real estate listings and subway stations
-real_estate_coords = np.array(list(zip(real_estate_gdf.geometry.x, real_estate_gdf.geometry.y)))
-subway_coords = np.array(list(zip(subway_stations.geometry.x, subway_stations.geometry.y)))
+def main(real_estate_file_path: str = real_estate_file_path, subway_file_path: str = subway_file_path,
+         updated_file_path: str = updated_file_path, mode: str = "station") -> None:
+    # Load the real estate dataset (the CSV export, with full-precision values) and the Toronto subway station locations
+    real_estate_data = pd.read_csv(real_estate_file_path)
+    subway_stations = load_subway_stations(subway_file_path, mode)
 
-# Build a KDTree for efficient nearest neighbor search
-subway_tree = cKDTree(subway_coords)
+    real_estate_data = add_subway_distance(real_estate_data, subway_stations)
 
-# Find the nearest subway station for each real estate listing
-distances, _ = subway_tree.query(real_estate_coords)
+    # Save the updated dataset with subway distance information
+    real_estate_data.to_csv(updated_file_path, index=False)
+    write_dataset(real_estate_data, dataset_dir(updated_file_path))
 
-# Add the computed distances to the dataset
-real_estate_data['distance_to_subway'] = distances
+    # Return the new file path
+    print(f"Updated dataset saved at: {updated_file_path}")
 
-# Save the updated dataset with subway distance information
-updated_file_path = "../../data/real_estate_data_with_subway_distance.csv"
-real_estate_data.to_csv(updated_file_path, index=False)
 
-# Return the new file path
-print(f"Updated dataset saved at: {updated_file_path}")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add subway distances to the cleaned real estate data.")
+    parser.add_argument("--mode", choices=["station", "line"], default="station",
+                        help="distance to the nearest station midpoint, or exact distance to the nearest subway line")
+    main(mode=parser.parse_args().mode)
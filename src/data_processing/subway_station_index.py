@@ -0,0 +1,304 @@
+"""
+Metric Nearest Subway Station and Subway Line Indexes
+
+This module answers "how far is the nearest TTC subway station" (or the nearest subway track) for large batches of
+listings, in metres.
+
+Station positions (the midpoint of each subway line segment in the TTC shapefile) and listing coordinates are projected
+to NAD83(CSRS) / MTM zone 10 (EPSG:2952), a metric projection for Toronto, so Euclidean distances in the KD-tree are
+metres. The index is built once and persisted next to the data, keyed by a hash of the shapefile, and queries run in
+parallel over all cores in fixed-size batches.
+
+Features computed per listing by SubwayStationIndex:
+- `distance_to_subway`: distance to the nearest station (m)
+- `nearest_subway_route`: route name of the nearest station
+- `subway_stations_within_500m`, `subway_stations_within_1km`: number of stations within 500 m / 1 km
+
+SubwayLineIndex keeps the full track geometry instead: it computes exact point-to-LineString distances with a bulk
+STRtree nearest query and returns the attributes of the nearest line:
+- `distance_to_subway`: distance to the nearest subway line segment (m)
+- `nearest_subway_route`, `nearest_subway_feature`, `nearest_subway_line_id`: route name, feature type (e.g. tunnel or
+  bridge) and record id of the nearest line
+"""
+import hashlib
+import os
+from functools import lru_cache
+from typing import Optional
+
+import geopandas as gpd
+import joblib
+import numpy as np
+import pandas as pd
+import shapely
+from pyproj import Transformer
+from scipy.spatial import cKDTree
+
+# Get the absolute path of the current script (app.py) and define the correct model path
+base_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(base_dir, "..", ".."))
+subway_file_path = os.path.join(project_root, "data", "DMTI2012_Subway.shp")
+index_file_path = os.path.join(project_root, "data", "subway_station_index.joblib")
+line_index_file_path = os.path.join(project_root, "data", "subway_line_index.joblib")
+
+# Metric projection used for distances: NAD83(CSRS) / MTM zone 10 (Toronto), in metres
+METRIC_CRS = "EPSG:2952"
+
+# Number of listings queried at a time
+DEFAULT_BATCH_SIZE = 1_000_000
+
+# Radii (m) for which station counts are computed
+COUNT_RADII = {"subway_stations_within_500m": 500.0, "subway_stations_within_1km": 1000.0}
+
+
+@lru_cache(maxsize=1)
+def _metric_transformer() -> Transformer:
+    return Transformer.from_crs("EPSG:4326", METRIC_CRS, always_xy=True)
+
+
+def project_to_metric(longitude, latitude) -> np.ndarray:
+    """
+    Projects WGS84 longitudes/latitudes to the metric CRS.
+
+    :param longitude: array of longitudes (degrees)
+    :param latitude: array of latitudes (degrees)
+    :return: array of projected coordinates (n x 2, metres)
+    """
+    x, y = _metric_transformer().transform(np.asarray(longitude, dtype=np.float64),
+                                           np.asarray(latitude, dtype=np.float64))
+    return np.column_stack([x, y])
+
+
+def shapefile_hash(file_path: str) -> str:
+    """
+    Hashes the geometry, attribute and projection files of a shapefile.
+
+    :param file_path: path to the .shp file
+    :return: hex digest
+    """
+    digest = hashlib.sha256()
+    root, _ = os.path.splitext(file_path)
+    for extension in (".shp", ".dbf", ".prj"):
+        if os.path.exists(root + extension):
+            with open(root + extension, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+class SubwayStationIndex:
+    """
+    KD-tree over subway station positions in a metric projection.
+
+    :param coords: station coordinates in METRIC_CRS (n_stations x 2, metres)
+    :param routes: route name of each station
+    :param source_hash: hash of the shapefile the index was built from
+    """
+
+    def __init__(self, coords: np.ndarray, routes: np.ndarray, source_hash: Optional[str] = None):
+        self.coords = np.ascontiguousarray(coords, dtype=np.float64)
+        self.routes = np.asarray(routes, dtype=object)
+        self.source_hash = source_hash
+        self.tree = cKDTree(self.coords)
+
+    @classmethod
+    def from_shapefile(cls, file_path: str = subway_file_path) -> "SubwayStationIndex":
+        """
+        Builds the index from the TTC subway shapefile, using the midpoint of each line as the station position.
+
+        :param file_path: path to the TTC subway shapefile
+        :return: the station index
+        """
+        subway_lines = gpd.read_file(file_path).to_crs(METRIC_CRS)
+        geometries = subway_lines.geometry.values
+        is_line = subway_lines.geom_type.isin(["LineString", "MultiLineString"]).to_numpy()
+        points = np.where(is_line, shapely.line_interpolate_point(geometries, 0.5, normalized=True), geometries)
+        coords = shapely.get_coordinates(points)
+        routes = subway_lines["TRS_RTE"].to_numpy() if "TRS_RTE" in subway_lines else np.full(len(coords), None)
+        return cls(coords, routes, shapefile_hash(file_path))
+
+    @classmethod
+    def load_or_build(cls, file_path: str = subway_file_path,
+                      index_path: Optional[str] = index_file_path) -> "SubwayStationIndex":
+        """
+        Loads the persisted index if it was built from the current shapefile; otherwise builds and persists it.
+
+        :param file_path: path to the TTC subway shapefile
+        :param index_path: path of the persisted index; None to never persist
+        :return: the station index
+        """
+        source_hash = shapefile_hash(file_path)
+        if index_path is not None and os.path.exists(index_path):
+            index = joblib.load(index_path)
+            if isinstance(index, cls) and index.source_hash == source_hash:
+                return index
+
+        index = cls.from_shapefile(file_path)
+        if index_path is not None:
+            joblib.dump(index, index_path)
+        return index
+
+    def query_nearest(self, longitude, latitude, k: int = 1, workers: int = -1,
+                      batch_size: int = DEFAULT_BATCH_SIZE) -> tuple:
+        """
+        Finds the k nearest stations of each location.
+
+        :param longitude: array of longitudes (degrees)
+        :param latitude: array of latitudes (degrees)
+        :param k: number of nearest stations
+        :param workers: number of parallel workers for the tree query (-1 for all cores)
+        :param batch_size: number of locations queried at a time
+        :return: tuple of (distances in metres, station indices), each of shape (n,) if k == 1 else (n, k)
+        """
+        longitude = np.asarray(longitude)
+        latitude = np.asarray(latitude)
+        shape = (len(longitude),) if k == 1 else (len(longitude), k)
+        distances = np.empty(shape, dtype=np.float64)
+        indices = np.empty(shape, dtype=np.int64)
+        for start in range(0, len(longitude), batch_size):
+            stop = start + batch_size
+            points = project_to_metric(longitude[start:stop], latitude[start:stop])
+            distances[start:stop], indices[start:stop] = self.tree.query(points, k=k, workers=workers)
+        return distances, indices
+
+    def count_within(self, longitude, latitude, radius: float, workers: int = -1,
+                     batch_size: int = DEFAULT_BATCH_SIZE) -> np.ndarray:
+        """
+        Counts the stations within a radius of each location.
+
+        :param longitude: array of longitudes (degrees)
+        :param latitude: array of latitudes (degrees)
+        :param radius: radius in metres
+        :param workers: number of parallel workers for the tree query (-1 for all cores)
+        :param batch_size: number of locations queried at a time
+        :return: array of station counts
+        """
+        longitude = np.asarray(longitude)
+        latitude = np.asarray(latitude)
+        counts = np.empty(len(longitude), dtype=np.int64)
+        for start in range(0, len(longitude), batch_size):
+            stop = start + batch_size
+            points = project_to_metric(longitude[start:stop], latitude[start:stop])
+            counts[start:stop] = self.tree.query_ball_point(points, r=radius, return_length=True, workers=workers)
+        return counts
+
+    def compute_features(self, latitude, longitude, workers: int = -1,
+                         batch_size: int = DEFAULT_BATCH_SIZE) -> pd.DataFrame:
+        """
+        Computes the subway features of each listing.
+
+        :param latitude: array of listing latitudes (degrees)
+        :param longitude: array of listing longitudes (degrees)
+        :param workers: number of parallel workers for the tree queries (-1 for all cores)
+        :param batch_size: number of listings queried at a time
+        :return: DataFrame with the nearest station distance (m), its route and the station counts within each radius
+        """
+        longitude = np.asarray(longitude)
+        latitude = np.asarray(latitude)
+        n_listings = len(longitude)
+        distances = np.empty(n_listings, dtype=np.float64)
+        indices = np.empty(n_listings, dtype=np.int64)
+        counts = {column: np.empty(n_listings, dtype=np.int64) for column in COUNT_RADII}
+
+        # Project each batch once and run every query on it
+        for start in range(0, n_listings, batch_size):
+            stop = start + batch_size
+            points = project_to_metric(longitude[start:stop], latitude[start:stop])
+            distances[start:stop], indices[start:stop] = self.tree.query(points, workers=workers)
+            for column, radius in COUNT_RADII.items():
+                counts[column][start:stop] = self.tree.query_ball_point(points, r=radius, return_length=True,
+                                                                        workers=workers)
+
+        features = pd.DataFrame({"distance_to_subway": distances, "nearest_subway_route": self.routes[indices]})
+        for column, values in counts.items():
+            features[column] = values
+        return features
+
+
+class SubwayLineIndex:
+    """
+    STRtree over the full subway line geometries in a metric projection.
+
+    :param lines: subway LineStrings in METRIC_CRS (2D)
+    :param attributes: attributes of each line (route, feature type and record id)
+    :param source_hash: hash of the shapefile the index was built from
+    """
+
+    def __init__(self, lines: np.ndarray, attributes: pd.DataFrame, source_hash: Optional[str] = None):
+        self.lines = np.asarray(lines, dtype=object)
+        self.attributes = attributes.reset_index(drop=True)
+        self.source_hash = source_hash
+        self.tree = shapely.STRtree(self.lines)
+
+    @classmethod
+    def from_shapefile(cls, file_path: str = subway_file_path) -> "SubwayLineIndex":
+        """
+        Builds the index from the TTC subway shapefile.
+
+        :param file_path: path to the TTC subway shapefile
+        :return: the line index
+        """
+        subway_lines = gpd.read_file(file_path).to_crs(METRIC_CRS)
+        lines = shapely.force_2d(subway_lines.geometry.values)
+        attributes = pd.DataFrame({
+            "nearest_subway_route": subway_lines.get("TRS_RTE"),
+            "nearest_subway_feature": subway_lines.get("FEATURE"),
+            "nearest_subway_line_id": subway_lines.get("RL_ID"),
+        })
+        return cls(np.asarray(lines), attributes, shapefile_hash(file_path))
+
+    @classmethod
+    def load_or_build(cls, file_path: str = subway_file_path,
+                      index_path: Optional[str] = line_index_file_path) -> "SubwayLineIndex":
+        """
+        Loads the persisted index if it was built from the current shapefile; otherwise builds and persists it.
+
+        :param file_path: path to the TTC subway shapefile
+        :param index_path: path of the persisted index; None to never persist
+        :return: the line index
+        """
+        source_hash = shapefile_hash(file_path)
+        if index_path is not None and os.path.exists(index_path):
+            index = joblib.load(index_path)
+            if isinstance(index, cls) and index.source_hash == source_hash:
+                return index
+
+        index = cls.from_shapefile(file_path)
+        if index_path is not None:
+            joblib.dump(index, index_path)
+        return index
+
+    def query_nearest(self, longitude, latitude, batch_size: int = DEFAULT_BATCH_SIZE) -> tuple:
+        """
+        Finds the nearest subway line of each location with one bulk STRtree query per batch.
+
+        :param longitude: array of longitudes (degrees)
+        :param latitude: array of latitudes (degrees)
+        :param batch_size: number of locations queried at a time
+        :return: tuple of (distances in metres, line indices)
+        """
+        longitude = np.asarray(longitude)
+        latitude = np.asarray(latitude)
+        distances = np.empty(len(longitude), dtype=np.float64)
+        indices = np.empty(len(longitude), dtype=np.int64)
+        for start in range(0, len(longitude), batch_size):
+            stop = start + batch_size
+            points = shapely.points(project_to_metric(longitude[start:stop], latitude[start:stop]))
+            # all_matches=False returns exactly one (the first) nearest line per point, in input order
+            (point_indices, line_indices), batch_distances = self.tree.query_nearest(
+                points, return_distance=True, all_matches=False)
+            distances[start + point_indices] = batch_distances
+            indices[start + point_indices] = line_indices
+        return distances, indices
+
+    def compute_features(self, latitude, longitude, batch_size: int = DEFAULT_BATCH_SIZE) -> pd.DataFrame:
+        """
+        Computes the distance to the nearest subway line and its attributes for each listing.
+
+        :param latitude: array of listing latitudes (degrees)
+        :param longitude: array of listing longitudes (degrees)
+        :param batch_size: number of listings queried at a time
+        :return: DataFrame with the nearest line distance (m) and the nearest line's attributes
+        """
+        distances, indices = self.query_nearest(longitude, latitude, batch_size=batch_size)
+        features = self.attributes.iloc[indices].reset_index(drop=True)
+        features.insert(0, "distance_to_subway", distances)
+        return features
@@ -0,0 +1,177 @@
+"""
+Synthetic Real Estate Listings at Scale
+
+The bundled raw feed has about 3,000 listings. This script generates any number of synthetic listings in the same
+dirty raw format (ward codes like "W13", size ranges like "500-999 sqft", "YES"/"No" and "Yes"/"N" flags, "NA"
+for missing values), so every stage of the pipeline can be stress-tested end to end at production volume.
+
+The generator is a smoothed bootstrap, i.e. a kernel density estimate of the joint distribution of the raw columns:
+1. Fit: read the raw listings and pick a kernel bandwidth for each continuous column with Silverman's rule (on a log
+   scale for the skewed maintenance fee, price and days on market; in metres for the coordinates).
+2. Each synthetic listing copies a randomly drawn real listing, which keeps the joint distribution of the
+   categorical columns (ward, beds, baths, size range, den, parking, exposure) and their missing values exactly.
+3. Its continuous columns are perturbed with kernel noise: fee, price and days on market multiplicatively, building
+   age by a small whole number of years, and latitude/longitude by a Gaussian offset, so listings stay clustered
+   around the real ones.
+
+Rows are generated and appended to the output CSV one chunk at a time, so memory use depends on the chunk size only.
+The output is fully determined by the seed and the chunk size. Synthetic ids start at 10,000,000 and never collide
+with the real 6-digit ids.
+
+Usage:
+    python -m src.data_processing.synthetic_listings --rows 10000000 [--chunk-size 500000] [--seed 42] [--output PATH]
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# Get the absolute path of the current script (app.py) and define the correct model path
+base_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(base_dir, "..", ".."))
+file_path = os.path.join(project_root, "data", "real-estate-data.csv")
+output_path = os.path.join(project_root, "data", "synthetic", "real-estate-data-synthetic.csv")
+
+# Raw columns copied from the drawn listing as they are
+CATEGORICAL_COLUMNS = ["ward", "beds", "baths", "DEN", "size", "parking", "exposure"]
+# Raw columns perturbed multiplicatively (kernel on log1p scale)
+LOG_SCALE_COLUMNS = ["maint", "price", "D_mkt"]
+
+# Synthetic ids start here (the real ids have 6 digits)
+ID_OFFSET = 10_000_000
+
+# Prices are listed in whole thousands
+PRICE_ROUNDING = 1000
+
+# Metres per degree of latitude
+METRES_PER_DEGREE = 111_320.0
+
+DEFAULT_CHUNK_SIZE = 500_000
+
+
+def silverman_bandwidth(values: np.ndarray) -> float:
+    """
+    Silverman's rule-of-thumb bandwidth of a 1-D Gaussian kernel density estimate.
+
+    :param values: observed values (NaN ignored)
+    :return: bandwidth, in the units of the values
+    """
+    values = values[~np.isnan(values)]
+    if len(values) < 2:
+        return 0.0
+    spread = min(np.std(values, ddof=1), np.subtract(*np.percentile(values, [75, 25])) / 1.34)
+    return 0.9 * spread * len(values) ** (-1 / 5)
+
+
+class SyntheticListingGenerator:
+    """
+    Smoothed-bootstrap generator of raw real estate listings.
+
+    :param raw: raw listings as strings (the bundled feed, read with keep_default_na=False)
+    """
+
+    def __init__(self, raw: pd.DataFrame):
+        self.columns = list(raw.columns)
+        self.size = len(raw)
+        numeric = {column: pd.to_numeric(raw[column], errors="coerce").to_numpy(dtype=np.float64)
+                   for column in LOG_SCALE_COLUMNS + ["building_age", "lt", "lg"]}
+
+        # Categorical columns as category codes, so drawing listings is an integer take
+        self.categories = {column: pd.Categorical(raw[column]) for column in CATEGORICAL_COLUMNS}
+
+        # Continuous columns, with their kernel bandwidths
+        self.log_values = {column: np.log1p(numeric[column]) for column in LOG_SCALE_COLUMNS}
+        self.log_bandwidths = {column: silverman_bandwidth(self.log_values[column]) for column in LOG_SCALE_COLUMNS}
+        self.building_age = numeric["building_age"]
+        self.building_age_bandwidth = silverman_bandwidth(self.building_age)
+        self.latitude, self.longitude = numeric["lt"], numeric["lg"]
+        metres_per_degree_longitude = METRES_PER_DEGREE * np.cos(np.radians(np.nanmean(self.latitude)))
+        self.coordinate_bandwidth = min(silverman_bandwidth(self.latitude * METRES_PER_DEGREE),
+                                        silverman_bandwidth(self.longitude * metres_per_degree_longitude))
+        self.metres_per_degree_longitude = metres_per_degree_longitude
+
+    @classmethod
+    def from_raw_file(cls, file_path: str = file_path) -> "SyntheticListingGenerator":
+        """
+        Fits the generator to a raw real estate CSV.
+
+        :param file_path: path to the raw real estate CSV
+        :return: the fitted generator
+        """
+        return cls(pd.read_csv(file_path, dtype=str, keep_default_na=False))
+
+    def generate_chunk(self, rng: np.random.Generator, first_id: int, size: int) -> pd.DataFrame:
+        """
+        Generates one chunk of synthetic raw listings.
+
+        :param rng: random generator
+        :param first_id: id of the first listing of the chunk
+        :param size: number of listings
+        :return: listings with the raw columns; missing values as NaN/NA (written as "NA")
+        """
+        drawn = rng.integers(0, self.size, size)
+        chunk = {self.columns[0]: np.arange(first_id, first_id + size, dtype=np.int64)}
+
+        for column, categorical in self.categories.items():
+            chunk[column] = pd.Categorical.from_codes(categorical.codes[drawn], categorical.categories)
+
+        noisy = {}
+        for column in LOG_SCALE_COLUMNS:
+            noise = rng.standard_normal(size) * self.log_bandwidths[column]
+            noisy[column] = np.maximum(np.expm1(self.log_values[column][drawn] + noise), 0)
+        chunk["maint"] = pd.array(np.round(noisy["maint"]), dtype="Int64")
+        chunk["price"] = pd.array(np.round(noisy["price"] / PRICE_ROUNDING) * PRICE_ROUNDING, dtype="Int64")
+        chunk["D_mkt"] = pd.array(np.round(noisy["D_mkt"]), dtype="Int64")
+
+        age_noise = np.round(rng.standard_normal(size) * self.building_age_bandwidth)
+        chunk["building_age"] = pd.array(np.maximum(self.building_age[drawn] + age_noise, 0), dtype="Int64")
+
+        offsets = rng.standard_normal((size, 2)) * self.coordinate_bandwidth
+        chunk["lt"] = self.latitude[drawn] + offsets[:, 0] / METRES_PER_DEGREE
+        chunk["lg"] = self.longitude[drawn] + offsets[:, 1] / self.metres_per_degree_longitude
+
+        return pd.DataFrame(chunk, columns=self.columns)
+
+    def write(self, output_path: str, n_rows: int, chunk_size: int = DEFAULT_CHUNK_SIZE, seed: int = 42) -> int:
+        """
+        Streams synthetic listings to a raw-format CSV, one chunk at a time.
+
+        :param output_path: path of the CSV to write (replaced if it exists)
+        :param n_rows: number of listings
+        :param chunk_size: number of listings generated and written at a time
+        :param seed: random seed
+        :return: number of listings written
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        rng = np.random.default_rng(seed)
+        written = 0
+        with open(output_path, "w", newline="", encoding="utf-8") as f:
+            f.write(",".join(self.columns) + "\n")
+            while written < n_rows:
+                size = min(chunk_size, n_rows - written)
+                chunk = self.generate_chunk(rng, ID_OFFSET + written, size)
+                chunk.to_csv(f, header=False, index=False, na_rep="NA")
+                written += size
+        return written
+
+
+def main(file_path: str = file_path, output_path: str = output_path, n_rows: int = 10_000_000,
+         chunk_size: int = DEFAULT_CHUNK_SIZE, seed: int = 42) -> None:
+    generator = SyntheticListingGenerator.from_raw_file(file_path)
+    start = time.perf_counter()
+    written = generator.write(output_path, n_rows, chunk_size, seed)
+    duration = time.perf_counter() - start
+    print(f"{written:,} synthetic listings saved at: {output_path} ({written / duration:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic raw real estate listings.")
+    parser.add_argument("--rows", type=int, default=10_000_000, help="number of listings to generate")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="listings generated and written at a time (bounds memory use)")
+    parser.add_argument("--seed", type=int, default=42, help="random seed")
+    parser.add_argument("--output", default=output_path, help="output CSV path")
+    args = parser.parse_args()
+    main(output_path=args.output, n_rows=args.rows, chunk_size=args.chunk_size, seed=args.seed)
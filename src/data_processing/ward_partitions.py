@@ -0,0 +1,48 @@
+"""
+Ward-Partitioned Real Estate Dataset
+
+This script splits the cleaned real estate dataset by ward (and optionally by size group) on disk, so per-ward queries
+and per-ward models read only their own partition instead of the whole dataset.
+
+Steps:
+1. Load the cleaned numerical dataset.
+2. Group the listings by `ward_num` (and `size_group` with `--by-size-group`).
+3. Write each group as its own typed columnar dataset under `data/cleaned_real_estate_data_by_ward/`, in directories
+   named after the partition values (`ward_num=3/`, or `ward_num=3/size_group=1/`; see storage.py).
+
+Usage:
+    python -m src.data_processing.ward_partitions [--by-size-group]
+
+Load one ward with `storage.load_partition(partitioned_path, {"ward_num": 3})`.
+"""
+import argparse
+import os
+
+from src.data_processing.storage import load_dataset, write_partitioned_dataset
+
+# Get the absolute path of the current script (app.py) and define the correct model path
+base_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(base_dir, "..", ".."))
+file_path = os.path.join(project_root, "data", "cleaned_real_estate_data_numerical.csv")
+partitioned_path = os.path.join(project_root, "data", "cleaned_real_estate_data_by_ward")
+
+# Partition columns, outermost first
+WARD_PARTITIONS = ["ward_num"]
+WARD_SIZE_PARTITIONS = ["ward_num", "size_group"]
+
+
+def main(file_path: str = file_path, output_dir: str = partitioned_path, by_size_group: bool = False) -> None:
+    # Load the cleaned real estate dataset
+    df = load_dataset(file_path)
+
+    partition_by = WARD_SIZE_PARTITIONS if by_size_group else WARD_PARTITIONS
+    written = write_partitioned_dataset(df, output_dir, partition_by)
+    print(f"{len(df)} listings partitioned by {', '.join(partition_by)} into {len(written)} partitions "
+          f"({min(written.values())}-{max(written.values())} listings each) at: {output_dir}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Partition the cleaned real estate dataset by ward on disk.")
+    parser.add_argument("--by-size-group", action="store_true", help="also partition each ward by size group")
+    args = parser.parse_args()
+    main(by_size_group=args.by_size_group)
@@ -0,0 +1,130 @@
+"""
+Content Hashes of Files and Source Code
+
+Small hashing helpers shared by the pipeline runner (see pipeline.py) and the scripts that cache their own results
+(the figure cache of visualization/render_all.py and the evaluation cache of visualization/evaluate_models.py):
+- `hash_path` hashes the content of a file or directory.
+- `code_hash` hashes the source of a module and of every `src` module it imports, so a change to a shared helper
+  invalidates every result computed with it.
+- `output_signature` summarizes output files by size and modification time, to detect outputs changed outside the
+  script that wrote them without re-hashing them.
+"""
+import ast
+import hashlib
+import importlib.util
+import os
+from typing import Optional
+
+# Get the absolute path of the current script (app.py) and define the correct model path
+base_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(base_dir, ".."))
+
+
+def hash_path(path: str, block_size: int = 1 << 20) -> Optional[str]:
+    """
+    Hashes the content of a file, or of every file in a directory (recursively, in sorted order).
+
+    :param path: file or directory
+    :param block_size: number of bytes read at a time
+    :return: hex digest, or None if the path does not exist
+    """
+    if os.path.isdir(path):
+        files = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+    elif os.path.exists(path):
+        files = [path]
+    else:
+        return None
+
+    digest = hashlib.sha256()
+    for file in files:
+        digest.update(os.path.relpath(file, path).encode())
+        with open(file, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def _module_file(module_name: str) -> Optional[str]:
+    # Source file of a src module (None for names that are not modules, e.g. a function imported from a module)
+    path = os.path.join(project_root, *module_name.split("."))
+    for candidate in (path + ".py", os.path.join(path, "__init__.py")):
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def _src_imports(module_name: str, module_file: str) -> list:
+    # Names of the src modules imported anywhere in a module (including inside functions), and of the names imported
+    # from them
+    with open(module_file, "rb") as f:
+        tree = ast.parse(f.read(), module_file)
+    package = module_name if module_file.endswith("__init__.py") else module_name.rpartition(".")[0]
+    names = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = (importlib.util.resolve_name("." * node.level + (node.module or ""), package) if node.level
+                    else node.module)
+            names.append(base)
+            names.extend(f"{base}.{alias.name}" for alias in node.names)
+    return [name for name in names if name == "src" or name.startswith("src.")]
+
+
+def module_sources(module_name: str) -> list:
+    """
+    Lists the source files of a module and of every `src` module it imports, directly or indirectly (found by reading
+    the import statements, without importing anything).
+
+    :param module_name: e.g. 'src.data_processing.data_cleaning'
+    :return: sorted source file paths
+    """
+    sources, pending, seen = set(), [module_name], set()
+    while pending:
+        name = pending.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        if "." in name:
+            pending.append(name.rpartition(".")[0])  # importing a module runs its packages' __init__ first
+        module_file = _module_file(name)
+        if module_file is not None:
+            sources.add(module_file)
+            pending.extend(_src_imports(name, module_file))
+    return sorted(sources)
+
+
+def code_hash(module_name: str) -> str:
+    """
+    Hashes the source of a module and of every `src` module it imports (directly, indirectly or inside functions), so
+    a change to a shared helper invalidates every result computed with it.
+
+    :param module_name: e.g. 'src.data_processing.data_cleaning'
+    :return: hex digest
+    """
+    digest = hashlib.sha256()
+    for source in module_sources(module_name):
+        digest.update(os.path.relpath(source, project_root).encode())
+        digest.update(str(hash_path(source)).encode())
+    return digest.hexdigest()
+
+
+def output_signature(paths: list) -> list:
+    """
+    Summarizes the outputs of a stage by file sizes and modification times, so outputs changed or replaced outside
+    the pipeline are detected without re-hashing them.
+
+    :param paths: output files or directories
+    :return: list of [path, size, modification time] entries; None entries for missing paths
+    """
+    signature = []
+    for path in paths:
+        files = (sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+                 if os.path.isdir(path) else [path])
+        for file in files:
+            if os.path.exists(file):
+                stat = os.stat(file)
+                signature.append([file, stat.st_size, stat.st_mtime_ns])
+            else:
+                signature.append([file, None, None])
+    return signature
@@ -0,0 +1,356 @@
+"""
+Stage and Model Instrumentation
+
+Records how long each pipeline stage and each model fit/predict takes and how much memory it uses, cheaply enough to
+stay on in production (about 10 µs per measured span, about 0.1 ms with the span's own memory peak; standard library
+only).
+
+Each measured span records:
+- `wall_s`: elapsed wall-clock time (s)
+- `cpu_s`: CPU time of the process (user + system, all threads) while the span was open (s)
+- `peak_rss_bytes`: peak resident memory of the process while the span was open. On Linux the kernel's peak counter
+  (VmHWM) is reset when a span starts, so this is the peak of the span itself; elsewhere it is the peak since the
+  process started. Spans measured with `memory=False` skip the reset and report the process peak.
+- `rows`: rows processed (rows loaded by `storage.load_dataset` inside the span, or set by the caller)
+
+Steps:
+1. Wrap a stage or a model call in `measure(name, kind)`; the span is timed and its memory tracked.
+2. Every finished span is added to the in-process registry (aggregated per kind and name), which the prediction
+   service exposes on `/metrics`.
+3. Entry points that want a persistent record (the pipeline and the model training scripts) call `enable_log`, and
+   their spans are then also appended as JSON lines to `data/metrics/instrumentation.jsonl` (from every process,
+   including the pipeline's workers), unless measured with `log=False`. Library code imported elsewhere (the web app,
+   the prediction service, benchmarks) does not write the file. Setting the `INSTRUMENTATION_LOG` environment variable
+   to a path enables the log for any process. The log is rotated to `instrumentation.jsonl.1` once it reaches
+   MAX_LOG_BYTES.
+4. `write_prometheus` aggregates the JSON log into a Prometheus text exposition, `data/metrics/instrumentation.prom`,
+   for the node exporter's textfile collector (the pipeline refreshes it after each run).
+
+Usage:
+    python -m src.instrumentation [--log FILE] [--output FILE]
+"""
+import argparse
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# Get the absolute path of the current script (app.py) and define the correct model path
+base_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(base_dir, ".."))
+default_log_path = os.path.join(project_root, "data", "metrics", "instrumentation.jsonl")
+# Active span log (None: spans are only added to the in-process registry), see enable_log
+log_path = os.environ.get("INSTRUMENTATION_LOG") or None
+prometheus_path = os.path.join(project_root, "data", "metrics", "instrumentation.prom")
+
+# Size at which the span log is rotated (the previous log is kept as a single backup)
+MAX_LOG_BYTES = 16 * 1024 * 1024
+
+# Prefix of the exported metric names
+METRIC_PREFIX = "real_estate"
+
+# Linux files exposing (VmHWM in /proc/self/status) and resetting (writing "5" to clear_refs) the peak RSS
+STATUS_FILE = "/proc/self/status"
+CLEAR_REFS_FILE = "/proc/self/clear_refs"
+
+
+def _read_status(field: str) -> Optional[int]:
+    # Memory counter of this process from /proc (Linux), in bytes
+    try:
+        with open(STATUS_FILE, "rb") as f:
+            for line in f:
+                if line.startswith(field):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _process_peak_rss() -> Optional[int]:
+    # Peak since the process started (or since the last reset on Linux), without reading /proc
+    if resource is None:
+        return None
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _read_peak_rss() -> Optional[int]:
+    """
+    :return: peak resident memory of the process since it started or since the last reset (bytes), or None
+    """
+    peak = _read_status(b"VmHWM:")
+    return peak if peak is not None else _process_peak_rss()
+
+
+def current_rss() -> Optional[int]:
+    """
+    :return: current resident memory of the process (bytes), or its peak where the current value is not available
+    """
+    current = _read_status(b"VmRSS:")
+    return current if current is not None else _process_peak_rss()
+
+
+def _reset_peak_rss() -> bool:
+    try:
+        with open(CLEAR_REFS_FILE, "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+@dataclass
+class Span:
+    """
+    One measured stage or model call.
+
+    :param name: stage or model name
+    :param kind: 'stage', 'fit', 'predict', ...
+    :param rows: rows processed
+    :param labels: extra labels (e.g. the script a fit ran in)
+    """
+    name: str
+    kind: str = "stage"
+    rows: int = 0
+    labels: dict = field(default_factory=dict)
+    started: float = 0.0
+    wall_s: float = 0.0
+    cpu_s: float = 0.0
+    peak_rss_bytes: Optional[int] = None
+    status: str = "ok"
+    pid: int = 0
+
+    def add_rows(self, rows: int) -> None:
+        self.rows += int(rows)
+
+
+class Registry:
+    """
+    Aggregates finished spans per (kind, name).
+    """
+
+    def __init__(self):
+        self.totals = {}
+        self._lock = threading.Lock()
+
+    def add(self, span: dict) -> None:
+        """
+        :param span: finished span, as a dictionary (see Span)
+        """
+        key = (span["kind"], span["name"])
+        with self._lock:
+            total = self.totals.setdefault(key, {"runs": 0, "failures": 0, "wall_s": 0.0, "cpu_s": 0.0, "rows": 0,
+                                                 "peak_rss_bytes": 0, "last_wall_s": 0.0, "last_started": 0.0})
+            total["runs"] += 1
+            total["failures"] += span["status"] != "ok"
+            total["wall_s"] += span["wall_s"]
+            total["cpu_s"] += span["cpu_s"]
+            total["rows"] += span["rows"]
+            total["peak_rss_bytes"] = max(total["peak_rss_bytes"], span["peak_rss_bytes"] or 0)
+            if span["started"] >= total["last_started"]:
+                total["last_wall_s"], total["last_started"] = span["wall_s"], span["started"]
+
+    def summary(self) -> list:
+        """
+        :return: one dictionary per (kind, name), with the totals of its spans
+        """
+        with self._lock:
+            return [{"kind": kind, "name": name, **total} for (kind, name), total in sorted(self.totals.items())]
+
+    def to_prometheus(self) -> str:
+        """
+        Renders the totals in the Prometheus text exposition format.
+        """
+        metrics = [
+            ("runs_total", "counter", "Number of measured spans.", "runs"),
+            ("failures_total", "counter", "Number of spans that raised an exception.", "failures"),
+            ("wall_seconds_total", "counter", "Total wall-clock time of the spans.", "wall_s"),
+            ("cpu_seconds_total", "counter", "Total process CPU time during the spans.", "cpu_s"),
+            ("rows_total", "counter", "Total rows processed by the spans.", "rows"),
+            ("peak_rss_bytes", "gauge", "Largest peak resident memory of the process during a span.",
+             "peak_rss_bytes"),
+            ("last_wall_seconds", "gauge", "Wall-clock time of the most recent span.", "last_wall_s"),
+            ("last_run_timestamp_seconds", "gauge", "Start time of the most recent span (Unix time).",
+             "last_started"),
+        ]
+        summary = self.summary()
+        lines = []
+        for suffix, metric_type, description, column in metrics:
+            metric_name = f"{METRIC_PREFIX}_span_{suffix}"
+            lines.append(f"# HELP {metric_name} {description}")
+            lines.append(f"# TYPE {metric_name} {metric_type}")
+            for total in summary:
+                labels = ",".join(f'{label}="{_escape(total[label])}"' for label in ("kind", "name"))
+                lines.append(f"{metric_name}{{{labels}}} {total[column]:.17g}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# Spans of this process, for the /metrics endpoint of long-running processes
+registry = Registry()
+
+# Innermost open span of the current thread or task
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+# Open spans tracking memory (all threads): their peak is folded in before the kernel counter is reset
+_memory_spans = []
+_memory_lock = threading.Lock()
+
+
+def _fold_peak_rss() -> Optional[int]:
+    # Called with _memory_lock held
+    peak = _read_peak_rss()
+    if peak is not None:
+        for span in _memory_spans:
+            span.peak_rss_bytes = max(span.peak_rss_bytes or 0, peak)
+    return peak
+
+
+def add_rows(rows: int) -> None:
+    """
+    Adds processed rows to the innermost open span (no-op outside of a span).
+    """
+    span = _current_span.get()
+    if span is not None:
+        span.add_rows(rows)
+
+
+def enable_log(path: Optional[str] = None) -> str:
+    """
+    Appends the spans of this process, and of the processes it starts, to a JSON Lines log.
+
+    :param path: log file; the `INSTRUMENTATION_LOG` environment variable or data/metrics/instrumentation.jsonl if None
+    :return: the log file
+    """
+    global log_path
+    log_path = path or os.environ.get("INSTRUMENTATION_LOG") or default_log_path
+    os.environ["INSTRUMENTATION_LOG"] = log_path  # inherited by worker processes
+    return log_path
+
+
+def _active_log_path() -> str:
+    return log_path or default_log_path
+
+
+def _write_log(span: dict) -> None:
+    if not log_path:
+        return
+    try:
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        if os.path.exists(log_path) and os.path.getsize(log_path) >= MAX_LOG_BYTES:
+            os.replace(log_path, log_path + ".1")
+        with open(log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(span) + "\n")
+    except OSError:
+        pass  # instrumentation never breaks the measured code
+
+
+@contextmanager
+def measure(name: str, kind: str = "stage", rows: int = 0, memory: bool = True, log: bool = True,
+            **labels) -> Iterator[Span]:
+    """
+    Measures the wall time, CPU time, peak RSS and rows of the code in the block.
+
+    :param name: stage or model name
+    :param kind: 'stage', 'fit', 'predict', ...
+    :param rows: rows processed (more can be added with span.add_rows or add_rows)
+    :param memory: reset the kernel's peak RSS counter so the span gets its own peak (Linux only)
+    :param log: append the span to the JSON log (disable for very frequent spans, e.g. per request)
+    :param labels: extra labels stored with the span in the JSON log
+    :return: the span, filled in when the block exits
+    """
+    span = Span(name=name, kind=kind, rows=rows, labels=labels, started=time.time(), pid=os.getpid())
+    if memory:
+        with _memory_lock:
+            _fold_peak_rss()
+            _memory_spans.append(span)
+            span.peak_rss_bytes = _read_peak_rss() if _reset_peak_rss() else None
+    token = _current_span.set(span)
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield span
+    except BaseException:
+        span.status = "failed"
+        raise
+    finally:
+        span.wall_s = time.perf_counter() - wall_start
+        span.cpu_s = time.process_time() - cpu_start
+        _current_span.reset(token)
+        if memory:
+            with _memory_lock:
+                _fold_peak_rss()
+                _memory_spans.remove(span)
+        else:
+            span.peak_rss_bytes = _process_peak_rss()
+
+        record = {**span.__dict__, "labels": dict(span.labels)}
+        registry.add(record)
+        if log:
+            _write_log(record)
+
+
+def read_log(log_path: str = default_log_path) -> list:
+    """
+    Reads the spans of the JSON log.
+
+    :param log_path: JSON Lines span log
+    :return: list of spans (dictionaries)
+    """
+    spans = []
+    if log_path and os.path.exists(log_path):
+        with open(log_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    spans.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue  # a line cut short by an interruption
+    return spans
+
+
+def write_prometheus(log_path: Optional[str] = None, output_path: str = prometheus_path) -> Registry:
+    """
+    Aggregates the spans of the JSON log (all processes) into a Prometheus text exposition file.
+
+    :param log_path: JSON Lines span log (the active log, or data/metrics/instrumentation.jsonl, if None)
+    :param output_path: .prom file (written atomically, as the textfile collector expects)
+    :return: the aggregated registry
+    """
+    aggregated = Registry()
+    for span in read_log(log_path or _active_log_path()):
+        aggregated.add(span)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(aggregated.to_prometheus())
+    os.replace(output_path + ".tmp", output_path)
+    return aggregated
+
+
+def main(log_path: Optional[str] = None, output_path: str = prometheus_path) -> None:
+    aggregated = write_prometheus(log_path, output_path)
+    print(f"{'kind':<8} {'name':<36} {'runs':>5} {'wall s':>9} {'cpu s':>9} {'peak MB':>8} {'rows':>10}")
+    for total in aggregated.summary():
+        print(f"{total['kind']:<8} {total['name'][:36]:<36} {total['runs']:>5} {total['wall_s']:>9.3f} "
+              f"{total['cpu_s']:>9.3f} {total['peak_rss_bytes'] / 1e6:>8.1f} {total['rows']:>10}")
+    print(f"Prometheus metrics saved at: {output_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize the instrumentation log and export it for Prometheus.")
+    parser.add_argument("--log", default=None, help="JSON Lines span log (default: data/metrics/instrumentation.jsonl)")
+    parser.add_argument("--output", default=prometheus_path, help="Prometheus text exposition file")
+    args = parser.parse_args()
+    main(args.log, args.output)
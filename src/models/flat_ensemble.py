@@ -0,0 +1,185 @@
+"""
+Flattened-Array Inference Engine for the Gradient Boosting Model
+
+scikit-learn's `GradientBoostingRegressor.predict` validates its input, converts it to a float32 array and walks 100
+separate tree objects on every call, which costs about a millisecond for a single listing. This module flattens the
+trained ensemble into contiguous NumPy arrays (split feature, threshold, left/right child and leaf value of every node
+of every tree) and evaluates rows directly from them, without building a DataFrame.
+
+The predictions are identical to scikit-learn's (not just close):
+- features are rounded to float32 and compared with the float64 thresholds using `<=`, as in scikit-learn's trees
+- predictions start from the model's initial (mean) prediction and add `learning_rate * leaf value` tree by tree, in
+  the same order and with the same float64 arithmetic
+
+Leaves point to themselves, so a batch is evaluated by stepping every (row, tree) pair `max_depth` times.
+
+Usage:
+    python -m src.models.flat_ensemble   # exports real_estate_model.pkl to real_estate_model_flat.npz
+"""
+import os
+from array import array
+from typing import Optional, Sequence
+
+import numpy as np
+
+# Get the absolute path of the current script (app.py) and define the correct model path
+base_dir = os.path.dirname(os.path.abspath(__file__))
+model_path = os.path.join(base_dir, "real_estate_model.pkl")
+flat_model_path = os.path.join(base_dir, "real_estate_model_flat.npz")
+
+
+class FlatEnsemble:
+    """
+    A gradient boosting regression ensemble stored as flat node arrays.
+
+    :param feature: split feature of every node (0 for leaves)
+    :param threshold: split threshold of every node (+inf for leaves)
+    :param left: index of the left child of every node (the node itself for leaves)
+    :param right: index of the right child of every node (the node itself for leaves)
+    :param value: leaf value of every node
+    :param roots: index of the root node of every tree, in boosting order
+    :param baseline: initial prediction of the ensemble (before the first tree)
+    :param learning_rate: shrinkage applied to every tree
+    :param max_depth: depth of the deepest tree
+    :param feature_names: feature order expected by the model, if known
+    """
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, left: np.ndarray, right: np.ndarray,
+                 value: np.ndarray, roots: np.ndarray, baseline: float, learning_rate: float, max_depth: int,
+                 feature_names: Optional[Sequence[str]] = None):
+        # Arrays already in these types (e.g. memory-mapped from a model artifact) are used as they are, not copied
+        self.feature = np.ascontiguousarray(feature, dtype=np.intp)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.left = np.ascontiguousarray(left, dtype=np.intp)
+        self.right = np.ascontiguousarray(right, dtype=np.intp)
+        self.value = np.ascontiguousarray(value, dtype=np.float64)
+        self.roots = np.ascontiguousarray(roots, dtype=np.intp)
+        self.baseline = float(baseline)
+        self.learning_rate = float(learning_rate)
+        self.max_depth = int(max_depth)
+        self.feature_names = list(feature_names) if feature_names is not None else None
+
+        # Plain Python copies of the nodes for the single-row path, built on its first call (see predict_one)
+        self._tables = None
+
+    @classmethod
+    def from_model(cls, model) -> "FlatEnsemble":
+        """
+        Flattens a trained single-output GradientBoostingRegressor.
+
+        :param model: trained scikit-learn GradientBoostingRegressor
+        :return: the flattened ensemble
+        """
+        if model.estimators_.shape[1] != 1:
+            raise ValueError("Only single-output gradient boosting regressors can be flattened.")
+        if getattr(model.init_, "constant_", None) is None:
+            raise ValueError("Only models with the default (constant) initial estimator can be flattened.")
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset, max_depth = 0, 0
+        for estimator in model.estimators_[:, 0]:
+            tree = estimator.tree_
+            is_leaf = tree.children_left == -1
+            own_index = np.arange(tree.node_count) + offset
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, own_index, tree.children_left + offset))
+            rights.append(np.where(is_leaf, own_index, tree.children_right + offset))
+            values.append(tree.value[:, 0, 0])
+            roots.append(offset)
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(np.concatenate(features), np.concatenate(thresholds), np.concatenate(lefts),
+                   np.concatenate(rights), np.concatenate(values), np.array(roots),
+                   baseline=float(np.ravel(model.init_.constant_)[0]), learning_rate=model.learning_rate,
+                   max_depth=max_depth, feature_names=getattr(model, "feature_names_in_", None))
+
+    def predict(self, X) -> np.ndarray:
+        """
+        Predicts a batch of rows.
+
+        :param X: 2-D array-like of shape (n_rows, n_features), columns in the model's feature order
+        :return: float64 predictions of shape (n_rows,)
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2:
+            raise ValueError("X must be a 2-D array of shape (n_rows, n_features).")
+
+        flat_X = X.ravel()
+        row_offsets = np.arange(len(X))[:, None] * X.shape[1]
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.max_depth):
+            goes_left = flat_X[row_offsets + self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(goes_left, self.left[nodes], self.right[nodes])
+
+        # Sum the baseline and the trees sequentially, in order, so the float64 rounding matches scikit-learn exactly
+        terms = np.empty((len(X), len(self.roots) + 1))
+        terms[:, 0] = self.baseline
+        terms[:, 1:] = self.learning_rate * self.value[nodes]
+        return np.cumsum(terms, axis=1)[:, -1]
+
+    def _single_row_tables(self) -> tuple:
+        if self._tables is None:
+            nodes = list(zip(self.feature.tolist(), self.threshold.tolist(), self.left.tolist(), self.right.tolist()))
+            self._tables = nodes, (self.learning_rate * self.value).tolist(), self.roots.tolist()
+        return self._tables
+
+    def predict_one(self, row: Sequence[float]) -> float:
+        """
+        Predicts a single row with plain Python arithmetic (microseconds per call).
+
+        The first call copies the nodes into Python lists (list indexing is much faster than NumPy scalar indexing),
+        so a process predicting single rows holds a private copy of the ensemble; `predict` walks the arrays as they
+        are and shares memory-mapped pages with every other process serving the model.
+
+        :param row: feature values in the model's feature order
+        :return: predicted listing price
+        """
+        # Round to float32 first, as scikit-learn does, so the threshold comparisons agree exactly
+        x = array("f", row).tolist()
+        nodes, scaled_value, roots = self._single_row_tables()
+        prediction = self.baseline
+        for node in roots:
+            feature, threshold, left, right = nodes[node]
+            while left != node:
+                node = left if x[feature] <= threshold else right
+                feature, threshold, left, right = nodes[node]
+            prediction += scaled_value[node]
+        return prediction
+
+    def save(self, file_path: str) -> None:
+        """
+        Saves the flattened ensemble as an uncompressed NumPy archive.
+
+        :param file_path: path of the .npz file
+        """
+        np.savez(file_path, feature=self.feature, threshold=self.threshold, left=self.left, right=self.right,
+                 value=self.value, roots=self.roots, baseline=self.baseline, learning_rate=self.learning_rate,
+                 max_depth=self.max_depth, feature_names=np.array(self.feature_names or [], dtype=str))
+
+    @classmethod
+    def load(cls, file_path: str) -> "FlatEnsemble":
+        """
+        Loads a flattened ensemble saved with save.
+
+        :param file_path: path of the .npz file
+        :return: the flattened ensemble
+        """
+        with np.load(file_path) as archive:
+            feature_names = archive["feature_names"].tolist() or None
+            return cls(archive["feature"], archive["threshold"], archive["left"], archive["right"],
+                       archive["value"], archive["roots"], float(archive["baseline"]),
+                       float(archive["learning_rate"]), int(archive["max_depth"]), feature_names)
+
+
+def main(model_path: str = model_path, flat_model_path: str = flat_model_path) -> None:
+    import joblib
+
+    flat_model = FlatEnsemble.from_model(joblib.load(model_path))
+    flat_model.save(flat_model_path)
+    print(f"Flattened model saved as {flat_model_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,49 +5,350 @@ This script loads a cleaned real estate dataset, trains a Gradient Boosting Regr
 and evaluates its performance in predicting listing prices.
 
 Steps:
-1. Load the dataset from a CSV file.
+1. Load the dataset (typed columnar storage, falling back to the CSV file).
 2. Define features (independent variables) and target (dependent variable).
 3. Split the data into training (80%) and testing (20%) sets.
-4. Train a Gradient Boosting Regressor model on the training set.
+4. Train a Gradient Boosting Regressor model on the training set (with the tuned hyperparameters of
+   `best_hyperparameters.json` when `hyperparameter_tuning.py` has written them).
 5. Make predictions on the test set.
 6. Evaluate the model's performance using R² Score and Mean Absolute Error (MAE).
+7. Save the model, both as a pickle and as a versioned model artifact with its feature schema, training data hash
+   and metrics (see model_artifact.py).
+8. Optionally (`--grid`), precompute the web app's predictions over its discrete input grid.
+
+Incremental refresh (`--refresh`): when new listings have been appended to the dataset (see incremental_ingest.py),
+the deployed model is warm-started instead of retrained from scratch:
+1. Load the model artifact; it records the keys (a hash of the id and values) of the listings the model has seen, so
+   the rows with other keys are the new or changed listings, wherever they are in the dataset (which may have been
+   compacted, re-cleaned or reordered since).
+2. Hold out the newest (last in dataset order) `--holdout-fraction` of the new listings as a validation window.
+3. Continue boosting: add `--refresh-stages` trees fitted to the residuals of the current model on all the other
+   listings except the test listings of the last full retrain (recorded in the artifact), a fraction of the cost of
+   fitting every tree again. The test listings stay held out, so the test metrics remain a held-out score.
+4. Check the refreshed model on the held-out window. If its MAE is more than `--tolerance` worse than the previous
+   model's on the same window, or than the test MAE of the last full retrain, or the model has grown past
+   MAX_STAGES_FACTOR times its original size, fall back to a full retrain on the whole dataset.
+5. Save the model and artifact as above (the artifact keeps the test metrics of the last full retrain and adds the
+   held-out window's). The listings of the held-out window count as seen: later refreshes start after them, and they
+   are trained on at the next full retrain.
+
+Out-of-core training (`--out-of-core`): for datasets larger than memory, the dataset is streamed in batches (see
+out_of_core.py) instead of loaded. The model is fitted on a uniform sample of at most `--sample-rows` training listings
+drawn in one pass, and scored batch by batch on the streaming holdout (listings selected by a hash of their id).
 
 Author: Vennise Ho
 Date: 2025-03-01
 Generated with assistance from ChatGPT (OpenAI)
 """
+import argparse
+import copy
+import json
 import os
+import time
+import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.metrics import mean_absolute_error, r2_score
 import joblib
 
+from src.data_processing.storage import iter_batches, load_dataset
+from src.instrumentation import enable_log, measure
+from src.models.model_artifact import ModelArtifact, artifact_hash, artifact_path, save_artifact
+from src.models.out_of_core import (DEFAULT_BATCH_SIZE, DEFAULT_SAMPLE_ROWS, evaluate_holdout, is_holdout,
+                                   sample_training_rows)
+from src.models.prediction_grid import PredictionGrid
+
 # Get the absolute path of the current script (app.py) and define the correct model path
 base_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(base_dir, "..", ".."))
 file_path = os.path.join(project_root, "data", "cleaned_real_estate_data_numerical.csv")
-
-# Load dataset
-df = pd.read_csv(file_path)
+model_path = os.path.join(base_dir, "real_estate_model.pkl")
+grid_path = os.path.join(base_dir, "real_estate_prediction_grid.npz")
+best_params_path = os.path.join(base_dir, "best_hyperparameters.json")
 
 # Define features (independent variables) and target (dependent variable)
 features = ["num_beds", "num_baths", "monthly_maintenance_fee", "size_group"]  # Features used for prediction
 target = "listing_price"  # Target variable (house listing price)
 
-# Split data into training (80%) and testing (20%) sets
-X = df[features]  # Feature matrix (independent variables)
-y = df[target]  # Target variable
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+# Columns identifying a listing and the values the model sees (a changed listing gets a new key)
+LISTING_KEY_COLUMNS = ["id"] + features + [target]
+
+# Incremental refresh: trees added per refresh, share of the new listings held out to check the refreshed model,
+# tolerated relative MAE increase before falling back to a full retrain, and largest model size (as a multiple of
+# the size of a fully retrained model) before a full retrain resets it
+REFRESH_STAGES = 20
+HOLDOUT_FRACTION = 0.2
+REFRESH_TOLERANCE = 0.1
+MAX_STAGES_FACTOR = 4
+
+
+def load_best_params(best_params_path: str = best_params_path) -> dict:
+    """
+    Reads the tuned Gradient Boosting hyperparameters written by hyperparameter_tuning.py.
+
+    :param best_params_path: best hyperparameters file
+    :return: hyperparameters, or an empty dictionary if the model has not been tuned
+    """
+    if not os.path.exists(best_params_path):
+        return {}
+    with open(best_params_path, encoding="utf-8") as f:
+        tuned = json.load(f)
+    return tuned.get("models", {}).get("Gradient Boosting", {}).get("params", {})
+
+
+def split_data(df: pd.DataFrame) -> tuple:
+    """
+    Splits the listings into training (80%) and testing (20%) sets.
+
+    :param df: cleaned real estate data with the feature and target columns
+    :return: X_train, X_test, y_train, y_test
+    """
+    X = df[features]  # Feature matrix (independent variables)
+    y = df[target]  # Target variable
+    return train_test_split(X, y, test_size=0.2, random_state=42)
+
+
+def evaluate_model(model: GradientBoostingRegressor, X_test: pd.DataFrame, y_test: pd.Series) -> dict:
+    """
+    Scores the model on the test set.
+
+    :return: R² Score and Mean Absolute Error (MAE)
+    """
+    with measure("Gradient Boosting", "predict", rows=len(X_test)):
+        y_pred = model.predict(X_test)
+    return {"r2": r2_score(y_test, y_pred), "mae": mean_absolute_error(y_test, y_pred)}
+
+
+def train_model(df: pd.DataFrame, params: dict = None) -> GradientBoostingRegressor:
+    """
+    Trains the Gradient Boosting Regressor on 80% of the listings.
+
+    :param df: cleaned real estate data with the feature and target columns
+    :param params: hyperparameters overriding the defaults below (e.g. from load_best_params)
+    :return: the trained model
+    """
+    # Split data into training (80%) and testing (20%) sets
+    X_train, X_test, y_train, y_test = split_data(df)
+
+    # Train Gradient Boosting Regressor
+    # - n_estimators: Number of boosting stages (trees)
+    # - learning_rate: Controls contribution of each tree to the final prediction
+    # - random_state: Ensures reproducibility of results
+    gb_model = GradientBoostingRegressor(n_estimators=100, learning_rate=0.1, random_state=42)
+    gb_model.set_params(**(params or {}))
+    with measure("Gradient Boosting", "fit", rows=len(X_train)):
+        gb_model.fit(X_train, y_train)  # Train the model on the training data
+    return gb_model
+
+
+def listing_keys(df: pd.DataFrame) -> np.ndarray:
+    """
+    Hashes the id, features and target of every listing, so a model can record which listings it has seen.
+
+    :param df: cleaned real estate data with the id, feature and target columns
+    :return: uint64 key of every row
+    """
+    return pd.util.hash_pandas_object(df[LISTING_KEY_COLUMNS], index=False).to_numpy()
+
+
+def refresh_model(df: pd.DataFrame, model: GradientBoostingRegressor, seen_listings: np.ndarray,
+                  test_listings: np.ndarray, reference_mae: float, params: dict = None,
+                  refresh_stages: int = REFRESH_STAGES, holdout_fraction: float = HOLDOUT_FRACTION,
+                  tolerance: float = REFRESH_TOLERANCE) -> tuple:
+    """
+    Updates the model for the listings added to (or changed in) the dataset since it was trained, by continued
+    boosting, with a full retrain as fallback (see the module docstring).
+
+    :param df: cleaned real estate data with the id, feature and target columns
+    :param model: the current model
+    :param seen_listings: keys of the listings the current model has seen (see listing_keys)
+    :param test_listings: ids of the test listings of the last full retrain (never fitted by a refresh)
+    :param reference_mae: test MAE of the last full retrain
+    :param params: hyperparameters of a full retrain (e.g. from load_best_params)
+    :param refresh_stages: number of trees added
+    :param holdout_fraction: share of the new listings (the newest) held out to check the refreshed model
+    :param tolerance: relative MAE increase tolerated on the held-out window
+    :return: (model, metrics, boolean mask of the rows of df fitted, outcome); the outcome is 'unchanged' (no new
+             listings), 'refreshed' or 'retrained', and the metrics are measured on the held-out window or, after a
+             retrain, on the test set
+    """
+    new_positions = np.flatnonzero(~np.isin(listing_keys(df), seen_listings))
+    if len(new_positions) == 0:
+        return model, None, np.ones(len(df), dtype=bool), "unchanged"
+
+    # The newest new listings are the held-out window; every other listing but the test listings is used to fit the
+    # new trees
+    in_holdout = np.zeros(len(df), dtype=bool)
+    in_holdout[new_positions[-max(int(np.ceil(len(new_positions) * holdout_fraction)), 1):]] = True
+    fitted = ~in_holdout & ~df["id"].isin(test_listings).to_numpy()
+    train, holdout = df[fitted], df[in_holdout]
+    previous = evaluate_model(model, holdout[features], holdout[target])
+
+    refreshed = copy.deepcopy(model)
+    refreshed.set_params(warm_start=True, n_estimators=model.n_estimators_ + refresh_stages)
+    with measure("Gradient Boosting", "refresh_fit", rows=len(train)):
+        refreshed.fit(train[features], train[target])  # keeps the existing trees and adds refresh_stages trees
+    refreshed.set_params(warm_start=False)
+    metrics = evaluate_model(refreshed, holdout[features], holdout[target])
+
+    max_stages = MAX_STAGES_FACTOR * (params or {}).get("n_estimators", 100)
+    limit = 1 + tolerance
+    if refreshed.n_estimators_ > max_stages:
+        reason = f"the model has grown to {refreshed.n_estimators_} trees"
+    elif metrics["mae"] > previous["mae"] * limit:
+        reason = f"held-out MAE {metrics['mae']:,.0f} is worse than the previous model's {previous['mae']:,.0f}"
+    elif metrics["mae"] > reference_mae * limit:
+        reason = f"held-out MAE {metrics['mae']:,.0f} is worse than the last full retrain's {reference_mae:,.0f}"
+    else:
+        print(f"Refreshed model with {refresh_stages} more trees on {len(new_positions)} new listings (held-out MAE "
+              f"{previous['mae']:,.0f} -> {metrics['mae']:,.0f})")
+        return refreshed, metrics, fitted, "refreshed"
+
+    print(f"Accuracy check failed ({reason}); retraining from scratch.")
+    retrained = train_model(df, params)
+    X_train, X_test, y_train, y_test = split_data(df)
+    return retrained, evaluate_model(retrained, X_test, y_test), np.ones(len(df), dtype=bool), "retrained"
+
+
+def train_out_of_core(file_path: str = file_path, params: dict = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                      sample_rows: int = DEFAULT_SAMPLE_ROWS) -> tuple:
+    """
+    Trains the Gradient Boosting Regressor on a dataset streamed in batches, with bounded memory.
+
+    :param file_path: Path to the cleaned real estate dataset (CSV export or typed columnar dataset directory).
+    :param params: hyperparameters overriding the defaults (e.g. from load_best_params)
+    :param batch_size: rows per streamed batch
+    :param sample_rows: largest number of training listings the model is fitted on
+    :return: (model, training sample features, training sample target, streaming holdout metrics)
+    """
+    X_train, y_train = sample_training_rows(file_path, sample_rows, batch_size)
+    gb_model = GradientBoostingRegressor(n_estimators=100, learning_rate=0.1, random_state=42)
+    gb_model.set_params(**(params or {}))
+    with measure("Gradient Boosting", "fit", rows=len(X_train), mode="out_of_core"):
+        gb_model.fit(X_train, y_train)
+    with measure("Gradient Boosting", "predict", mode="out_of_core"):
+        holdout = evaluate_holdout(gb_model, file_path, batch_size)
+    return gb_model, X_train, y_train, {"r2": holdout["R² Score"], "mae": holdout["MAE"]}
+
+
+def main_out_of_core(file_path: str = file_path, model_path: str = model_path, build_grid: bool = False,
+                     grid_path: str = grid_path, best_params_path: str = best_params_path,
+                     artifact_path: str = artifact_path, batch_size: int = DEFAULT_BATCH_SIZE,
+                     sample_rows: int = DEFAULT_SAMPLE_ROWS) -> None:
+    params = load_best_params(best_params_path)
+    if params:
+        print(f"Using tuned hyperparameters: {params}")
+
+    start = time.perf_counter()
+    gb_model, X_train, y_train, metrics = train_out_of_core(file_path, params, batch_size, sample_rows)
+    print(f"Model trained out of core on {len(X_train)} sampled listings in {time.perf_counter() - start:.2f}s")
+
+    # Row count, largest maintenance fee and holdout listings of the whole dataset, streamed two columns at a time
+    dataset_rows, max_fee, test_listings = 0, 0.0, []
+    for batch in iter_batches(file_path, ["id", "monthly_maintenance_fee"], batch_size):
+        dataset_rows += len(batch)
+        max_fee = max(max_fee, float(batch["monthly_maintenance_fee"].max()))
+        test_listings.append(batch["id"].to_numpy()[is_holdout(batch["id"])])
+
+    joblib.dump(gb_model, model_path)
+    print(f"Model saved as {model_path}")
+    save_artifact(artifact_path, gb_model, X_train, y_train, metrics, dataset_rows=dataset_rows,
+                  test_listings=np.concatenate(test_listings))
+    print(f"Model artifact saved at {artifact_path} (R² {metrics['r2']:.4f}, MAE {metrics['mae']:,.0f} on the "
+          f"streaming holdout)")
+
+    if build_grid:
+        grid = PredictionGrid.build(gb_model, max_fee=max_fee, model_hash=artifact_hash(artifact_path))
+        grid.save(grid_path)
+        print(f"Prediction grid saved as {grid_path}")
+
+
+def main(file_path: str = file_path, model_path: str = model_path, build_grid: bool = False,
+         grid_path: str = grid_path, best_params_path: str = best_params_path,
+         artifact_path: str = artifact_path, refresh: bool = False, refresh_stages: int = REFRESH_STAGES,
+         holdout_fraction: float = HOLDOUT_FRACTION, tolerance: float = REFRESH_TOLERANCE) -> None:
+    # Load dataset (only the id, feature and target columns)
+    df = load_dataset(file_path, columns=LISTING_KEY_COLUMNS)
+
+    params = load_best_params(best_params_path)
+    if params:
+        print(f"Using tuned hyperparameters: {params}")
+
+    start = time.perf_counter()
+    result = None
+    if refresh:
+        seen_listings, test_listings = None, None
+        if os.path.exists(artifact_path):
+            artifact = ModelArtifact.load(artifact_path)
+            seen_listings, test_listings = artifact.load_seen_listings(), artifact.load_test_listings()
+        if seen_listings is None or test_listings is None:
+            print("No model artifact recording the listings it was trained and tested on; retraining from scratch.")
+        else:
+            result = refresh_model(df, artifact.load_estimator(), seen_listings, test_listings,
+                                   artifact.manifest["metrics"]["mae"], params, refresh_stages, holdout_fraction,
+                                   tolerance)
+            if result[3] == "unchanged":
+                print("No new listings since the model was trained; nothing to refresh.")
+                return
+
+    if result is not None and result[3] == "refreshed":
+        gb_model, holdout_metrics, fitted, outcome = result
+        X_train, y_train = df.loc[fitted, features], df.loc[fitted, target]
+        # Keep the test metrics (and test listings) of the last full retrain as the reference of later checks, next to
+        # the window's; the refresh did not fit the test listings, so the metrics are still a held-out score
+        metrics = {"r2": artifact.manifest["metrics"]["r2"], "mae": artifact.manifest["metrics"]["mae"],
+                   "holdout_r2": holdout_metrics["r2"], "holdout_mae": holdout_metrics["mae"]}
+    else:
+        gb_model = result[0] if result is not None else train_model(df, params)
+        outcome = "retrained"
+        # Test metrics of the versioned artifact (feature schema, training data hash and metrics next to the model)
+        X_train, X_test, y_train, y_test = split_data(df)
+        metrics = evaluate_model(gb_model, X_test, y_test)
+        test_listings = df.loc[X_test.index, "id"].to_numpy()
+    print(f"Model {outcome} in {time.perf_counter() - start:.2f}s")
+    # Every current listing counts as seen (including a refresh's held-out window), so the next refresh skips them
+    seen_listings = listing_keys(df)
+
+    # Save the trained model
+    joblib.dump(gb_model, model_path)
+
+    print(f"Model saved as {model_path}")
+
+    # Save the versioned artifact
+    save_artifact(artifact_path, gb_model, X_train, y_train, metrics, dataset_rows=len(df),
+                  seen_listings=seen_listings, test_listings=test_listings)
+    print(f"Model artifact saved at {artifact_path} (R² {metrics['r2']:.4f}, MAE {metrics['mae']:,.0f})")
 
-# Train Gradient Boosting Regressor
-# - n_estimators: Number of boosting stages (trees)
-# - learning_rate: Controls contribution of each tree to the final prediction
-# - random_state: Ensures reproducibility of results
-gb_model = GradientBoostingRegressor(n_estimators=100, learning_rate=0.1, random_state=42)
-gb_model.fit(X_train, y_train)  # Train the model on the training data
+    # Precompute the web app's predictions over its whole input grid (maintenance fees up to the largest in the data)
+    if build_grid:
+        grid = PredictionGrid.build(gb_model, max_fee=float(df["monthly_maintenance_fee"].max()),
+                                    model_hash=artifact_hash(artifact_path))
+        grid.save(grid_path)
+        print(f"Prediction grid saved as {grid_path}")
 
-# Save the trained model
-model_filename = "real_estate_model.pkl"
-joblib.dump(gb_model, model_filename)
 
-print(f"Model saved as {model_filename}")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train and save the Gradient Boosting real estate price model.")
+    parser.add_argument("--grid", action="store_true",
+                        help="also precompute the web app's prediction grid from the trained model")
+    parser.add_argument("--refresh", action="store_true",
+                        help="warm-start the saved model on the new listings instead of retraining from scratch")
+    parser.add_argument("--refresh-stages", type=int, default=REFRESH_STAGES, help="trees added by a refresh")
+    parser.add_argument("--holdout-fraction", type=float, default=HOLDOUT_FRACTION,
+                        help="share of the new listings held out to check a refreshed model")
+    parser.add_argument("--tolerance", type=float, default=REFRESH_TOLERANCE,
+                        help="relative MAE increase tolerated before a refresh falls back to a full retrain")
+    parser.add_argument("--out-of-core", action="store_true",
+                        help="stream the dataset in batches instead of loading it (datasets larger than memory)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="rows per streamed batch (--out-of-core)")
+    parser.add_argument("--sample-rows", type=int, default=DEFAULT_SAMPLE_ROWS,
+                        help="largest number of training listings the model is fitted on (--out-of-core)")
+    args = parser.parse_args()
+    enable_log()
+    if args.out_of_core:
+        main_out_of_core(build_grid=args.grid, batch_size=args.batch_size, sample_rows=args.sample_rows)
+    else:
+        main(build_grid=args.grid, refresh=args.refresh, refresh_stages=args.refresh_stages,
+             holdout_fraction=args.holdout_fraction, tolerance=args.tolerance)
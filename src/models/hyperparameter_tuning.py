@@ -0,0 +1,293 @@
+"""
+Real Estate Price Prediction - Hyperparameter Tuning with Successive Halving
+
+This script searches hyperparameters for the candidate models of `multiple_models.py` and writes the winning
+configurations to `src/models/best_hyperparameters.json`, which `gradient_boosting_regressor_model.py` uses when it
+trains the deployed model.
+
+Steps:
+1. Load the dataset and keep the same 20% test split as the training script out of the search; the remaining
+   listings are split again into search-training and validation sets.
+2. Sample `n_configs` configurations per model from its search space (fixed seed).
+3. Successive halving: train every configuration on a small share of the search-training rows, keep the best
+   1/`eta` by validation MAE, multiply the number of rows by `eta`, and repeat until the survivors use all rows.
+   Bad configurations are pruned after their cheap, small-data trials.
+4. Run the trials of each round in parallel worker processes (one thread each).
+5. Append every finished trial to a JSON Lines trial log (`data/tuning/trials.jsonl`). A rerun (e.g. after an
+   interruption) reuses the logged trials instead of training them again; trials of a different dataset are ignored.
+6. Write the best configuration of each model, and the overall winner, to the best hyperparameters file.
+
+Usage:
+    python -m src.models.hyperparameter_tuning [--models NAME ...] [--configs N] [--eta N] [--workers N]
+"""
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_absolute_error, r2_score
+from sklearn.model_selection import train_test_split
+from threadpoolctl import threadpool_limits
+
+from src.data_processing.storage import load_dataset
+from src.instrumentation import enable_log, measure
+from src.models.multiple_models import build_model, features, target
+
+# Get the absolute path of the current script (app.py) and define the correct model path
+base_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(base_dir, "..", ".."))
+file_path = os.path.join(project_root, "data", "cleaned_real_estate_data_numerical.csv")
+trial_log_path = os.path.join(project_root, "data", "tuning", "trials.jsonl")
+best_params_path = os.path.join(base_dir, "best_hyperparameters.json")
+
+# Search spaces (lists of candidate values) of the models with hyperparameters
+SEARCH_SPACES = {
+    "Random Forest": {
+        "n_estimators": [100, 200, 400],
+        "max_depth": [None, 6, 10, 16],
+        "min_samples_leaf": [1, 2, 5, 10],
+        "max_features": [1.0, 0.75, 0.5],
+    },
+    "Gradient Boosting": {
+        "n_estimators": [100, 200, 400],
+        "learning_rate": [0.02, 0.05, 0.1, 0.2],
+        "max_depth": [2, 3, 4, 5],
+        "min_samples_leaf": [1, 5, 10, 20],
+        "subsample": [0.7, 0.85, 1.0],
+    },
+    "XGBoost": {
+        "n_estimators": [100, 200, 400],
+        "learning_rate": [0.02, 0.05, 0.1, 0.2],
+        "max_depth": [3, 4, 6, 8],
+        "min_child_weight": [1, 3, 10],
+        "subsample": [0.7, 0.85, 1.0],
+        "colsample_bytree": [0.75, 1.0],
+    },
+    "LightGBM": {
+        "n_estimators": [100, 200, 400],
+        "learning_rate": [0.02, 0.05, 0.1, 0.2],
+        "num_leaves": [7, 15, 31, 63],
+        "min_child_samples": [5, 10, 20, 40],
+        "subsample": [0.7, 0.85, 1.0],
+        "subsample_freq": [1],
+    },
+    "Neural Network": {
+        "hidden_layer_sizes": [[32], [64], [64, 64], [128, 64]],
+        "alpha": [0.0001, 0.001, 0.01, 0.1],
+        "learning_rate_init": [0.0005, 0.001],
+    },
+}
+
+
+def sample_configs(space: dict, n_configs: int, seed: int = 42) -> list:
+    """
+    Samples distinct configurations from a search space.
+
+    :param space: mapping of parameter name -> candidate values
+    :param n_configs: number of configurations (fewer if the space is smaller)
+    :param seed: random seed
+    :return: list of parameter dictionaries
+    """
+    rng = np.random.default_rng(seed)
+    names = sorted(space)
+    size = int(np.prod([len(space[name]) for name in names]))
+    configs, seen = [], set()
+    while len(configs) < min(n_configs, size):
+        config = {name: space[name][rng.integers(len(space[name]))] for name in names}
+        key = json.dumps(config, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            configs.append(config)
+    return configs
+
+
+def make_model(name: str, params: dict):
+    """
+    Builds a candidate model (single-threaded) with the given hyperparameters.
+
+    :param name: model name (see multiple_models.MODEL_FACTORIES)
+    :param params: hyperparameters as stored in the trial log (JSON types)
+    :return: unfitted model
+    """
+    params = {key: tuple(value) if isinstance(value, list) else value for key, value in params.items()}
+    return build_model(name, n_jobs=1).set_params(**params)
+
+
+def run_trial(name: str, params: dict, budget: int, X_train: pd.DataFrame, y_train: pd.Series,
+              X_valid: pd.DataFrame, y_valid: pd.Series) -> dict:
+    """
+    Trains one configuration on the first `budget` search-training rows and scores it on the validation set.
+
+    :return: validation MAE and R² Score, and the fit time
+    """
+    with threadpool_limits(limits=1):
+        model = make_model(name, params)
+        with measure(name, "trial_fit", rows=budget) as fit:
+            model.fit(X_train.iloc[:budget], y_train.iloc[:budget])
+        with measure(name, "trial_predict", rows=len(X_valid)):
+            y_pred = model.predict(X_valid)
+    return {"mae": mean_absolute_error(y_valid, y_pred), "r2": r2_score(y_valid, y_pred), "fit_time": fit.wall_s}
+
+
+def dataset_hash(X: pd.DataFrame, y: pd.Series) -> str:
+    """
+    Hashes the search data, so trials logged for other data are not reused.
+    """
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(X, index=False).values.tobytes())
+    digest.update(pd.util.hash_pandas_object(y, index=False).values.tobytes())
+    return digest.hexdigest()[:16]
+
+
+def trial_key(data_hash: str, name: str, params: dict, budget: int) -> str:
+    return json.dumps([data_hash, name, params, budget], sort_keys=True)
+
+
+def load_trial_log(log_path: str) -> dict:
+    """
+    Reads the finished trials from the trial log.
+
+    :param log_path: JSON Lines trial log
+    :return: mapping of trial key -> trial record
+    """
+    trials = {}
+    if os.path.exists(log_path):
+        with open(log_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # a line cut short by an interruption
+                trials[trial_key(record["data_hash"], record["model"], record["params"], record["budget"])] = record
+    return trials
+
+
+def successive_halving(name: str, configs: list, X_train: pd.DataFrame, y_train: pd.Series, X_valid: pd.DataFrame,
+                       y_valid: pd.Series, executor: Optional[ProcessPoolExecutor], trials: dict, log_path: str,
+                       data_hash: str, eta: int = 3) -> list:
+    """
+    Runs successive halving for one model.
+
+    :param name: model name
+    :param configs: sampled configurations
+    :param executor: worker pool for the trials; trials run in this process if None
+    :param trials: finished trials (see load_trial_log), updated in place
+    :param log_path: JSON Lines trial log new trials are appended to
+    :param data_hash: hash of the search data (see dataset_hash)
+    :param eta: pruning factor (at least 2): 1/eta of the configurations survive each round, with eta times more rows
+    :return: trial records of the final round, best first
+    """
+    if eta < 2:
+        raise ValueError(f"eta must be at least 2 (got {eta}): 1/eta of the configurations survive each round.")
+
+    # Rows per round: all search-training rows in the last round, eta times fewer in each round before it
+    n_rounds, remaining = 1, len(configs)
+    while remaining >= eta:
+        remaining //= eta
+        n_rounds += 1
+    budgets = [max(int(np.ceil(len(X_train) / eta ** k)), 1) for k in reversed(range(n_rounds))]
+    survivors = configs
+
+    for budget in budgets:
+        pending = [params for params in survivors if trial_key(data_hash, name, params, budget) not in trials]
+        if executor is not None:
+            futures = [executor.submit(run_trial, name, params, budget, X_train, y_train, X_valid, y_valid)
+                       for params in pending]
+            outcomes = (future.result() for future in futures)
+        else:
+            outcomes = (run_trial(name, params, budget, X_train, y_train, X_valid, y_valid) for params in pending)
+
+        # Log every trial as soon as it finishes, so an interrupted search resumes from here
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        for params, outcome in zip(pending, outcomes):
+            record = {"data_hash": data_hash, "model": name, "params": params, "budget": budget, **outcome}
+            trials[trial_key(data_hash, name, params, budget)] = record
+            with open(log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+
+        results = sorted((trials[trial_key(data_hash, name, params, budget)] for params in survivors),
+                         key=lambda record: record["mae"])
+        print(f"[tuning] {name}: {len(survivors)} configurations on {budget} rows, best validation MAE "
+              f"{results[0]['mae']:,.0f}")
+        survivors = [record["params"] for record in results[:max(1, len(results) // eta)]]
+    return results
+
+
+def tune(file_path: str = file_path, models: Optional[list] = None, n_configs: int = 27, eta: int = 3,
+         max_workers: Optional[int] = None, log_path: str = trial_log_path,
+         output_path: str = best_params_path, seed: int = 42) -> dict:
+    """
+    Tunes the candidate models and writes the best configurations.
+
+    :param file_path: Path to the cleaned real estate dataset (CSV export or typed columnar dataset directory).
+    :param models: names of the models to tune; all models with a search space if None
+    :param n_configs: configurations sampled per model
+    :param eta: pruning factor of successive halving (at least 2)
+    :param max_workers: number of trials run at the same time (the number of cores if None)
+    :param log_path: JSON Lines trial log (resumable)
+    :param output_path: best hyperparameters file
+    :param seed: random seed of the configuration sampling
+    :return: the content written to the best hyperparameters file
+    """
+    models = models or list(SEARCH_SPACES)
+    unknown = set(models) - set(SEARCH_SPACES)
+    if unknown:
+        raise ValueError(f"No search space for: {', '.join(sorted(unknown))}")
+    if eta < 2:
+        raise ValueError(f"eta must be at least 2 (got {eta}): 1/eta of the configurations survive each round.")
+
+    # Keep the training script's test set out of the search (same split), and validate on part of the rest
+    df = load_dataset(file_path, columns=features + [target])
+    X = df[features].astype("float64")
+    y = df[target]
+    X_rest, _, y_rest, _ = train_test_split(X, y, test_size=0.2, random_state=42)
+    X_train, X_valid, y_train, y_valid = train_test_split(X_rest, y_rest, test_size=0.2, random_state=seed)
+
+    data_hash = dataset_hash(X_rest, y_rest)
+    trials = load_trial_log(log_path)
+    max_workers = max_workers or os.cpu_count() or 1
+
+    best = {}
+    executor = ProcessPoolExecutor(max_workers=max_workers) if max_workers > 1 else None
+    try:
+        for name in models:
+            configs = sample_configs(SEARCH_SPACES[name], n_configs, seed)
+            results = successive_halving(name, configs, X_train, y_train, X_valid, y_valid, executor, trials,
+                                         log_path, data_hash, eta)
+            best[name] = {key: results[0][key] for key in ("params", "mae", "r2")}
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    # Merge with the models tuned in earlier runs on the same data
+    output = {"data_hash": data_hash, "models": {}}
+    if os.path.exists(output_path):
+        with open(output_path, encoding="utf-8") as f:
+            previous = json.load(f)
+        if previous.get("data_hash") == data_hash:
+            output["models"] = previous.get("models", {})
+    output["models"].update(best)
+    output["best_model"] = min(output["models"], key=lambda model: output["models"][model]["mae"])
+
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(output, f, indent=2)
+    print(f"Best hyperparameters saved at: {output_path} (overall best: {output['best_model']})")
+    return output
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune the candidate models with successive halving.")
+    parser.add_argument("--models", nargs="*", default=None, choices=list(SEARCH_SPACES),
+                        help="models to tune (all if omitted)")
+    parser.add_argument("--configs", type=int, default=27, help="configurations sampled per model")
+    parser.add_argument("--eta", type=int, default=3, help="pruning factor of successive halving (at least 2)")
+    parser.add_argument("--workers", type=int, default=None, help="number of trials run at the same time")
+    args = parser.parse_args()
+    if args.eta < 2:
+        parser.error(f"--eta must be at least 2 (got {args.eta})")
+    enable_log()
+    tune(models=args.models, n_configs=args.configs, eta=args.eta, max_workers=args.workers)
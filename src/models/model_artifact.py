@@ -0,0 +1,309 @@
+"""
+Versioned Model Artifact for the Real Estate Price Model
+
+`real_estate_model.pkl` is a bare pickle: it does not record which features it expects, in which order, what data it
+was trained on or how well it scored. This module defines a model artifact, a directory written by the training
+script next to the pickle:
+
+    real_estate_model/
+        manifest.json       format version, feature schema, target, training data hash, metrics, library versions
+        estimator.joblib    the fitted scikit-learn estimator (for evaluation and retraining tools)
+        arrays/*.npy        the flattened tree ensemble (see flat_ensemble.py), one uncompressed array per file
+        seen_listings.npy   keys (hash of id and values) of the listings the model has seen, for incremental refresh
+        test_listings.npy   ids of the listings held out to score the model, never trained on by a refresh
+
+Serving processes load the ensemble arrays with `np.load(mmap_mode="r")`, so the operating system shares one copy of
+their pages between every process serving the model and loading does not parse a pickle. Batch predictions walk the
+mapped arrays directly; the single-row fast path (`FlatEnsemble.predict_one`) keeps its own small copy of the nodes.
+The feature schema (names, order, integer or float, training range) is used to validate inputs before predicting.
+
+Usage:
+    python -m src.models.model_artifact   # builds the artifact from the existing real_estate_model.pkl
+"""
+import hashlib
+import json
+import math
+import os
+import shutil
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+
+from src.models.flat_ensemble import FlatEnsemble
+
+# pandas and joblib are only needed to write an artifact or to load its estimator; serving processes load the
+# manifest and the arrays with json and numpy alone, which keeps their cold start short
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Get the absolute path of the current script (app.py) and define the correct model path
+base_dir = os.path.dirname(os.path.abspath(__file__))
+artifact_path = os.path.join(base_dir, "real_estate_model")
+
+# Version of the artifact layout; readers refuse artifacts written in a newer format
+FORMAT_VERSION = 1
+
+MANIFEST_FILE = "manifest.json"
+ESTIMATOR_FILE = "estimator.joblib"
+SEEN_LISTINGS_FILE = "seen_listings.npy"
+TEST_LISTINGS_FILE = "test_listings.npy"
+ARRAYS_DIR = "arrays"
+ENSEMBLE_ARRAYS = ["feature", "threshold", "left", "right", "value", "roots"]
+
+
+def data_hash(df: "pd.DataFrame") -> str:
+    """
+    Hashes the content of the training data (values and column names, independent of the index).
+
+    :param df: training data
+    :return: hex digest
+    """
+    import pandas as pd
+
+    digest = hashlib.sha256()
+    digest.update(json.dumps(list(df.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def artifact_hash(directory: str = artifact_path) -> str:
+    """
+    Hashes what an artifact's predictions depend on: the flattened ensemble's arrays and parameters (used to tie the
+    prediction grid to the artifact it was built from).
+
+    :param directory: artifact directory
+    :return: hex digest
+    """
+    with open(os.path.join(directory, MANIFEST_FILE), encoding="utf-8") as f:
+        manifest = json.load(f)
+    digest = hashlib.sha256()
+    digest.update(json.dumps([manifest["ensemble"], [feature["name"] for feature in manifest["features"]]],
+                             sort_keys=True).encode())
+    for name in ENSEMBLE_ARRAYS:
+        with open(os.path.join(directory, ARRAYS_DIR, f"{name}.npy"), "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def feature_schema(X: "pd.DataFrame") -> list:
+    """
+    Describes the features of the training data: name, kind (integer column or not) and observed range.
+
+    :param X: training features, in the model's feature order
+    :return: list of feature descriptions
+    """
+    import pandas as pd
+
+    schema = []
+    for name in X.columns:
+        values = X[name].to_numpy(dtype=np.float64)
+        integer = pd.api.types.is_integer_dtype(X[name])
+        schema.append({"name": name, "dtype": "int" if integer else "float",
+                       "min": float(values.min()), "max": float(values.max())})
+    return schema
+
+
+def _library_versions() -> dict:
+    import pandas as pd
+    import sklearn
+
+    return {"numpy": np.__version__, "pandas": pd.__version__, "scikit-learn": sklearn.__version__}
+
+
+def save_artifact(directory: str, model, X_train: "pd.DataFrame", y_train: "pd.Series", metrics: dict,
+                  dataset_rows: Optional[int] = None, seen_listings: Optional[np.ndarray] = None,
+                  test_listings: Optional[np.ndarray] = None) -> str:
+    """
+    Writes a model artifact (replacing any previous artifact in the directory as a whole).
+
+    :param directory: artifact directory
+    :param model: fitted GradientBoostingRegressor
+    :param X_train: training features, in the model's feature order
+    :param y_train: training target
+    :param metrics: evaluation metrics of the model (e.g. on the test set)
+    :param dataset_rows: number of dataset rows the model has seen (trained on, or held out to check it)
+    :param seen_listings: keys of those rows (see gradient_boosting_regressor_model.listing_keys); rows with other keys
+                          are new to the model (see gradient_boosting_regressor_model.refresh_model)
+    :param test_listings: ids of the listings the metrics were measured on (held out from training)
+    :return: the artifact directory
+    """
+    import joblib
+    import pandas as pd
+
+    flat_model = FlatEnsemble.from_model(model)
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "model_type": type(model).__name__,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "features": feature_schema(X_train),
+        "target": y_train.name,
+        "training_data": {"rows": len(X_train), "hash": data_hash(pd.concat([X_train, y_train], axis=1)),
+                          "dataset_rows": dataset_rows,
+                          "seen_listings": int(len(seen_listings)) if seen_listings is not None else None,
+                          "test_listings": int(len(test_listings)) if test_listings is not None else None},
+        "metrics": {name: float(value) for name, value in metrics.items()},
+        "params": {name: value for name, value in model.get_params().items()
+                   if value is None or isinstance(value, (bool, int, float, str))},
+        "ensemble": {"baseline": flat_model.baseline, "learning_rate": flat_model.learning_rate,
+                     "max_depth": flat_model.max_depth},
+        "libraries": _library_versions(),
+    }
+
+    # Write next to the destination, then swap it in, so readers never see a half-written artifact
+    staging = directory.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(os.path.join(staging, ARRAYS_DIR))
+    for name in ENSEMBLE_ARRAYS:
+        np.save(os.path.join(staging, ARRAYS_DIR, f"{name}.npy"), getattr(flat_model, name))
+    joblib.dump(model, os.path.join(staging, ESTIMATOR_FILE))
+    if seen_listings is not None:
+        np.save(os.path.join(staging, SEEN_LISTINGS_FILE), np.unique(np.asarray(seen_listings, dtype=np.uint64)))
+    if test_listings is not None:
+        np.save(os.path.join(staging, TEST_LISTINGS_FILE), np.unique(np.asarray(test_listings, dtype=np.int64)))
+    with open(os.path.join(staging, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(staging, directory)
+    return directory
+
+
+class ModelArtifact:
+    """
+    A loaded model artifact.
+
+    :param directory: artifact directory
+    :param manifest: content of manifest.json
+    :param flat_model: the flattened ensemble (memory-mapped arrays)
+    """
+
+    def __init__(self, directory: str, manifest: dict, flat_model: FlatEnsemble):
+        self.directory = directory
+        self.manifest = manifest
+        self.flat_model = flat_model
+        self.features = manifest["features"]
+        self.feature_names = [feature["name"] for feature in self.features]
+
+    @classmethod
+    def load(cls, directory: str = artifact_path, mmap: bool = True) -> "ModelArtifact":
+        """
+        Loads an artifact, memory-mapping the ensemble arrays.
+
+        :param directory: artifact directory
+        :param mmap: memory-map the arrays (False reads them into memory)
+        :return: the artifact
+        """
+        with open(os.path.join(directory, MANIFEST_FILE), encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("format_version", 0) > FORMAT_VERSION:
+            raise ValueError(f"Model artifact format {manifest['format_version']} is newer than the supported "
+                             f"format {FORMAT_VERSION}; update the code to load {directory}.")
+
+        arrays = {name: np.load(os.path.join(directory, ARRAYS_DIR, f"{name}.npy"), mmap_mode="r" if mmap else None)
+                  for name in ENSEMBLE_ARRAYS}
+        ensemble = manifest["ensemble"]
+        flat_model = FlatEnsemble(**arrays, baseline=ensemble["baseline"], learning_rate=ensemble["learning_rate"],
+                                  max_depth=ensemble["max_depth"],
+                                  feature_names=[feature["name"] for feature in manifest["features"]])
+        return cls(directory, manifest, flat_model)
+
+    def load_estimator(self):
+        """
+        Loads the fitted scikit-learn estimator stored in the artifact.
+        """
+        import joblib
+
+        return joblib.load(os.path.join(self.directory, ESTIMATOR_FILE))
+
+    def load_seen_listings(self) -> Optional[np.ndarray]:
+        """
+        Loads the keys of the listings the model has seen.
+
+        :return: sorted listing keys, or None if the artifact does not record them
+        """
+        path = os.path.join(self.directory, SEEN_LISTINGS_FILE)
+        return np.load(path) if os.path.exists(path) else None
+
+    def load_test_listings(self) -> Optional[np.ndarray]:
+        """
+        Loads the ids of the listings the model's metrics were measured on.
+
+        :return: sorted listing ids, or None if the artifact does not record them
+        """
+        path = os.path.join(self.directory, TEST_LISTINGS_FILE)
+        return np.load(path) if os.path.exists(path) else None
+
+    def validate(self, inputs: dict) -> list:
+        """
+        Checks one listing against the feature schema.
+
+        :param inputs: mapping of feature name -> value
+        :return: list of error messages (empty if the listing is valid)
+        """
+        errors = []
+        missing = [name for name in self.feature_names if inputs.get(name) is None]
+        unknown = [name for name in inputs if name not in self.feature_names]
+        if missing:
+            errors.append(f"Missing features (absent or null): {', '.join(missing)}.")
+        if unknown:
+            errors.append(f"Unknown features: {', '.join(unknown)}.")
+        for feature in self.features:
+            value = inputs.get(feature["name"])
+            if value is None:
+                continue  # reported as missing
+            if isinstance(value, bool) or not isinstance(value, (int, float, np.integer, np.floating)) \
+                    or not math.isfinite(value):
+                errors.append(f"{feature['name']} must be a finite number.")
+            elif feature["dtype"] == "int" and float(value) != int(value):
+                errors.append(f"{feature['name']} must be a whole number.")
+        return errors
+
+    def out_of_range(self, inputs: dict) -> list:
+        """
+        Lists the features of a valid listing that are outside the range seen in training (the model extrapolates
+        with the prediction at the edge of that range).
+
+        :param inputs: mapping of feature name -> value
+        :return: names of the features outside their training range
+        """
+        return [feature["name"] for feature in self.features
+                if not feature["min"] <= inputs[feature["name"]] <= feature["max"]]
+
+    def to_row(self, inputs: dict) -> list:
+        """
+        Orders a validated listing's values by the model's feature order.
+        """
+        return [float(inputs[name]) for name in self.feature_names]
+
+    def predict(self, inputs: dict) -> float:
+        """
+        Validates one listing and predicts its price.
+
+        :param inputs: mapping of feature name -> value
+        :return: predicted listing price
+        """
+        errors = self.validate(inputs)
+        if errors:
+            raise ValueError(" ".join(errors))
+        return self.flat_model.predict_one(self.to_row(inputs))
+
+
+def main(model_path: Optional[str] = None, artifact_path: str = artifact_path) -> None:
+    # Build the artifact of an already trained model, recomputing its test metrics on the training script's split
+    import joblib
+
+    from src.data_processing.storage import load_dataset
+    from src.models import gradient_boosting_regressor_model as training
+
+    model = joblib.load(model_path or training.model_path)
+    df = load_dataset(training.file_path, columns=["id"] + training.features + [training.target])
+    X_train, X_test, y_train, y_test = training.split_data(df)
+    save_artifact(artifact_path, model, X_train, y_train, training.evaluate_model(model, X_test, y_test),
+                  dataset_rows=len(df), test_listings=df.loc[X_test.index, "id"].to_numpy())
+    print(f"Model artifact saved at: {artifact_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,64 +5,255 @@ This script loads a cleaned real estate dataset, trains multiple models,
 and evaluates its performance in predicting listing prices.
 
 Steps:
-1. Load the dataset from a CSV file.
+1. Load the dataset (typed columnar storage, falling back to the CSV file).
 2. Define features (independent variables) and target (dependent variable).
 3. Split the data into training (80%) and testing (20%) sets.
-4. Train multiple models on the training set.
+4. Train multiple models on the training set, in parallel worker processes.
 5. Make predictions on the test set.
-6. Evaluate the model's performance using R² Score and Mean Absolute Error (MAE).
+6. Evaluate the model's performance using R² Score and Mean Absolute Error (MAE), along with its cost: fit time,
+   predict time, single-row inference latency and peak memory.
+
+`cross_validate_models` is a k-fold alternative to the single split that reports mean ± std metrics. The fold
+indices are computed once and shared by every model, and the folds are evaluated in parallel.
+
+The CPU budget (all cores by default) is shared between the worker processes: each model gets
+`cpu_budget // max_workers` threads for its own parallelism (XGBoost, LightGBM and Random Forest `n_jobs`, and
+OpenMP/BLAS thread pools), so running models side by side never starts more threads than there are cores.
 
 Author: Vennise Ho
 Date: 2025-03-01
 Generated with assistance from ChatGPT (OpenAI)
 """
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
 import pandas as pd
-from sklearn.linear_model import LinearRegression
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-from sklearn.model_selection import train_test_split
-from xgboost import XGBRegressor
-from lightgbm import LGBMRegressor
-from sklearn.neural_network import MLPRegressor
+from sklearn.model_selection import KFold, train_test_split
 from sklearn.metrics import mean_absolute_error, r2_score
+from threadpoolctl import threadpool_limits
+
+from src.data_processing.storage import load_dataset
+from src.instrumentation import current_rss, measure
+
+# Define features and target
+features = ["num_beds", "num_baths", "monthly_maintenance_fee", "size_group"]
+target = "listing_price"
+
+# Number of single-row predictions timed per model (the median is reported)
+LATENCY_REPEATS = 50
+
+
+# The model libraries are imported only when a model that needs them is built, so callers using one model (or none)
+# do not pay for loading XGBoost, LightGBM and every scikit-learn estimator family at import time.
+def _linear_regression(n_jobs: int):
+    from sklearn.linear_model import LinearRegression
+    return LinearRegression()
+
+
+def _random_forest(n_jobs: int):
+    from sklearn.ensemble import RandomForestRegressor
+    return RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=n_jobs)
+
+
+def _gradient_boosting(n_jobs: int):
+    from sklearn.ensemble import GradientBoostingRegressor
+    return GradientBoostingRegressor(n_estimators=100, learning_rate=0.1, random_state=42)
+
+
+def _xgboost(n_jobs: int):
+    from xgboost import XGBRegressor
+    return XGBRegressor(n_estimators=100, learning_rate=0.1, random_state=42, n_jobs=n_jobs)
+
+
+def _lightgbm(n_jobs: int):
+    from lightgbm import LGBMRegressor
+    return LGBMRegressor(n_estimators=100, learning_rate=0.1, random_state=42, force_row_wise=True, n_jobs=n_jobs,
+                         verbose=-1)
 
 
-def train_and_evaluate_models(file_path):
+def _neural_network(n_jobs: int):
+    from sklearn.neural_network import MLPRegressor
+    return MLPRegressor(hidden_layer_sizes=(64, 64), max_iter=2000, learning_rate_init=0.0005, activation='relu',
+                        solver='lbfgs', random_state=42)
+
+
+# Candidate models: name -> function building the unfitted model for a number of threads
+MODEL_FACTORIES = {
+    "Linear Regression": _linear_regression,
+    "Random Forest": _random_forest,
+    "Gradient Boosting": _gradient_boosting,
+    "XGBoost": _xgboost,
+    "LightGBM": _lightgbm,
+    "Neural Network": _neural_network,
+}
+
+
+def build_model(name: str, n_jobs: int = 1):
     """
-    Trains multiple regression models and evaluates their performance on real estate price prediction.
+    Builds one candidate model, importing only the library it needs.
+
+    :param name: model name (see MODEL_FACTORIES)
+    :param n_jobs: threads the model may use
+    :return: unfitted model
+    """
+    return MODEL_FACTORIES[name](n_jobs)
+
 
-    :param file_path: Path to the cleaned real estate dataset.
-    :return: DataFrame containing model performance metrics.
+def build_models(n_jobs: int = 1) -> dict:
     """
-    # Load dataset
-    df = pd.read_csv(file_path)
+    Defines the candidate models.
+
+    :param n_jobs: threads each model may use
+    :return: dictionary of model name -> unfitted model
+    """
+    return {name: build_model(name, n_jobs) for name in MODEL_FACTORIES}
+
+
+def evaluate_model(name: str, n_jobs: int, X_train: pd.DataFrame, X_test: pd.DataFrame, y_train: pd.Series,
+                   y_test: pd.Series) -> dict:
+    """
+    Trains and evaluates one model (run in a fresh worker process, so its peak memory is its own).
+    Peak memory is the growth of the process's peak resident memory while fitting and predicting. The fit and the
+    prediction are recorded as instrumentation spans (see instrumentation.py).
+
+    :param name: model name (see build_models)
+    :param n_jobs: threads the model may use
+    :return: accuracy and cost metrics of the model
+    """
+    model = build_model(name, n_jobs)
+    with threadpool_limits(limits=n_jobs):
+        memory_before = current_rss() or 0
+
+        with measure(name, "fit", rows=len(X_train)) as fit:
+            model.fit(X_train, y_train)  # Train model
 
-    # Define features and target
-    features = ["num_beds", "num_baths", "monthly_maintenance_fee", "size_group"]
-    target = "listing_price"
+        with measure(name, "predict", rows=len(X_test)) as predict:
+            y_pred = model.predict(X_test)  # Make predictions
 
-    # Split data
-    X = df[features]
+        # Single-listing latency, as seen by the web app
+        row = X_test.iloc[:1]
+        latencies = []
+        for _ in range(LATENCY_REPEATS):
+            start = time.perf_counter()
+            model.predict(row)
+            latencies.append(time.perf_counter() - start)
+
+        peak_memory = (max(fit.peak_rss_bytes or 0, predict.peak_rss_bytes or 0) - memory_before) / (1024 * 1024)
+
+    return {
+        "R² Score": r2_score(y_test, y_pred),  # Compute R² Score
+        "MAE": mean_absolute_error(y_test, y_pred),  # Compute MAE
+        "Fit Time (s)": fit.wall_s,
+        "Predict Time (s)": predict.wall_s,
+        "Latency per Row (ms)": sorted(latencies)[len(latencies) // 2] * 1000,
+        "Peak Memory (MB)": peak_memory,
+    }
+
+
+def train_and_evaluate_models(file_path, max_workers: Optional[int] = None, cpu_budget: Optional[int] = None,
+                              df: Optional[pd.DataFrame] = None):
+    """
+    Trains multiple regression models and evaluates their performance on real estate price prediction.
+
+    :param file_path: Path to the cleaned real estate dataset (CSV export or typed columnar dataset directory).
+    :param max_workers: number of models trained at the same time (defaults to the CPU budget, at most one per model)
+    :param cpu_budget: total number of threads shared by the workers (defaults to the number of cores)
+    :param df: the dataset, if already loaded (file_path is then not read)
+    :return: DataFrame containing model performance and cost metrics.
+    """
+    # Load dataset (only the feature and target columns)
+    if df is None:
+        df = load_dataset(file_path, columns=features + [target])
+
+    # Split data (features in float64 so results do not depend on the compact storage types)
+    X = df[features].astype("float64")
     y = df[target]
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
-    # Define models
-    models = {
-        "Linear Regression": LinearRegression(),
-        "Random Forest": RandomForestRegressor(n_estimators=100, random_state=42),
-        "Gradient Boosting": GradientBoostingRegressor(n_estimators=100, learning_rate=0.1, random_state=42),
-        "XGBoost": XGBRegressor(n_estimators=100, learning_rate=0.1, random_state=42),
-        "LightGBM": LGBMRegressor(n_estimators=100, learning_rate=0.1, random_state=42, force_row_wise=True),
-        "Neural Network": MLPRegressor(hidden_layer_sizes=(64, 64), max_iter=2000, learning_rate_init=0.0005,
-                                       activation='relu', solver='lbfgs', random_state=42),
-    }
+    # Share the CPU budget between the workers so the models' own threads do not oversubscribe the cores
+    names = list(MODEL_FACTORIES)
+    max_workers, n_jobs = _worker_budget(len(names), max_workers, cpu_budget)
 
-    # Train and evaluate models
-    results = {}
-    for name, model in models.items():
-        model.fit(X_train, y_train)  # Train model
-        y_pred = model.predict(X_test)  # Make predictions
-        r2 = r2_score(y_test, y_pred)  # Compute R² Score
-        mae = mean_absolute_error(y_test, y_pred)  # Compute MAE
-        results[name] = {"R² Score": r2, "MAE": mae}  # Store results
+    # Train and evaluate models (one fresh process per model, so peak memory is measured per model; with a single
+    # worker, in this process, sparing the start-up cost of the workers)
+    if max_workers == 1:
+        results = {name: evaluate_model(name, n_jobs, X_train, X_test, y_train, y_test) for name in names}
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, max_tasks_per_child=1) as executor:
+            futures = {name: executor.submit(evaluate_model, name, n_jobs, X_train, X_test, y_train, y_test)
+                       for name in names}
+            results = {name: future.result() for name, future in futures.items()}  # Store results
+
+    return pd.DataFrame(results).T
+
+
+def _worker_budget(n_tasks: int, max_workers: Optional[int], cpu_budget: Optional[int]) -> tuple:
+    # Splits the CPU budget between the workers: (number of workers, threads per worker)
+    cpu_budget = cpu_budget or os.cpu_count() or 1
+    max_workers = max(1, min(max_workers or cpu_budget, n_tasks, cpu_budget))
+    return max_workers, max(1, cpu_budget // max_workers)
 
+
+def evaluate_fold(train_index: np.ndarray, valid_index: np.ndarray, X: pd.DataFrame, y: pd.Series,
+                  n_jobs: int) -> dict:
+    """
+    Trains and evaluates every model on one cross-validation fold.
+
+    :param train_index: positions of the fold's training rows
+    :param valid_index: positions of the fold's validation rows
+    :param n_jobs: threads each model may use
+    :return: dictionary of model name -> R² Score, MAE and fit time on the fold
+    """
+    X_train, X_valid = X.iloc[train_index], X.iloc[valid_index]
+    y_train, y_valid = y.iloc[train_index], y.iloc[valid_index]
+
+    scores = {}
+    with threadpool_limits(limits=n_jobs):
+        for name, model in build_models(n_jobs).items():
+            # One span for the fit and the prediction of the fold's validation rows
+            with measure(name, "cv_fit", rows=len(X_train)) as span:
+                y_pred = model.fit(X_train, y_train).predict(X_valid)
+            scores[name] = {"R² Score": r2_score(y_valid, y_pred), "MAE": mean_absolute_error(y_valid, y_pred),
+                            "Fit Time (s)": span.wall_s}
+    return scores
+
+
+def cross_validate_models(file_path, n_splits: int = 5, max_workers: Optional[int] = None,
+                          cpu_budget: Optional[int] = None, df: Optional[pd.DataFrame] = None):
+    """
+    Evaluates the models with k-fold cross-validation on shared folds.
+
+    :param file_path: Path to the cleaned real estate dataset (CSV export or typed columnar dataset directory).
+    :param n_splits: number of folds
+    :param max_workers: number of folds evaluated at the same time (defaults to the CPU budget, at most one per fold)
+    :param cpu_budget: total number of threads shared by the workers (defaults to the number of cores)
+    :param df: the dataset, if already loaded (file_path is then not read)
+    :return: DataFrame with the mean and standard deviation of each metric over the folds.
+    """
+    # Load dataset (only the feature and target columns)
+    if df is None:
+        df = load_dataset(file_path, columns=features + [target])
+    X = df[features].astype("float64")
+    y = df[target]
+
+    # Compute the folds once; every model is trained and scored on the same folds
+    folds = list(KFold(n_splits=n_splits, shuffle=True, random_state=42).split(X))
+    max_workers, n_jobs = _worker_budget(len(folds), max_workers, cpu_budget)
+
+    if max_workers == 1:
+        fold_scores = [evaluate_fold(train_index, valid_index, X, y, n_jobs) for train_index, valid_index in folds]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            fold_scores = list(executor.map(evaluate_fold, *zip(*folds), [X] * len(folds), [y] * len(folds),
+                                            [n_jobs] * len(folds)))
+
+    results = {}
+    for name in fold_scores[0]:
+        scores = pd.DataFrame([fold[name] for fold in fold_scores])
+        results[name] = {"R² Score": scores["R² Score"].mean(), "R² Score Std": scores["R² Score"].std(),
+                         "MAE": scores["MAE"].mean(), "MAE Std": scores["MAE"].std(),
+                         "Fit Time (s)": scores["Fit Time (s)"].mean()}
     return pd.DataFrame(results).T
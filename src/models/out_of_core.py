@@ -0,0 +1,391 @@
+"""
+Real Estate Price Prediction - Out-of-Core Training
+
+`multiple_models.py` and `gradient_boosting_regressor_model.py` load the whole dataset and hold their train/test
+split in memory. This module trains the same candidate models on data streamed in batches (see
+storage.iter_batches), so datasets far larger than memory can be trained on with bounded memory.
+
+Streaming holdout: a listing belongs to the holdout set when a hash of its id falls in the first `holdout_percent`
+of the hash range. The split is decided row by row, is the same on every pass over the data and in every process,
+and needs no index of the whole dataset. Holdout metrics (MAE and R² Score) are accumulated batch by batch in one
+final pass.
+
+Training per model:
+- Linear Regression: exact least squares from the normal equations (XᵀX and Xᵀy accumulated batch by batch with
+  `partial_fit`), identical to scikit-learn's LinearRegression on the same rows.
+- Neural Network: one pass to fit the feature and target scaling, then `epochs` passes of `MLPRegressor.partial_fit`
+  (Adam) over the batches.
+- XGBoost: a `DataIter` over the training rows of each batch, read into an external-memory `DMatrix` whose pages
+  are cached on disk (`hist` trees).
+- LightGBM: one `lightgbm.Sequence` per memory-mapped Arrow part of the dataset, so LightGBM samples and bins the
+  training rows straight from the files. The binned matrix (one byte per feature and row) and the labels stay in
+  memory; this needs the typed columnar dataset, not a CSV export.
+- Random Forest and Gradient Boosting (scikit-learn, no incremental training): fitted on a uniform sample of at most
+  `sample_rows` training listings, drawn in one pass (each row gets a random key, and the rows with the smallest keys
+  are kept).
+
+Usage:
+    python -m src.models.out_of_core [--file PATH] [--models NAME ...] [--batch-size N] [--holdout-percent N]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.data_processing.storage import dataset_parts, iter_batches
+from src.instrumentation import current_rss, enable_log, measure
+from src.models.multiple_models import build_model, features, target
+
+# Get the absolute path of the current script (app.py) and define the correct model path
+base_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(base_dir, "..", ".."))
+file_path = os.path.join(project_root, "data", "cleaned_real_estate_data_numerical.csv")
+
+# Rows per streamed batch
+DEFAULT_BATCH_SIZE = 500_000
+
+# Share of the listings (by id hash) held out for the metrics, in percent
+HOLDOUT_PERCENT = 20
+
+# Passes of partial_fit over the data for the neural network
+DEFAULT_EPOCHS = 5
+
+# Largest training sample of the models without incremental training
+DEFAULT_SAMPLE_ROWS = 1_000_000
+
+# Models trained from streamed batches, and models trained on a bounded sample
+STREAMED_MODELS = ["Linear Regression", "Neural Network", "XGBoost", "LightGBM"]
+SAMPLED_MODELS = ["Random Forest", "Gradient Boosting"]
+
+
+def is_holdout(ids, holdout_percent: int = HOLDOUT_PERCENT) -> np.ndarray:
+    """
+    Decides the streaming holdout membership of listings from their ids.
+
+    :param ids: listing ids
+    :param holdout_percent: share of the listings held out (percent)
+    :return: boolean array, True for holdout listings
+    """
+    return pd.util.hash_array(np.asarray(ids, dtype=np.int64)) % 100 < holdout_percent
+
+
+def iter_split_batches(file_path: str, batch_size: int = DEFAULT_BATCH_SIZE, holdout_percent: int = HOLDOUT_PERCENT,
+                       holdout: bool = False) -> Iterator[tuple]:
+    """
+    Streams the training (or holdout) listings of a dataset in batches.
+
+    :param holdout: yield the holdout listings instead of the training listings
+    :return: iterator over (features in float64, target) batches
+    """
+    for batch in iter_batches(file_path, ["id"] + features + [target], batch_size):
+        selected = is_holdout(batch["id"], holdout_percent) == holdout
+        if selected.any():
+            yield batch.loc[selected, features].astype("float64"), batch.loc[selected, target].astype("float64")
+
+
+class StreamingMetrics:
+    """
+    Accumulates regression metrics batch by batch (exact MAE and R² Score in one pass).
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.abs_error = 0.0
+        self.sq_error = 0.0
+        self.y_sum = 0.0
+        self.y_sq_sum = 0.0
+
+    def update(self, y_true, y_pred) -> None:
+        y_true = np.asarray(y_true, dtype=np.float64)
+        error = y_true - np.asarray(y_pred, dtype=np.float64)
+        self.n += len(y_true)
+        self.abs_error += np.abs(error).sum()
+        self.sq_error += np.square(error).sum()
+        self.y_sum += y_true.sum()
+        self.y_sq_sum += np.square(y_true).sum()
+
+    def result(self) -> dict:
+        """
+        :return: R² Score, MAE and the number of holdout rows
+        """
+        total = self.y_sq_sum - self.y_sum ** 2 / self.n
+        return {"R² Score": 1.0 - self.sq_error / total, "MAE": self.abs_error / self.n, "Holdout Rows": self.n}
+
+
+class StreamingLinearRegression:
+    """
+    Ordinary least squares fitted batch by batch from the normal equations.
+    """
+
+    def __init__(self):
+        self.xtx = None
+        self.xty = None
+        self.coef_ = None
+        self.intercept_ = 0.0
+
+    def partial_fit(self, X, y) -> "StreamingLinearRegression":
+        design = np.column_stack([np.ones(len(X)), np.asarray(X, dtype=np.float64)])
+        if self.xtx is None:
+            self.xtx = np.zeros((design.shape[1], design.shape[1]))
+            self.xty = np.zeros(design.shape[1])
+        self.xtx += design.T @ design
+        self.xty += design.T @ np.asarray(y, dtype=np.float64)
+        solution = np.linalg.lstsq(self.xtx, self.xty, rcond=None)[0]
+        self.intercept_, self.coef_ = solution[0], solution[1:]
+        return self
+
+    def predict(self, X) -> np.ndarray:
+        return np.asarray(X, dtype=np.float64) @ self.coef_ + self.intercept_
+
+
+class StreamingNeuralNetwork:
+    """
+    MLPRegressor trained with partial_fit on standardized features and target.
+
+    :param epochs: passes over the data
+    """
+
+    def __init__(self, epochs: int = DEFAULT_EPOCHS):
+        from sklearn.neural_network import MLPRegressor
+        from sklearn.preprocessing import StandardScaler
+
+        reference = build_model("Neural Network")
+        self.network = MLPRegressor(hidden_layer_sizes=reference.hidden_layer_sizes, activation=reference.activation,
+                                    learning_rate_init=reference.learning_rate_init, solver="adam",
+                                    random_state=reference.random_state)
+        self.scaler = StandardScaler()
+        self.epochs = epochs
+        self.y_stats = StreamingMetrics()
+        self.y_mean, self.y_scale = 0.0, 1.0
+
+    def fit_scaling(self, X, y) -> None:
+        self.scaler.partial_fit(X)
+        self.y_stats.update(y, y)
+        self.y_mean = self.y_stats.y_sum / self.y_stats.n
+        self.y_scale = np.sqrt(max(self.y_stats.y_sq_sum / self.y_stats.n - self.y_mean ** 2, 1e-12))
+
+    def partial_fit(self, X, y) -> "StreamingNeuralNetwork":
+        self.network.partial_fit(self.scaler.transform(X), (np.asarray(y) - self.y_mean) / self.y_scale)
+        return self
+
+    def predict(self, X) -> np.ndarray:
+        return self.network.predict(self.scaler.transform(X)) * self.y_scale + self.y_mean
+
+
+class BoosterRegressor:
+    """
+    Prediction interface of a booster trained through the native XGBoost or LightGBM API.
+    """
+
+    def __init__(self, booster, library: str):
+        self.booster = booster
+        self.library = library
+
+    def predict(self, X) -> np.ndarray:
+        if self.library == "xgboost":
+            import xgboost as xgb
+
+            return self.booster.predict(xgb.DMatrix(X))
+        return self.booster.predict(X)
+
+
+def _train_xgboost(file_path: str, batch_size: int, holdout_percent: int, n_jobs: int,
+                   cache_dir: str) -> BoosterRegressor:
+    import xgboost as xgb
+
+    class TrainingBatches(xgb.DataIter):
+        # Hands the training rows of one streamed batch to XGBoost per call
+        def __init__(self):
+            self._batches = None
+            super().__init__(cache_prefix=os.path.join(cache_dir, "xgboost"))
+
+        def next(self, input_data) -> int:
+            if self._batches is None:
+                self._batches = iter_split_batches(file_path, batch_size, holdout_percent)
+            batch = next(self._batches, None)
+            if batch is None:
+                return 0
+            input_data(data=batch[0], label=batch[1])
+            return 1
+
+        def reset(self) -> None:
+            self._batches = None
+
+    model = build_model("XGBoost", n_jobs)
+    params = {**model.get_xgb_params(), "tree_method": "hist"}
+    matrix = xgb.DMatrix(TrainingBatches(), nthread=n_jobs)
+    return BoosterRegressor(xgb.train(params, matrix, num_boost_round=model.n_estimators), "xgboost")
+
+
+def _train_lightgbm(file_path: str, batch_size: int, holdout_percent: int, n_jobs: int) -> BoosterRegressor:
+    import lightgbm as lgb
+    import pyarrow.feather as feather
+
+    parts = dataset_parts(file_path)
+    if not parts:
+        raise ValueError(f"Out-of-core LightGBM reads the memory-mapped Arrow parts of the dataset; {file_path} has "
+                         f"none (see storage.write_dataset).")
+
+    class TrainingRows(lgb.Sequence):
+        # The training rows of one part, read from its memory-mapped columns
+        def __init__(self, columns: list, positions: np.ndarray):
+            self.columns = columns
+            self.positions = positions
+            self.batch_size = batch_size
+
+        def __len__(self) -> int:
+            return len(self.positions)
+
+        def __getitem__(self, idx):
+            rows = self.positions[idx]
+            if np.ndim(rows) == 0:  # one row, as LightGBM reads them when sampling for the bin boundaries
+                return np.array([column[rows] for column in self.columns], dtype=np.float64)
+            return np.column_stack([column[rows] for column in self.columns]).astype(np.float64)
+
+    sequences, labels = [], []
+    for part in parts:
+        table = feather.read_table(part, columns=["id"] + features + [target], memory_map=True)
+        positions = np.flatnonzero(~is_holdout(table.column("id").to_numpy(), holdout_percent))
+        if len(positions):
+            # Zero-copy views of the mapped columns (no missing values in the cleaned data)
+            sequences.append(TrainingRows([table.column(name).to_numpy() for name in features], positions))
+            labels.append(table.column(target).to_numpy()[positions].astype(np.float32))
+
+    model = build_model("LightGBM", n_jobs)
+    params = model.get_params()
+    num_boost_round = params.pop("n_estimators")
+    for key in ("importance_type", "class_weight"):
+        params.pop(key, None)
+    params["objective"] = params["objective"] or "regression"
+    dataset = lgb.Dataset(sequences, label=np.concatenate(labels), params={"verbose": -1})
+    return BoosterRegressor(lgb.train(params, dataset, num_boost_round=num_boost_round), "lightgbm")
+
+
+def sample_training_rows(file_path: str, sample_rows: int = DEFAULT_SAMPLE_ROWS, batch_size: int = DEFAULT_BATCH_SIZE,
+                         holdout_percent: int = HOLDOUT_PERCENT, seed: int = 42) -> tuple:
+    """
+    Draws a uniform sample of at most sample_rows training listings in one pass, with bounded memory.
+
+    :return: (features, target) of the sample, in dataset order
+    """
+    rng = np.random.default_rng(seed)
+    sample_X, sample_y, sample_keys, sample_order = None, None, np.empty(0), np.empty(0, dtype=np.int64)
+    seen = 0
+    for X, y in iter_split_batches(file_path, batch_size, holdout_percent):
+        keys = rng.random(len(X))
+        order = np.arange(seen, seen + len(X))
+        seen += len(X)
+        if sample_X is not None:
+            X, y = pd.concat([sample_X, X]), pd.concat([sample_y, y])
+            keys, order = np.concatenate([sample_keys, keys]), np.concatenate([sample_order, order])
+        if len(keys) > sample_rows:
+            kept = np.argpartition(keys, sample_rows - 1)[:sample_rows]
+            X, y, keys, order = X.iloc[kept], y.iloc[kept], keys[kept], order[kept]
+        sample_X, sample_y, sample_keys, sample_order = X, y, keys, order
+
+    if sample_X is None:
+        raise ValueError(f"No training listings in {file_path}.")
+    ordered = np.argsort(sample_order)
+    return sample_X.iloc[ordered].reset_index(drop=True), sample_y.iloc[ordered].reset_index(drop=True)
+
+
+def train_out_of_core(name: str, file_path: str = file_path, batch_size: int = DEFAULT_BATCH_SIZE,
+                      holdout_percent: int = HOLDOUT_PERCENT, epochs: int = DEFAULT_EPOCHS,
+                      sample_rows: int = DEFAULT_SAMPLE_ROWS, n_jobs: int = 1):
+    """
+    Trains one candidate model on streamed batches of the training listings.
+
+    :param name: model name (see STREAMED_MODELS and SAMPLED_MODELS)
+    :param file_path: Path to the cleaned real estate dataset (CSV export or typed columnar dataset directory).
+    :param batch_size: rows per streamed batch
+    :param holdout_percent: share of the listings held out (percent)
+    :param epochs: passes of partial_fit over the data (neural network)
+    :param sample_rows: largest training sample of the models without incremental training
+    :param n_jobs: threads the model may use
+    :return: fitted model with a `predict` method
+    """
+    if name == "Linear Regression":
+        model = StreamingLinearRegression()
+        for X, y in iter_split_batches(file_path, batch_size, holdout_percent):
+            model.partial_fit(X, y)
+        return model
+    if name == "Neural Network":
+        model = StreamingNeuralNetwork(epochs)
+        for X, y in iter_split_batches(file_path, batch_size, holdout_percent):
+            model.fit_scaling(X, y)
+        for _ in range(epochs):
+            for X, y in iter_split_batches(file_path, batch_size, holdout_percent):
+                model.partial_fit(X, y)
+        return model
+    if name == "XGBoost":
+        cache_dir = tempfile.mkdtemp(prefix="xgboost-cache-")
+        try:
+            return _train_xgboost(file_path, batch_size, holdout_percent, n_jobs, cache_dir)
+        finally:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+    if name == "LightGBM":
+        return _train_lightgbm(file_path, batch_size, holdout_percent, n_jobs)
+    if name in SAMPLED_MODELS:
+        X, y = sample_training_rows(file_path, sample_rows, batch_size, holdout_percent)
+        return build_model(name, n_jobs).fit(X, y)
+    raise ValueError(f"Unknown model: {name!r}")
+
+
+def evaluate_holdout(model, file_path: str = file_path, batch_size: int = DEFAULT_BATCH_SIZE,
+                     holdout_percent: int = HOLDOUT_PERCENT) -> dict:
+    """
+    Scores a model on the streaming holdout, one batch at a time.
+
+    :return: R² Score, MAE and the number of holdout rows
+    """
+    metrics = StreamingMetrics()
+    for X, y in iter_split_batches(file_path, batch_size, holdout_percent, holdout=True):
+        metrics.update(y, model.predict(X))
+    return metrics.result()
+
+
+def train_and_evaluate_out_of_core(file_path: str = file_path, models: Optional[list] = None,
+                                   batch_size: int = DEFAULT_BATCH_SIZE, holdout_percent: int = HOLDOUT_PERCENT,
+                                   epochs: int = DEFAULT_EPOCHS, sample_rows: int = DEFAULT_SAMPLE_ROWS,
+                                   n_jobs: int = 1) -> pd.DataFrame:
+    """
+    Trains the candidate models out of core, one after the other, and scores them on the streaming holdout.
+
+    :param models: model names; every streamed and sampled model if None
+    :return: DataFrame with the R² Score, MAE, fit time and peak memory of each model
+    """
+    results = {}
+    for name in models or STREAMED_MODELS + SAMPLED_MODELS:
+        memory_before = current_rss() or 0
+        with measure(name, "out_of_core_fit") as fit:
+            model = train_out_of_core(name, file_path, batch_size, holdout_percent, epochs, sample_rows, n_jobs)
+        with measure(name, "out_of_core_predict") as predict:
+            metrics = evaluate_holdout(model, file_path, batch_size, holdout_percent)
+        peak = max(fit.peak_rss_bytes or 0, predict.peak_rss_bytes or 0)
+        results[name] = {**metrics, "Fit Time (s)": fit.wall_s, "Predict Time (s)": predict.wall_s,
+                         "Peak Memory (MB)": (peak - memory_before) / (1024 * 1024)}
+        print(f"[out-of-core] {name}: MAE {metrics['MAE']:,.0f}, R² {metrics['R² Score']:.4f}, "
+              f"fit {fit.wall_s:.1f}s")
+    return pd.DataFrame(results).T
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the candidate models on data streamed in batches.")
+    parser.add_argument("--file", default=file_path, help="cleaned dataset (CSV export or dataset directory)")
+    parser.add_argument("--models", nargs="*", default=None, choices=STREAMED_MODELS + SAMPLED_MODELS,
+                        help="models to train (all if omitted)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="rows per streamed batch")
+    parser.add_argument("--holdout-percent", type=int, default=HOLDOUT_PERCENT, help="share of listings held out")
+    parser.add_argument("--epochs", type=int, default=DEFAULT_EPOCHS, help="partial_fit passes (neural network)")
+    parser.add_argument("--sample-rows", type=int, default=DEFAULT_SAMPLE_ROWS,
+                        help="training sample size of the models without incremental training")
+    parser.add_argument("--workers", type=int, default=None, help="threads per model (all cores if omitted)")
+    args = parser.parse_args()
+    enable_log()
+    scores = train_and_evaluate_out_of_core(args.file, args.models, args.batch_size, args.holdout_percent,
+                                            args.epochs, args.sample_rows, args.workers or os.cpu_count() or 1)
+    print(scores.to_string())
@@ -0,0 +1,170 @@
+"""
+Real Estate Price Prediction - Per-Partition Models with a Global Fallback
+
+Prices depend strongly on the ward, which the global model does not see. This script trains one Gradient Boosting
+model per partition of the ward-partitioned dataset (see data_processing/ward_partitions.py), in parallel, and keeps a
+partition's model only where it beats the global model (`gradient_boosting_regressor_model.py`) on that partition.
+Sparse partitions fall back to the global model.
+
+Steps:
+1. List the partitions of the ward-partitioned dataset (by ward, or by ward and size group).
+2. Reuse the global model's test set: the test listings recorded in the global model artifact (see model_artifact.py)
+   are the test listings of every partition, so partition and global models are compared on listings neither was
+   trained on, even after rows were appended or the global model was refreshed.
+3. Train the partition models in parallel worker processes, each reading only its own partition from disk.
+4. Route a partition to its own model if it has at least `--min-rows` training listings and its model's test MAE is
+   lower than the global model's on the same listings; otherwise route it to the global model.
+5. Save the partition models as model artifacts (see model_artifact.py) with a routing table (`routes.json`) in
+   `src/models/partition_models/`. `PartitionRouter` (see partition_router.py) loads the table and looks up (and
+   caches) the model of a listing.
+
+Usage:
+    python -m src.models.partition_models [--min-rows N] [--workers N]
+"""
+import argparse
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.metrics import mean_absolute_error, r2_score
+from threadpoolctl import threadpool_limits
+
+from src.data_processing.storage import list_partitions, load_partition
+from src.instrumentation import enable_log, measure
+from src.models.gradient_boosting_regressor_model import best_params_path, features, load_best_params, target
+from src.models.model_artifact import ModelArtifact, artifact_path, save_artifact
+from src.models.partition_router import ROUTES_FILE, partition_key, partition_models_path
+
+# Get the absolute path of the current script (app.py) and define the correct model path
+base_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(base_dir, "..", ".."))
+partitioned_path = os.path.join(project_root, "data", "cleaned_real_estate_data_by_ward")
+
+# Fewest training listings for a partition to get its own model
+MIN_PARTITION_ROWS = 200
+
+
+def train_partition(values: dict, partitioned_path: str, test_ids: np.ndarray, params: dict, min_rows: int,
+                    global_artifact_path: str, staging_dir: str) -> dict:
+    """
+    Trains and evaluates the model of one partition, and saves it if it beats the global model
+    (run in a worker process).
+
+    :param values: partition values (e.g. {'ward_num': 3})
+    :param test_ids: ids of the listings in the global model's test set
+    :param params: Gradient Boosting hyperparameters
+    :param min_rows: fewest training listings for the partition to get its own model
+    :param global_artifact_path: global model artifact
+    :param staging_dir: directory the partition's artifact is saved under
+    :return: the partition's routing entry
+    """
+    key = partition_key(values)
+    df = load_partition(partitioned_path, values, columns=["id"] + features + [target])
+    is_test = df["id"].isin(test_ids).to_numpy()
+    X, y = df[features].astype("float64"), df[target]
+    X_train, X_test, y_train, y_test = X[~is_test], X[is_test], y[~is_test], y[is_test]
+    entry = {"partition": values, "rows": len(df), "train_rows": len(X_train), "test_rows": len(X_test),
+             "route": "global"}
+
+    if len(X_train) < min_rows or len(X_test) == 0:
+        entry["reason"] = f"{len(X_train)} training listings, {len(X_test)} test listings"
+        return entry
+
+    global_model = ModelArtifact.load(global_artifact_path)
+    global_pred = global_model.flat_model.predict(X_test[global_model.feature_names].to_numpy())
+    entry["global_mae"] = mean_absolute_error(y_test, global_pred)
+
+    with threadpool_limits(limits=1):
+        model = GradientBoostingRegressor(n_estimators=100, learning_rate=0.1, random_state=42)
+        model.set_params(**params)
+        with measure("Gradient Boosting", "partition_fit", rows=len(X_train), partition=key):
+            model.fit(X_train, y_train)
+        y_pred = model.predict(X_test)
+    metrics = {"r2": r2_score(y_test, y_pred), "mae": mean_absolute_error(y_test, y_pred)}
+    entry.update(metrics)
+
+    if metrics["mae"] >= entry["global_mae"]:
+        entry["reason"] = "the global model is more accurate on this partition"
+        return entry
+    save_artifact(os.path.join(staging_dir, key), model, X_train, y_train, metrics)
+    entry["route"] = key
+    return entry
+
+
+def train_partition_models(partitioned_path: str = partitioned_path,
+                           output_dir: str = partition_models_path, global_artifact_path: str = artifact_path,
+                           best_params_path: str = best_params_path, min_rows: int = MIN_PARTITION_ROWS,
+                           max_workers: Optional[int] = None) -> dict:
+    """
+    Trains the partition models and writes the routing table (replacing the previous models as a whole).
+
+    :param partitioned_path: ward-partitioned dataset directory
+    :param output_dir: directory of the partition models and routing table
+    :param global_artifact_path: global model artifact (the fallback)
+    :param best_params_path: best hyperparameters file
+    :param min_rows: fewest training listings for a partition to get its own model
+    :param max_workers: number of partitions trained at the same time (the number of cores if None)
+    :return: the routing table
+    """
+    partitions = list_partitions(partitioned_path)
+    if not partitions:
+        raise FileNotFoundError(f"No partitions in {partitioned_path}; run src.data_processing.ward_partitions "
+                                f"first.")
+
+    # The listings the global model was scored on and never trained on, as recorded when it was trained (a fresh split
+    # of the current rows would differ once listings are appended, and a refreshed model has fitted the other rows)
+    test_ids = ModelArtifact.load(global_artifact_path).load_test_listings()
+    if test_ids is None:
+        raise FileNotFoundError(f"The global model artifact {global_artifact_path} does not record its test listings; "
+                                f"retrain it with src.models.gradient_boosting_regressor_model first.")
+    params = load_best_params(best_params_path)
+
+    staging_dir = output_dir.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(staging_dir)
+    arguments = (partitioned_path, test_ids, params, min_rows, global_artifact_path, staging_dir)
+    max_workers = min(max_workers or os.cpu_count() or 1, len(partitions))
+    if max_workers == 1:
+        entries = [train_partition(values, *arguments) for values in partitions]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(train_partition, values, *arguments) for values in partitions]
+            entries = [future.result() for future in futures]
+
+    routes = {"partition_columns": list(partitions[0]), "features": features, "min_rows": min_rows,
+              "partitions": {partition_key(entry["partition"]): entry for entry in entries}}
+    with open(os.path.join(staging_dir, ROUTES_FILE), "w", encoding="utf-8") as f:
+        json.dump(routes, f, indent=2)
+
+    # Swap the new models in as a whole, so the app never mixes models of two runs
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(staging_dir, output_dir)
+    return routes
+
+
+def main(partitioned_path: str = partitioned_path,
+         output_dir: str = partition_models_path, global_artifact_path: str = artifact_path,
+         best_params_path: str = best_params_path, min_rows: int = MIN_PARTITION_ROWS,
+         max_workers: Optional[int] = None) -> None:
+    routes = train_partition_models(partitioned_path, output_dir, global_artifact_path, best_params_path, min_rows,
+                                    max_workers)
+    table = pd.DataFrame(routes["partitions"].values(), index=list(routes["partitions"]))
+    print(table[[column for column in ("train_rows", "test_rows", "mae", "global_mae", "route")
+                 if column in table.columns]].to_string())
+    own = sum(entry["route"] != "global" for entry in routes["partitions"].values())
+    print(f"{own} of {len(table)} partitions use their own model; partition models saved at: {output_dir}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train per-partition price models with a global-model fallback.")
+    parser.add_argument("--min-rows", type=int, default=MIN_PARTITION_ROWS,
+                        help="fewest training listings for a partition to get its own model")
+    parser.add_argument("--workers", type=int, default=None, help="number of partitions trained at the same time")
+    args = parser.parse_args()
+    enable_log()
+    main(min_rows=args.min_rows, max_workers=args.workers)
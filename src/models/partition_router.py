@@ -0,0 +1,76 @@
+"""
+Partition Model Router
+
+Looks up the model of a listing among the per-partition models trained by `partition_models.py`, falling back to the
+global model. Kept apart from the training script so the web app can route listings with NumPy alone, without loading
+scikit-learn, pandas or the columnar storage libraries.
+
+Steps:
+1. Load the routing table (`routes.json`) of `src/models/partition_models/`.
+2. Build the partition key of a listing from its partition columns (e.g. 'ward_num=3/size_group=1').
+3. Load the partition's model artifact on first use (see model_artifact.py) and cache it, or use the global model.
+"""
+import json
+import os
+
+from src.models.model_artifact import MANIFEST_FILE, ModelArtifact, artifact_path
+
+# Get the absolute path of the current script (app.py) and define the correct model path
+base_dir = os.path.dirname(os.path.abspath(__file__))
+partition_models_path = os.path.join(base_dir, "partition_models")
+
+ROUTES_FILE = "routes.json"
+
+
+def partition_key(values: dict) -> str:
+    """
+    :param values: mapping of partition column -> value, outermost first
+    :return: key of the partition in the routing table, e.g. 'ward_num=3/size_group=1'
+    """
+    return "/".join(f"{column}={int(value)}" for column, value in values.items())
+
+
+class PartitionRouter:
+    """
+    Routes listings to their partition's model, or to the global model.
+
+    :param routes: routing table (see partition_models.train_partition_models)
+    :param directory: directory of the partition models
+    :param global_model: the global model artifact
+    """
+
+    def __init__(self, routes: dict, directory: str, global_model: ModelArtifact):
+        self.routes = routes
+        self.directory = directory
+        self.global_model = global_model
+        self.partition_columns = routes["partition_columns"]
+        self._models = {}
+
+    @classmethod
+    def load(cls, directory: str = partition_models_path,
+             global_artifact_path: str = artifact_path) -> "PartitionRouter":
+        """
+        Loads the routing table; partition models are loaded on first use.
+        """
+        with open(os.path.join(directory, ROUTES_FILE), encoding="utf-8") as f:
+            routes = json.load(f)
+        return cls(routes, directory, ModelArtifact.load(global_artifact_path))
+
+    def model_for(self, listing: dict) -> ModelArtifact:
+        """
+        Looks up the model of a listing (cached per partition).
+
+        :param listing: mapping with at least the partition columns
+        :return: the partition's model artifact, or the global model
+        """
+        key = partition_key({column: listing[column] for column in self.partition_columns})
+        model = self._models.get(key)
+        if model is None:
+            route = self.routes["partitions"].get(key, {}).get("route", "global")
+            path = os.path.join(self.directory, route)
+            if route != "global" and os.path.exists(os.path.join(path, MANIFEST_FILE)):
+                model = ModelArtifact.load(path)
+            else:
+                model = self.global_model
+            self._models[key] = model
+        return model
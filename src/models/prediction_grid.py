@@ -0,0 +1,120 @@
+"""
+Precomputed Prediction Grid for the Real Estate Price Model
+
+The web app only accepts a small, discrete input space: 1-10 bedrooms, 1-10 bathrooms, 9 size groups and a monthly
+maintenance fee that moves in $50 steps. This module predicts every point of that grid once, at model-build time,
+with a single batched `predict`, and stores the result as a compact array. Lookups are then O(1) array indexing, with
+linear interpolation on the maintenance fee axis between two $50 steps.
+
+The grid stores a hash of the model artifact it was built from (see model_artifact.artifact_hash), the artifact the app
+predicts from when an input falls outside the grid, so a stale grid is never used with a retrained model.
+"""
+import hashlib
+from typing import Optional
+
+import numpy as np
+
+# Grid axes (the web app's input ranges)
+BEDS = np.arange(1, 11)
+BATHS = np.arange(1, 11)
+SIZE_GROUPS = np.arange(0, 9)
+FEE_STEP = 50
+
+# Feature order expected by the model
+FEATURES = ["num_beds", "num_baths", "monthly_maintenance_fee", "size_group"]
+
+
+def file_hash(file_path: str) -> str:
+    """
+    Hashes the content of a file.
+
+    :param file_path: path to the file
+    :return: hex digest
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class PredictionGrid:
+    """
+    Model predictions over every (beds, baths, size group, fee) combination of the app's input space.
+
+    :param values: predictions indexed by [beds - 1, baths - 1, size_group, fee // fee_step]
+    :param fee_step: spacing of the maintenance fee axis ($)
+    :param model_hash: hash of the model artifact the grid was built from
+    """
+
+    def __init__(self, values: np.ndarray, fee_step: int = FEE_STEP, model_hash: Optional[str] = None):
+        self.values = np.ascontiguousarray(values, dtype=np.float64)
+        self.fee_step = int(fee_step)
+        self.model_hash = model_hash
+        self.max_fee = (self.values.shape[3] - 1) * self.fee_step
+
+    @classmethod
+    def build(cls, model, max_fee: float, fee_step: int = FEE_STEP,
+              model_hash: Optional[str] = None) -> "PredictionGrid":
+        """
+        Predicts every grid point with one batched call to the model.
+
+        :param model: trained model with a scikit-learn style `predict`
+        :param max_fee: largest maintenance fee covered by the grid (rounded up to a multiple of fee_step)
+        :param fee_step: spacing of the maintenance fee axis ($)
+        :param model_hash: hash of the model artifact (see model_artifact.artifact_hash)
+        :return: the prediction grid
+        """
+        import pandas as pd  # only needed at build time, not by the app looking predictions up
+
+        fees = np.arange(0, int(np.ceil(max_fee / fee_step)) * fee_step + 1, fee_step)
+        beds, baths, size_groups, fee_values = np.meshgrid(BEDS, BATHS, SIZE_GROUPS, fees, indexing="ij")
+        inputs = pd.DataFrame({"num_beds": beds.ravel(), "num_baths": baths.ravel(),
+                               "monthly_maintenance_fee": fee_values.ravel(), "size_group": size_groups.ravel()},
+                              columns=FEATURES, dtype=np.float64)
+        values = model.predict(inputs).reshape(beds.shape)
+        return cls(values, fee_step, model_hash)
+
+    def covers(self, num_beds: int, num_baths: int, monthly_maintenance_fee: float, size_group: int) -> bool:
+        """
+        Checks whether the inputs fall inside the grid.
+        """
+        return (BEDS[0] <= num_beds <= BEDS[-1] and BATHS[0] <= num_baths <= BATHS[-1]
+                and SIZE_GROUPS[0] <= size_group <= SIZE_GROUPS[-1] and 0 <= monthly_maintenance_fee <= self.max_fee
+                and float(num_beds).is_integer() and float(num_baths).is_integer()
+                and float(size_group).is_integer())
+
+    def predict(self, num_beds: int, num_baths: int, monthly_maintenance_fee: float, size_group: int) -> float:
+        """
+        Looks up the predicted listing price, interpolating linearly between the two nearest fee steps.
+        The inputs must be inside the grid (see covers).
+
+        :return: predicted listing price
+        """
+        row = self.values[int(num_beds) - BEDS[0], int(num_baths) - BATHS[0], int(size_group) - SIZE_GROUPS[0]]
+        position = monthly_maintenance_fee / self.fee_step
+        lower = min(int(position), len(row) - 1)
+        weight = position - lower
+        if weight == 0.0:
+            return float(row[lower])
+        return float(row[lower] + weight * (row[lower + 1] - row[lower]))
+
+    def save(self, file_path: str) -> None:
+        """
+        Saves the grid as a compressed NumPy archive.
+
+        :param file_path: path of the .npz file
+        """
+        np.savez_compressed(file_path, values=self.values, fee_step=self.fee_step,
+                            model_hash=np.array(self.model_hash or ""))
+
+    @classmethod
+    def load(cls, file_path: str) -> "PredictionGrid":
+        """
+        Loads a grid saved with save.
+
+        :param file_path: path of the .npz file
+        :return: the prediction grid
+        """
+        with np.load(file_path) as archive:
+            return cls(archive["values"], int(archive["fee_step"]), str(archive["model_hash"]) or None)
@@ -0,0 +1,325 @@
+"""
+Toronto Real Estate Pipeline Runner
+
+This script runs the whole project as one pipeline: data cleaning → subway distance → model training and model
+comparison → visualizations. Each step is a stage with declared inputs, outputs and parameters.
+
+Steps:
+1. Order the stages by their inputs and outputs (a stage depends on the stages producing its inputs), refusing stage
+   lists that cannot be ordered (duplicate names, an output produced by two stages, or a dependency cycle).
+2. Hash each stage's code (its module and every `src` module it imports), parameters and input files; skip the stage
+   if the hash matches the last successful run and its outputs are still the ones that run wrote.
+3. Run the remaining stages in worker processes, starting each stage as soon as the stages it depends on are done, so
+   independent stages (e.g. the visualizations and the model training) run concurrently.
+4. Record the hashes of the successful stages in `data/.pipeline_cache.json`.
+5. Each stage that runs is measured (wall time, CPU time, peak RSS, rows loaded, see instrumentation.py); the spans
+   are appended to the span log when run from the command line (see instrumentation.enable_log) and exported to
+   `data/metrics/instrumentation.prom` at the end of the run.
+
+Usage:
+    python -m src.pipeline [--force] [--workers N] [--dry-run] [stage ...]
+"""
+import argparse
+import hashlib
+import importlib
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Optional
+
+from src.hashing import code_hash, hash_path, output_signature
+from src.instrumentation import enable_log, measure, write_prometheus
+
+# Get the absolute path of the current script (app.py) and define the correct model path
+base_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(base_dir, ".."))
+data_dir = os.path.join(project_root, "data")
+images_dir = os.path.join(base_dir, "visualization", "visualization_images")
+cache_path = os.path.join(data_dir, ".pipeline_cache.json")
+
+# Data files shared between stages
+RAW_DATA = os.path.join(data_dir, "real-estate-data.csv")
+SUBWAY_SHAPEFILE = [os.path.join(data_dir, f"DMTI2012_Subway.{extension}")
+                    for extension in ("shp", "shx", "dbf", "prj")]
+CLEANED_DATA = os.path.join(data_dir, "cleaned_real_estate_data.csv")
+NUMERICAL_DATA = os.path.join(data_dir, "cleaned_real_estate_data_numerical.csv")
+NUMERICAL_DATASET = os.path.join(data_dir, "cleaned_real_estate_data_numerical")
+SUBWAY_DISTANCE_DATA = os.path.join(data_dir, "real_estate_data_with_subway_distance.csv")
+SUBWAY_DISTANCE_DATASET = os.path.join(data_dir, "real_estate_data_with_subway_distance")
+MODEL = os.path.join(base_dir, "models", "real_estate_model.pkl")
+MODEL_ARTIFACT = os.path.join(base_dir, "models", "real_estate_model")
+PREDICTION_GRID = os.path.join(base_dir, "models", "real_estate_prediction_grid.npz")
+BEST_PARAMS = os.path.join(base_dir, "models", "best_hyperparameters.json")
+SPATIAL_GRID_INDEX = os.path.join(data_dir, "spatial_grid_index.npz")
+WARD_DATASET = os.path.join(data_dir, "cleaned_real_estate_data_by_ward")
+PARTITION_MODELS = os.path.join(base_dir, "models", "partition_models")
+SIMILAR_LISTINGS_INDEX = os.path.join(data_dir, "similar_listings_index.joblib")
+COMPARABLES_DATA = os.path.join(data_dir, "real_estate_data_with_comparables.csv")
+COMPARABLES_DATASET = os.path.join(data_dir, "real_estate_data_with_comparables")
+
+# Figures drawn by the render_all stage, and the modules drawing them (render_all skips unchanged figures itself)
+FIGURE_IMAGES = ["baths_price_variation.png", "bedrooms_price_variation.png", "correlation_matrix.png",
+                 "maintenance_price_variation.png", "price_distribution.png", "size_price_variation.png",
+                 "wards_price_variation.png", "model_evaluation.png", "model_evaluation_scores.txt"]
+VISUALIZATION_MODULES = [os.path.join(base_dir, "visualization", f"{module}.py")
+                         for module in ("baths_price_variation", "bedrooms_price_variation", "correlation_matrix",
+                                        "maintenance_price_variation", "price_distribution", "size_price_variation",
+                                        "ward_price_variation", "evaluate_models")] + \
+    [os.path.join(base_dir, "models", "multiple_models.py")]
+
+
+@dataclass
+class Stage:
+    """
+    One step of the pipeline.
+
+    :param name: unique stage name
+    :param target: function run by the stage, as 'package.module:function'
+    :param inputs: files or directories read by the stage
+    :param outputs: files or directories written by the stage
+    :param params: keyword arguments passed to the function (part of the stage hash)
+    """
+    name: str
+    target: str
+    inputs: list
+    outputs: list
+    params: dict = field(default_factory=dict)
+
+
+def build_stages() -> list:
+    """
+    Declares every stage of the project pipeline.
+
+    :return: list of stages
+    """
+    return [
+        Stage(name="data_cleaning", target="src.data_processing.data_cleaning:main",
+              inputs=[RAW_DATA], outputs=[CLEANED_DATA],
+              params={"file_path": RAW_DATA, "output_path": CLEANED_DATA}),
+        Stage(name="data_cleaning_full_numerical", target="src.data_processing.data_cleaning_full_numerical:main",
+              inputs=[RAW_DATA], outputs=[NUMERICAL_DATA, NUMERICAL_DATASET],
+              params={"file_path": RAW_DATA, "output_path": NUMERICAL_DATA}),
+        Stage(name="subway_distance", target="src.data_processing.subway_distance_data_cleaning:main",
+              inputs=[NUMERICAL_DATA, NUMERICAL_DATASET] + SUBWAY_SHAPEFILE,
+              outputs=[SUBWAY_DISTANCE_DATA, SUBWAY_DISTANCE_DATASET],
+              params={"real_estate_file_path": NUMERICAL_DATA, "subway_file_path": SUBWAY_SHAPEFILE[0],
+                      "updated_file_path": SUBWAY_DISTANCE_DATA, "mode": "station"}),
+        Stage(name="spatial_grid_index", target="src.data_processing.spatial_grid_index:main",
+              inputs=[NUMERICAL_DATA, NUMERICAL_DATASET], outputs=[SPATIAL_GRID_INDEX],
+              params={"file_path": NUMERICAL_DATA, "index_path": SPATIAL_GRID_INDEX}),
+        Stage(name="similar_listings_index", target="src.data_processing.similar_listings_index:main",
+              inputs=[NUMERICAL_DATA, NUMERICAL_DATASET], outputs=[SIMILAR_LISTINGS_INDEX],
+              params={"file_path": NUMERICAL_DATA, "index_path": SIMILAR_LISTINGS_INDEX}),
+        Stage(name="comparables_features", target="src.data_processing.comparables_features:main",
+              inputs=[NUMERICAL_DATA, NUMERICAL_DATASET], outputs=[COMPARABLES_DATA, COMPARABLES_DATASET],
+              params={"real_estate_file_path": NUMERICAL_DATA, "updated_file_path": COMPARABLES_DATA}),
+        Stage(name="gradient_boosting_regressor_model", target="src.models.gradient_boosting_regressor_model:main",
+              inputs=[NUMERICAL_DATA, NUMERICAL_DATASET, BEST_PARAMS], outputs=[MODEL, MODEL_ARTIFACT, PREDICTION_GRID],
+              params={"file_path": NUMERICAL_DATA, "model_path": MODEL, "build_grid": True,
+                      "grid_path": PREDICTION_GRID, "best_params_path": BEST_PARAMS,
+                      "artifact_path": MODEL_ARTIFACT}),
+        Stage(name="ward_partitions", target="src.data_processing.ward_partitions:main",
+              inputs=[NUMERICAL_DATA, NUMERICAL_DATASET], outputs=[WARD_DATASET],
+              params={"file_path": NUMERICAL_DATA, "output_dir": WARD_DATASET}),
+        Stage(name="partition_models", target="src.models.partition_models:main",
+              inputs=[WARD_DATASET, MODEL_ARTIFACT, BEST_PARAMS],
+              outputs=[PARTITION_MODELS],
+              params={"partitioned_path": WARD_DATASET, "output_dir": PARTITION_MODELS,
+                      "global_artifact_path": MODEL_ARTIFACT, "best_params_path": BEST_PARAMS}),
+        Stage(name="render_all", target="src.visualization.render_all:main",
+              inputs=[NUMERICAL_DATA, NUMERICAL_DATASET] + VISUALIZATION_MODULES,
+              outputs=[os.path.join(images_dir, image) for image in FIGURE_IMAGES],
+              params={"file_path": NUMERICAL_DATA, "output_dir": images_dir}),
+        Stage(name="real_estate_with_distance", target="src.visualization.real_estate_with_distance:main",
+              inputs=[SUBWAY_DISTANCE_DATA, SUBWAY_DISTANCE_DATASET, SUBWAY_SHAPEFILE[0]],
+              outputs=[os.path.join(images_dir, "real_estate_subway_map.html")],
+              params={"real_estate_file_path": SUBWAY_DISTANCE_DATA, "subway_file_path": SUBWAY_SHAPEFILE[0],
+                      "output_path": os.path.join(images_dir, "real_estate_subway_map.html")}),
+    ]
+
+
+def stage_hash(stage: Stage) -> str:
+    """
+    Hashes everything that determines a stage's outputs: its function, the source of the module defining it and of the
+    `src` modules it imports, its parameters and the content of its inputs.
+
+    :param stage: pipeline stage
+    :return: hex digest
+    """
+    digest = hashlib.sha256()
+    digest.update(stage.target.encode())
+    digest.update(code_hash(stage.target.split(":")[0]).encode())
+    digest.update(json.dumps(stage.params, sort_keys=True).encode())
+    for path in stage.inputs:
+        digest.update(path.encode())
+        digest.update(str(hash_path(path)).encode())
+    return digest.hexdigest()
+
+
+def dependencies(stages: list) -> dict:
+    """
+    Finds, for each stage, the stages producing its inputs.
+
+    :param stages: pipeline stages
+    :return: mapping of stage name to the set of stage names it depends on
+    """
+    producers = {output: stage.name for stage in stages for output in stage.outputs}
+    return {stage.name: {producers[path] for path in stage.inputs
+                         if path in producers and producers[path] != stage.name}
+            for stage in stages}
+
+
+def check_stages(stages: list, depends_on: dict) -> None:
+    """
+    Checks that the stages can be ordered: unique names, one producer per output and no dependency cycle.
+
+    :param stages: pipeline stages
+    :param depends_on: mapping of stage name to the set of stage names it depends on (see dependencies)
+    :raises ValueError: if the stages cannot be ordered
+    """
+    names = [stage.name for stage in stages]
+    duplicates = {name for name in names if names.count(name) > 1}
+    if duplicates:
+        raise ValueError(f"Duplicate stage names: {', '.join(sorted(duplicates))}")
+
+    producers = {}
+    for stage in stages:
+        for output in stage.outputs:
+            if output in producers:
+                raise ValueError(f"{output} is produced by both {producers[output]} and {stage.name}")
+            producers[output] = stage.name
+
+    # Remove the stages whose dependencies are all removed until none is left; the rest form a cycle
+    remaining = {name: set(upstream) for name, upstream in depends_on.items()}
+    while remaining:
+        ready = [name for name, upstream in remaining.items() if not upstream & remaining.keys()]
+        if not ready:
+            raise ValueError(f"Dependency cycle between the stages: {', '.join(sorted(remaining))}")
+        for name in ready:
+            del remaining[name]
+
+
+def _load_cache() -> dict:
+    if os.path.exists(cache_path):
+        with open(cache_path) as f:
+            return json.load(f)
+    return {}
+
+
+def _save_cache(cache: dict) -> None:
+    with open(cache_path + ".tmp", "w") as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(cache_path + ".tmp", cache_path)
+
+
+def _run_stage(name: str, target: str, params: dict) -> None:
+    # Runs in a worker process: figures are rendered without a display
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    module_name, function_name = target.split(":")
+    with measure(name, "stage", target=target):
+        getattr(importlib.import_module(module_name), function_name)(**params)
+
+
+def run_pipeline(stages: Optional[list] = None, selected: Optional[list] = None, force: bool = False,
+                 max_workers: Optional[int] = None, dry_run: bool = False) -> dict:
+    """
+    Runs the pipeline, skipping stages whose outputs are already current and running independent stages concurrently.
+
+    A stage is hashed only once the stages it depends on have finished, so it sees their fresh outputs.
+
+    :param stages: pipeline stages; the project stages if None
+    :param selected: names of the stages to consider (with the stages they depend on); all stages if None
+    :param force: run every stage even if its outputs are current
+    :param max_workers: maximum number of stages running at the same time; the number of CPUs if None
+    :param dry_run: only report which stages would run (assuming upstream stages do not change their outputs)
+    :return: mapping of stage name to its status ('skipped', 'ran', 'failed', 'blocked' or 'would run')
+    :raises ValueError: if a selected stage is unknown or the stages cannot be ordered (see check_stages)
+    """
+    stages = stages if stages is not None else build_stages()
+    by_name = {stage.name: stage for stage in stages}
+    depends_on = dependencies(stages)
+    check_stages(stages, depends_on)
+
+    if selected is not None:
+        unknown = set(selected) - set(by_name)
+        if unknown:
+            raise ValueError(f"Unknown stages: {', '.join(sorted(unknown))}")
+        wanted, pending = set(), list(selected)
+        while pending:
+            name = pending.pop()
+            if name not in wanted:
+                wanted.add(name)
+                pending.extend(depends_on[name])
+        stages = [stage for stage in stages if stage.name in wanted]
+
+    cache = _load_cache()
+    status = {}
+    running = {}
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        while len(status) < len(stages):
+            for stage in stages:
+                if stage.name in status or stage.name in {name for name, _ in running.values()}:
+                    continue
+                upstream = depends_on[stage.name] & {s.name for s in stages}
+                if any(status.get(name) in ("failed", "blocked") for name in upstream):
+                    status[stage.name] = "blocked"
+                    print(f"[pipeline] {stage.name}: blocked by a failed upstream stage")
+                    continue
+                if not all(name in status for name in upstream):
+                    continue
+
+                key = stage_hash(stage)
+                cached = cache.get(stage.name, {})
+                current = (cached.get("key") == key
+                           and cached.get("outputs") == output_signature(stage.outputs)
+                           and all(os.path.exists(path) for path in stage.outputs))
+                if not force and current:
+                    status[stage.name] = "skipped"
+                    print(f"[pipeline] {stage.name}: up to date")
+                elif dry_run:
+                    status[stage.name] = "would run"
+                    print(f"[pipeline] {stage.name}: would run")
+                else:
+                    print(f"[pipeline] {stage.name}: running")
+                    running[executor.submit(_run_stage, stage.name, stage.target, stage.params)] = (stage.name, key)
+
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, key = running.pop(future)
+                try:
+                    future.result()
+                except Exception as error:  # report and keep running independent stages
+                    status[name] = "failed"
+                    cache.pop(name, None)
+                    print(f"[pipeline] {name}: failed ({error!r})")
+                else:
+                    status[name] = "ran"
+                    cache[name] = {"key": key, "outputs": output_signature(by_name[name].outputs)}
+                    print(f"[pipeline] {name}: done")
+                if not dry_run:
+                    _save_cache(cache)
+
+    # Export the spans of the stages that ran (measured in the workers) for Prometheus
+    if any(value in ("ran", "failed") for value in status.values()):
+        write_prometheus()
+    return status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the Toronto real estate pipeline.")
+    parser.add_argument("stages", nargs="*", help="stages to run (with their upstream stages); all if omitted")
+    parser.add_argument("--force", action="store_true", help="run stages even if their outputs are current")
+    parser.add_argument("--workers", type=int, default=None, help="maximum number of concurrent stages")
+    parser.add_argument("--dry-run", action="store_true", help="only show which stages would run")
+    args = parser.parse_args()
+    enable_log()
+
+    result = run_pipeline(selected=args.stages or None, force=args.force, max_workers=args.workers,
+                          dry_run=args.dry_run)
+    if any(value in ("failed", "blocked") for value in result.values()):
+        raise SystemExit(1)
@@ -0,0 +1,307 @@
+"""
+Real Estate Price Prediction Service
+
+A standalone HTTP JSON backend for the real estate price model, for systems that need predictions without going
+through the Streamlit app. It loads the model artifact once at startup (memory-mapped, see models/model_artifact.py),
+validates every listing against the artifact's feature schema and serves it with asyncio (standard library only).
+
+Concurrent requests are collected into micro-batches: the first waiting request opens a batch, which is closed when
+it holds `max_batch_size` listings or after `max_wait_ms`, whichever comes first. Each batch is predicted with one
+vectorized call to the flattened model (see models/flat_ensemble.py) in a worker thread, so the event loop keeps
+accepting requests meanwhile.
+
+Endpoints:
+- POST /predict  body: {"listings": [{"num_beds": 2, "num_baths": 1, "monthly_maintenance_fee": 550,
+                                      "size_group": 2}, ...]}
+                 (a single listing may also be sent as {"listing": {...}})
+                 response: {"predictions": [...]}
+- GET /stats     request latency percentiles (ms) over the most recent requests, and batch sizes
+- GET /metrics   Prometheus text exposition of the instrumented spans of this process (batch predictions, see
+                 instrumentation.py)
+- GET /health    {"status": "ok"}
+- GET /model     the artifact's manifest (feature schema, training data hash, metrics)
+
+Usage:
+    python -m src.prediction_service [--host HOST] [--port PORT] [--max-batch-size N] [--max-wait-ms MS]
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from typing import Callable, Optional
+
+import numpy as np
+
+from src.instrumentation import measure, registry
+from src.models.model_artifact import ModelArtifact
+
+# Get the absolute path of the current script (app.py) and define the correct model path
+base_dir = os.path.dirname(os.path.abspath(__file__))
+artifact_path = os.path.join(base_dir, "models", "real_estate_model")
+
+# Largest request body accepted (bytes)
+MAX_BODY_SIZE = 1 << 20
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class LatencyTracker:
+    """
+    Keeps the most recent request latencies and reports their percentiles.
+
+    :param window: number of recent requests kept
+    """
+
+    def __init__(self, window: int = 10_000):
+        self.latencies = deque(maxlen=window)
+        self.count = 0
+
+    def record(self, seconds: float) -> None:
+        self.latencies.append(seconds)
+        self.count += 1
+
+    def summary(self) -> dict:
+        """
+        :return: total request count and p50/p90/p99/max latency (ms) over the recent window
+        """
+        if not self.latencies:
+            return {"requests": self.count}
+        p50, p90, p99 = np.percentile(np.fromiter(self.latencies, dtype=np.float64) * 1000.0, [50, 90, 99])
+        return {"requests": self.count, "window": len(self.latencies), "p50_ms": round(p50, 3),
+                "p90_ms": round(p90, 3), "p99_ms": round(p99, 3), "max_ms": round(max(self.latencies) * 1000.0, 3)}
+
+
+class MicroBatcher:
+    """
+    Groups concurrent prediction requests into batches predicted with one vectorized call.
+
+    :param predict: function predicting a 2-D array of feature rows
+    :param max_batch_size: largest number of listings in one batch
+    :param max_wait: longest time (s) the first request of a batch waits for more requests
+    """
+
+    def __init__(self, predict: Callable[[np.ndarray], np.ndarray], max_batch_size: int = 64,
+                 max_wait: float = 0.002):
+        self.predict = predict
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batch_sizes = deque(maxlen=10_000)
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+
+    async def submit(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Queues the rows of one request and waits for the batch containing them.
+
+        :param rows: float array of shape (n_listings, n_features)
+        :return: predictions for the rows
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((rows, future))
+        return await future
+
+    async def _collect(self) -> list:
+        pending = [await self._queue.get()]
+        size = len(pending[0][0])
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while size < self.max_batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            pending.append(item)
+            size += len(item[0])
+        return pending
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = await self._collect()
+            batch = np.concatenate([rows for rows, _ in pending])
+            self.batch_sizes.append(len(batch))
+            try:
+                predictions = await loop.run_in_executor(None, self.predict, batch)
+            except Exception as error:  # hand the failure to every waiting request
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+
+            start = 0
+            for rows, future in pending:
+                if not future.done():
+                    future.set_result(predictions[start:start + len(rows)])
+                start += len(rows)
+
+
+def parse_listings(payload: dict, model: ModelArtifact) -> np.ndarray:
+    """
+    Validates a /predict request body against the model's feature schema and converts it into a feature array.
+
+    :param payload: decoded JSON body with a "listings" list or a single "listing"
+    :param model: model artifact
+    :return: float array of shape (n_listings, n_features), columns in the model's feature order
+    """
+    if not isinstance(payload, dict):
+        raise ValueError('The request body must be a JSON object with a "listings" list.')
+    listings = payload.get("listings", [payload["listing"]] if "listing" in payload else None)
+    if not isinstance(listings, list) or not listings:
+        raise ValueError('The request body must contain a non-empty "listings" list.')
+
+    rows = []
+    for position, listing in enumerate(listings):
+        if not isinstance(listing, dict):
+            raise ValueError("Every listing must be a JSON object.")
+        errors = model.validate(listing)
+        if errors:
+            raise ValueError(f"Listing {position}: {' '.join(errors)}")
+        rows.append(model.to_row(listing))
+    return np.array(rows, dtype=np.float64)
+
+
+class PredictionService:
+    """
+    HTTP/1.1 JSON front end of the micro-batched model.
+
+    :param model: model artifact (see models/model_artifact.py)
+    :param max_batch_size: largest number of listings in one batch
+    :param max_wait: longest time (s) a request waits for its batch to fill up
+    """
+
+    def __init__(self, model: ModelArtifact, max_batch_size: int = 64, max_wait: float = 0.002):
+        self.model = model
+        self.batcher = MicroBatcher(self.predict_batch, max_batch_size, max_wait)
+        self.latency = LatencyTracker()
+
+    def predict_batch(self, rows: np.ndarray) -> np.ndarray:
+        # Measured per batch, without the peak RSS reset and the JSON log (too frequent); scraped from /metrics
+        with measure("flat_model", "predict", rows=len(rows), memory=False, log=False):
+            return self.model.flat_model.predict(rows)
+
+    def stats(self) -> dict:
+        batch_sizes = np.fromiter(self.batcher.batch_sizes, dtype=np.float64)
+        return {"latency": self.latency.summary(), "batches": int(len(batch_sizes)),
+                "mean_batch_size": round(float(batch_sizes.mean()), 2) if len(batch_sizes) else None,
+                "max_batch_size": self.batcher.max_batch_size, "max_wait_ms": self.batcher.max_wait * 1000.0}
+
+    async def handle_request(self, method: str, path: str, body: bytes) -> tuple:
+        """
+        Routes one request.
+
+        :return: (HTTP status, JSON-serializable response, or text for /metrics)
+        """
+        if path == "/health":
+            return 200, {"status": "ok"}
+        if path == "/stats":
+            return 200, self.stats()
+        if path == "/model":
+            return 200, self.model.manifest
+        if path == "/metrics":
+            return 200, registry.to_prometheus()
+        if path != "/predict":
+            return 404, {"error": f"Unknown path {path}."}
+        if method != "POST":
+            return 405, {"error": "Use POST for /predict."}
+
+        start = time.perf_counter()
+        try:
+            rows = parse_listings(json.loads(body or b"null"), self.model)
+        except (ValueError, KeyError) as error:
+            return 400, {"error": str(error)}
+        predictions = await self.batcher.submit(rows)
+        self.latency.record(time.perf_counter() - start)
+        return 200, {"predictions": predictions.tolist()}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Serves the requests of one (possibly keep-alive) connection.
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, version = request_line.decode("latin-1").split()
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_SIZE:
+                    status, response = 413, {"error": "Request body too large."}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    try:
+                        status, response = await self.handle_request(method, path.split("?")[0], body)
+                    except Exception as error:
+                        status, response = 500, {"error": str(error)}
+                    connection = headers.get("connection", "").lower()
+                    keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+
+                if isinstance(response, str):  # Prometheus text exposition
+                    payload, content_type = response.encode(), "text/plain; version=0.0.4"
+                else:
+                    payload, content_type = json.dumps(response).encode(), "application/json"
+                writer.write(f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\nContent-Type: {content_type}\r\n"
+                             f"Content-Length: {len(payload)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass  # malformed request or client went away
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int) -> None:
+        self.batcher.start()
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"Serving predictions on http://{host}:{port} "
+              f"(max batch size {self.batcher.max_batch_size}, max wait {self.batcher.max_wait * 1000.0:g} ms)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.batcher.stop()
+            print(f"Latency: {json.dumps(self.latency.summary())}")
+
+
+def main(host: str = "127.0.0.1", port: int = 8000, max_batch_size: int = 64, max_wait_ms: float = 2.0,
+         artifact_path: str = artifact_path) -> None:
+    # Load the model once (its tree arrays are memory-mapped, so several service processes share them)
+    model = ModelArtifact.load(artifact_path)
+    service = PredictionService(model, max_batch_size=max_batch_size, max_wait=max_wait_ms / 1000.0)
+    try:
+        asyncio.run(service.serve(host, port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve real estate price predictions over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="interface to listen on")
+    parser.add_argument("--port", type=int, default=8000, help="port to listen on")
+    parser.add_argument("--max-batch-size", type=int, default=64, help="largest number of listings in one batch")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0,
+                        help="longest time a request waits for its batch to fill up (ms)")
+    parser.add_argument("--artifact", default=artifact_path, help="model artifact directory")
+    args = parser.parse_args()
+    main(args.host, args.port, args.max_batch_size, args.max_wait_ms, args.artifact)
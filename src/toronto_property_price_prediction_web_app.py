@@ -7,25 +7,128 @@ using a trained machine learning model.
 Features:
 - User-friendly interface for inputting property details
 - Supports numerical and categorical input fields
-- Loads a pre-trained model to make real-time predictions
+- Loads a pre-trained model artifact to make real-time predictions, validating inputs against its feature schema
+- Answers from a precomputed prediction grid (see models/prediction_grid.py) when available, and otherwise from a
+  flattened copy of the model (memory-mapped from the artifact, see models/model_artifact.py)
 - Displays the predicted listing price
+- Routes the prediction of a listing in a known ward to that ward's own model when it beats the global model there
+  (see models/partition_models.py and models/partition_router.py), with the global model as fallback
+- Lists the most similar existing listings (beds, baths, size group, maintenance fee and, optionally, location) from
+  a persisted KD-tree index (see data_processing/similar_listings_index.py) shared by all sessions
 
 Author: Vennise Ho
 Date: 2025-03-01
 Generated with assistance from ChatGPT (OpenAI)
 """
 import os
+import sys
 
 import streamlit as st
-import pandas as pd
-import joblib  # For loading the trained model
 
 # Get the absolute path of the current script (app.py) and define the correct model path
 base_dir = os.path.dirname(os.path.abspath(__file__))
-model_path = os.path.join(base_dir, "models", "real_estate_model.pkl")
+artifact_path = os.path.join(base_dir, "models", "real_estate_model")
+grid_path = os.path.join(base_dir, "models", "real_estate_prediction_grid.npz")
+listings_path = os.path.join(base_dir, "..", "data", "cleaned_real_estate_data_numerical.csv")
+similar_listings_path = os.path.join(base_dir, "..", "data", "similar_listings_index.joblib")
+partition_models_path = os.path.join(base_dir, "models", "partition_models")
 
-# Load the path from joblib
-model = joblib.load(model_path)
+# Number of similar listings shown with a prediction
+SIMILAR_LISTINGS = 5
+
+# Make the project root importable when the app is started with `streamlit run`
+project_root = os.path.abspath(os.path.join(base_dir, ".."))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.models.model_artifact import ModelArtifact, artifact_hash  # noqa: E402
+from src.models.prediction_grid import PredictionGrid  # noqa: E402
+
+
+@st.cache_resource
+def load_model() -> ModelArtifact:
+    """
+    Loads the model artifact (feature schema and memory-mapped tree arrays) once per server process.
+
+    :return: the model artifact
+    """
+    return ModelArtifact.load(artifact_path)
+
+
+@st.cache_resource
+def load_prediction_grid():
+    """
+    Loads the precomputed prediction grid once per server process, if it was built from the model artifact the app
+    predicts from.
+
+    :return: the prediction grid, or None if it is missing or stale
+    """
+    if not os.path.exists(grid_path):
+        return None
+    grid = PredictionGrid.load(grid_path)
+    return grid if grid.model_hash == artifact_hash(artifact_path) else None
+
+
+@st.cache_resource
+def load_similar_listings():
+    """
+    Loads the similar listings index once per server process (built and persisted first if it is missing or older
+    than the dataset).
+
+    :return: the similar listings index, or None if the dataset is missing
+    """
+    if not os.path.exists(listings_path):
+        return None
+    from src.data_processing.similar_listings_index import SimilarListingsIndex
+
+    return SimilarListingsIndex.load_or_build(listings_path, similar_listings_path)
+
+
+@st.cache_resource
+def load_partition_router():
+    """
+    Loads the routing table of the per-partition models once per server process; each partition's model is loaded on
+    its first prediction and kept by the router.
+
+    :return: the partition router, or None if no partition models were trained
+    """
+    from src.models.partition_router import ROUTES_FILE, PartitionRouter
+
+    if not os.path.exists(os.path.join(partition_models_path, ROUTES_FILE)):
+        return None
+    return PartitionRouter.load(partition_models_path, artifact_path)
+
+
+def predict_price(num_beds: int, num_baths: int, monthly_maintenance_fee: float, size_group: int,
+                  ward_num=None) -> float:
+    """
+    Predicts the listing price. A listing in a ward with its own model is predicted by that model; other listings
+    use the precomputed grid when the inputs fall inside it and the flattened global model otherwise. Predictions are
+    cached for the rest of the user's session.
+
+    :return: predicted listing price
+    """
+    inputs = (num_beds, num_baths, monthly_maintenance_fee, size_group)
+    session_cache = st.session_state.setdefault("predictions", {})
+    router = load_partition_router() if ward_num is not None else None
+    if router is not None:
+        model = router.model_for({"ward_num": ward_num, "size_group": size_group})
+        if model is not router.global_model:
+            key = inputs + (ward_num,)
+            if key not in session_cache:
+                listing = dict(zip(["num_beds", "num_baths", "monthly_maintenance_fee", "size_group"], inputs))
+                session_cache[key] = model.flat_model.predict_one(model.to_row(listing))
+            return session_cache[key]
+
+    if inputs not in session_cache:
+        grid = load_prediction_grid()
+        if grid is not None and grid.covers(*inputs):
+            session_cache[inputs] = grid.predict(*inputs)
+        else:
+            model = load_model()
+            listing = dict(zip(["num_beds", "num_baths", "monthly_maintenance_fee", "size_group"], inputs))
+            session_cache[inputs] = model.flat_model.predict_one(model.to_row(listing))
+    return session_cache[inputs]
 
 
 # Streamlit UI
@@ -52,18 +155,45 @@ def main():
                               format_func=lambda x: {0: "0-499 sqft", 1: "500-999 sqft", 2: "1000-1499 sqft",
                                                      3: "1500-1999 sqft", 4: "2000-2499 sqft", 5: "2500-2999 sqft",
                                                      6: "3000-3499 sqft", 7: "3500-3999 sqft", 8: "4000+ sqft"}[x])
+    router = load_partition_router()
+    wards = sorted({entry["partition"]["ward_num"] for entry in router.routes["partitions"].values()}) \
+        if router is not None else []
+    ward_num = st.selectbox("Ward", options=[None] + wards,
+                            format_func=lambda x: "Any ward" if x is None else f"Ward {x}")
+    compare_location = st.checkbox("Compare location with similar listings")
+    latitude = longitude = None
+    if compare_location:
+        latitude = st.number_input("Latitude", min_value=43.5, max_value=44.0, value=43.6532, format="%.4f")
+        longitude = st.number_input("Longitude", min_value=-79.7, max_value=-79.1, value=-79.3832, format="%.4f")
 
     if st.button("Predict Price"):
-        # Create input DataFrame
-        input_data = pd.DataFrame([[num_beds, num_baths, monthly_maintenance_fee, size_group]],
-                                  columns=["num_beds", "num_baths", "monthly_maintenance_fee", "size_group"])
+        # Check the inputs against the model's feature schema
+        model = load_model()
+        listing = {"num_beds": num_beds, "num_baths": num_baths,
+                   "monthly_maintenance_fee": monthly_maintenance_fee, "size_group": size_group}
+        errors = model.validate(listing)
+        if errors:
+            st.error(" ".join(errors))
+            return
+        outside = model.out_of_range(listing)
+        if outside:
+            st.warning(f"Outside the range of the training data ({', '.join(outside)}): the prediction is an "
+                       f"extrapolation.")
 
         # Make prediction
-        predicted_price = model.predict(input_data)[0]
+        predicted_price = predict_price(num_beds, num_baths, monthly_maintenance_fee, size_group, ward_num)
 
         # Display result
         st.success(f"🏡 Predicted Listing Price: **${predicted_price:,.2f}**")
 
+        # Show the most similar existing listings
+        similar_listings = load_similar_listings()
+        if similar_listings is not None:
+            st.subheader("Similar Listings")
+            st.dataframe(similar_listings.query(num_beds, num_baths, size_group, monthly_maintenance_fee,
+                                                k=SIMILAR_LISTINGS, latitude=latitude, longitude=longitude),
+                         hide_index=True)
+
 
 if __name__ == "__main__":
     main()
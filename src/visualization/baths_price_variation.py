@@ -10,28 +10,50 @@ Generated with assistance from ChatGPT (OpenAI)
 """
 import os
 
-import pandas as pd
 import matplotlib.pyplot as plt
+import pandas as pd
 import seaborn as sns
 
+from src.data_processing.storage import load_dataset
+
 # Get the absolute path of the current script (app.py) and define the correct model path
 base_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(base_dir, "..", ".."))
 file_path = os.path.join(project_root, "data", "cleaned_real_estate_data_numerical.csv")
+output_path = os.path.join(base_dir, 'visualization_images', 'baths_price_variation.png')
+
+# Columns needed for the figure
+columns = ['num_baths', 'listing_price']
+
+
+def plot_baths_price_variation(df: pd.DataFrame, output_path: str = output_path) -> None:
+    """
+    Creates a boxplot of listing prices by number of bathrooms and saves it.
+
+    :param df: cleaned real estate data with 'num_baths' and 'listing_price' columns
+    :param output_path: path of the image to write
+    """
+    plt.figure(figsize=(12, 6))
+
+    # Create a boxplot for price variations by number of bathrooms
+    sns.boxplot(x=df['num_baths'], y=df['listing_price'])
+
+    # Labels and title
+    plt.xlabel("Number of Bathrooms")
+    plt.ylabel("Listing Price")
+    plt.title("Price Variations by Number of Bathrooms")
 
-# Load dataset
-df = pd.read_csv(file_path)
+    # Save plot
+    plt.savefig(output_path, dpi=300)
+    plt.close()
 
-plt.figure(figsize=(12, 6))
 
-# Create a boxplot for price variations by number of bathrooms
-sns.boxplot(x=df['num_baths'], y=df['listing_price'])
+def main(file_path: str = file_path, output_path: str = output_path) -> None:
+    # Load dataset
+    df = load_dataset(file_path, columns=columns)
+    plot_baths_price_variation(df, output_path)
+    print("Figure created successfully! You can open 'baths_price_variation' to view it.")
 
-# Labels and title
-plt.xlabel("Number of Bathrooms")
-plt.ylabel("Listing Price")
-plt.title("Price Variations by Number of Bathrooms")
 
-# Save plot
-plt.savefig(os.path.join(base_dir, 'visualization_images', 'baths_price_variation'), dpi=300)
-print("Figure created successfully! You can open 'baths_price_variation' to view it.")
+if __name__ == "__main__":
+    main()
@@ -9,20 +9,30 @@ Date: 2025-03-01
 Generated with assistance from ChatGPT (OpenAI)
 """
 import os
+
 import matplotlib.pyplot as plt
-import seaborn as sns
 import pandas as pd
+import seaborn as sns
+
+from src.data_processing.storage import load_dataset
 
 # Get the absolute path of the current script (app.py) and define the correct model path
 base_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(base_dir, "..", ".."))
 file_path = os.path.join(project_root, "data", "cleaned_real_estate_data_numerical.csv")
+output_path = os.path.join(base_dir, 'visualization_images', 'bedrooms_price_variation.png')
+
+# Columns needed for the figure
+columns = ['num_beds', 'listing_price']
 
-# Load the dataset from the correct location
-df = pd.read_csv(file_path)
 
-# Ensure 'num_beds' and 'listing_price' exist before analysis
-if 'num_beds' in df.columns and 'listing_price' in df.columns:
+def plot_bedrooms_price_variation(df: pd.DataFrame, output_path: str = output_path) -> None:
+    """
+    Creates a boxplot (with whiskers and outliers) of listing prices by number of bedrooms and saves it.
+
+    :param df: cleaned real estate data with 'num_beds' and 'listing_price' columns
+    :param output_path: path of the image to write
+    """
     plt.figure(figsize=(12, 6))
 
     # Create a boxplot to show price variation (whiskers and box plot) by number of bedrooms
@@ -34,8 +44,16 @@ if 'num_beds' in df.columns and 'listing_price' in df.columns:
     plt.title("Price Variations by Number of Bedrooms (Boxplot with Whiskers)")
 
     # Save plot
-    plt.savefig(os.path.join(base_dir, 'visualization_images', 'bedrooms_price_variation'), dpi=300)
+    plt.savefig(output_path, dpi=300)
+    plt.close()
+
+
+def main(file_path: str = file_path, output_path: str = output_path) -> None:
+    # Load the dataset from the correct location
+    df = load_dataset(file_path, columns=columns)
+    plot_bedrooms_price_variation(df, output_path)
     print("Figure created successfully! You can open 'bedrooms_price_variation' to view it.")
 
-else:
-    print("Error: 'num_beds' or 'listing_price' column not found in the dataset.")
+
+if __name__ == "__main__":
+    main()
@@ -12,30 +12,51 @@ Date: 2025-03-01
 Generated with assistance from ChatGPT (OpenAI)
 """
 import os
-import pandas as pd
+
 import matplotlib.pyplot as plt
+import pandas as pd
 import seaborn as sns
 
+from src.data_processing.storage import load_dataset
+
 # Get the absolute path of the current script (app.py) and define the correct model path
 base_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(base_dir, "..", ".."))
 file_path = os.path.join(project_root, "data", "cleaned_real_estate_data_numerical.csv")
+output_path = os.path.join(base_dir, 'visualization_images', 'correlation_matrix.png')
+
+
+def plot_correlation_matrix(df: pd.DataFrame, output_path: str = output_path) -> None:
+    """
+    Computes the correlation matrix of the real estate data (without the id column), draws it as a heatmap and
+    saves it.
+
+    :param df: cleaned real estate data
+    :param output_path: path of the image to write
+    """
+    # Compute the correlation matrix
+    correlation_matrix = df.drop(columns=['id'], errors='ignore').corr()
+
+    # Create a heatmap for the correlation matrix
+    plt.figure(figsize=(12, 8))
+    sns.heatmap(correlation_matrix, annot=True, fmt=".2f", cmap="coolwarm", linewidths=0.5)
+
+    # Title and labels
+    plt.title("Correlation Matrix Heatmap")
+    plt.xticks(rotation=45, ha='right')
+    plt.yticks(rotation=0)
 
-# Load dataset
-df = pd.read_csv(file_path)
+    # Save the heatmap
+    plt.savefig(output_path, dpi=300)
+    plt.close()
 
-# Compute the correlation matrix
-correlation_matrix = df.drop(columns=['id']).corr()
 
-# Create a heatmap for the correlation matrix
-plt.figure(figsize=(12, 8))
-sns.heatmap(correlation_matrix, annot=True, fmt=".2f", cmap="coolwarm", linewidths=0.5)
+def main(file_path: str = file_path, output_path: str = output_path) -> None:
+    # Load dataset
+    df = load_dataset(file_path)
+    plot_correlation_matrix(df, output_path)
+    print("Figure created successfully! You can open 'correlation_matrix' to view it.")
 
-# Title and labels
-plt.title("Correlation Matrix Heatmap")
-plt.xticks(rotation=45, ha='right')
-plt.yticks(rotation=0)
 
-# Save the heatmap
-plt.savefig(os.path.join(base_dir, 'visualization_images', 'correlation_matrix'), dpi=300)
-print("Figure created successfully! You can open 'correlation_matrix' to view it.")
+if __name__ == "__main__":
+    main()
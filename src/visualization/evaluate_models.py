@@ -2,63 +2,148 @@
 Real Estate Price Prediction - Comparison of Multiple Models Evaluation Visualization
 
 This script produces a visualization of the evaluation of the performance
-of multiple models in predicting listing prices.
+of multiple models in predicting listing prices, either on a single train/test split or, with `--cv N`,
+as mean ± std over N cross-validation folds.
+
+Evaluation results are cached in `data/evaluation/model_evaluation_results.json`, keyed by a hash of the dataset, the
+evaluation setting and the model definitions (`multiple_models.py`), so redrawing the chart does not retrain the six
+models unless one of those changed. Use `--no-cache` to evaluate again anyway.
 
 Author: Vennise Ho
 Date: 2025-03-01
 Generated with assistance from ChatGPT (OpenAI)
 """
+import argparse
+import hashlib
+import json
 import os
+from typing import Optional
 
 import pandas as pd
 from matplotlib import pyplot as plt
-from src.models.multiple_models import train_and_evaluate_models
+from src.data_processing.storage import load_dataset
+from src.hashing import code_hash
+from src.models import multiple_models
+from src.models.model_artifact import data_hash
+from src.models.multiple_models import cross_validate_models, features, target, train_and_evaluate_models
+
+# Get the absolute path of the current script (app.py) and define the correct model path
+base_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(base_dir, "..", ".."))
+file_path = os.path.join(project_root, "data", "cleaned_real_estate_data_numerical.csv")
+output_dir = os.path.join(base_dir, 'visualization_images')
+cache_path = os.path.join(project_root, "data", "evaluation", "model_evaluation_results.json")
+
+
+def evaluation_key(df: pd.DataFrame, cv_folds: Optional[int] = None) -> str:
+    """
+    Hashes everything the evaluation results depend on: the feature and target data, the evaluation setting and the
+    source of the model definitions.
+
+    :param df: cleaned real estate data
+    :param cv_folds: number of cross-validation folds (None for the single split)
+    :return: hex digest
+    """
+    digest = hashlib.sha256()
+    digest.update(data_hash(df[features + [target]]).encode())
+    digest.update(json.dumps({"cv_folds": cv_folds}).encode())
+    digest.update(code_hash(multiple_models.__name__).encode())
+    return digest.hexdigest()
+
 
+def load_or_evaluate(file_path: str = file_path, cv_folds: Optional[int] = None, df: Optional[pd.DataFrame] = None,
+                     cache_path: str = cache_path, use_cache: bool = True) -> pd.DataFrame:
+    """
+    Returns the model evaluation results from the cache, evaluating the models only when the cached results are
+    missing or stale.
+
+    :param file_path: Path to the cleaned real estate dataset (CSV export or typed columnar dataset directory).
+    :param cv_folds: evaluate with this many cross-validation folds instead of a single split
+    :param df: the dataset, if already loaded (file_path is then not read)
+    :param cache_path: JSON file holding the cached results
+    :param use_cache: reuse cached results (the new results are cached either way)
+    :return: DataFrame of model performance metrics
+    """
+    if df is None:
+        df = load_dataset(file_path, columns=features + [target])
+    key = evaluation_key(df, cv_folds)
+
+    cache = {}
+    if os.path.exists(cache_path):
+        with open(cache_path, encoding="utf-8") as f:
+            cache = json.load(f)
+    if use_cache and key in cache:
+        print("Reusing cached model evaluation results.")
+        return pd.DataFrame(**cache[key]["results"])
+
+    if cv_folds:
+        results = cross_validate_models(file_path, n_splits=cv_folds, df=df)
+    else:
+        results = train_and_evaluate_models(file_path, df=df)
+
+    # One entry per evaluation setting; entries of older data or model definitions are dropped
+    cache = {cached_key: entry for cached_key, entry in cache.items() if entry.get("cv_folds") != cv_folds}
+    cache[key] = {"cv_folds": cv_folds, "results": results.to_dict(orient="split")}
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    with open(cache_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=2)
+    os.replace(cache_path + ".tmp", cache_path)
+    return results
 
-def plot_model_comparison(results_df: pd.DataFrame) -> None:
+
+def plot_model_comparison(results_df: pd.DataFrame, output_dir: str = output_dir) -> None:
     """
     Generates a visualization comparing model performance metrics.
 
     This function takes a DataFrame containing model evaluation results and creates
-    bar plots comparing the models based on their R² Score and Mean Absolute Error (MAE).
+    bar plots comparing the models based on their R² Score and Mean Absolute Error (MAE), with error bars when the
+    results hold cross-validation standard deviations ("R² Score Std" and "MAE Std" columns).
 
     :param results_df: DataFrame containing model performance metrics with "R² Score" and "MAE" columns.
     :type results_df: pd.DataFrame
-    :return: None (Displays the visualization)
+    :param output_dir: Directory where 'model_evaluation.png' is saved.
+    :return: None (Saves the visualization)
     """
     plt.figure(figsize=(10, 5))
     results_df.sort_values(by="R² Score", ascending=False, inplace=True)
 
     # Plot R² Scores
     plt.subplot(1, 2, 1)
-    results_df["R² Score"].plot(kind="bar", color="skyblue")
+    results_df["R² Score"].plot(kind="bar", color="skyblue", yerr=results_df.get("R² Score Std"), capsize=3)
     plt.title("R² Score Comparison")
     plt.xticks(rotation=45)
 
     # Plot Mean Absolute Error
     plt.subplot(1, 2, 2)
-    results_df["MAE"].plot(kind="bar", color="orange")
+    results_df["MAE"].plot(kind="bar", color="orange", yerr=results_df.get("MAE Std"), capsize=3)
     plt.title("Mean Absolute Error (MAE)")
     plt.xticks(rotation=45)
 
     plt.tight_layout()
-    plt.savefig(os.path.join(base_dir, 'visualization_images', 'model_evaluation'), dpi=300)
+    plt.savefig(os.path.join(output_dir, 'model_evaluation.png'), dpi=300)
+    plt.close()
 
 
 def save_scores_in_file(results_df: pd.DataFrame, output_dir: str) -> None:
     scores_file = os.path.join(output_dir, "model_evaluation_scores.txt")
-    with open(scores_file, "w") as f:
+    with open(scores_file, "w", encoding="utf-8") as f:
         f.write("Model Performance Evaluation Scores\n")
         f.write("==================================\n")
         f.write(results_df.to_string())
     print(f"Model evaluation scores saved at: {scores_file}")
 
 
-# Get the absolute path of the current script (app.py) and define the correct model path
-base_dir = os.path.dirname(os.path.abspath(__file__))
-project_root = os.path.abspath(os.path.join(base_dir, "..", ".."))
-file_path = os.path.join(project_root, "data", "cleaned_real_estate_data_numerical.csv")
+def main(file_path: str = file_path, output_dir: str = output_dir, cv_folds: Optional[int] = None,
+         use_cache: bool = True) -> None:
+    results = load_or_evaluate(file_path, cv_folds, use_cache=use_cache)
+    plot_model_comparison(results, output_dir)
+    save_scores_in_file(results, output_dir)
+
 
-results = train_and_evaluate_models(file_path)
-plot_model_comparison(results)
-save_scores_in_file(results, os.path.join(base_dir, 'visualization_images'))
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the candidate models.")
+    parser.add_argument("--cv", type=int, default=None, metavar="N",
+                        help="evaluate with N-fold cross-validation (mean ± std) instead of a single split")
+    parser.add_argument("--no-cache", action="store_true", help="evaluate the models even if cached results exist")
+    args = parser.parse_args()
+    main(cv_folds=args.cv, use_cache=not args.no_cache)
@@ -14,23 +14,46 @@ Date: 2025-03-01
 Generated with assistance from ChatGPT (OpenAI)
 """
 import os
-import pandas as pd
+
 import matplotlib.pyplot as plt
+import pandas as pd
 import seaborn as sns
 
+from src.data_processing.storage import load_dataset
+
 # Get the absolute path of the current script (app.py) and define the correct model path
 base_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(base_dir, "..", ".."))
 file_path = os.path.join(project_root, "data", "cleaned_real_estate_data_numerical.csv")
+output_path = os.path.join(base_dir, 'visualization_images', 'price_distribution.png')
+
+# Columns needed for the figure
+columns = ['listing_price']
+
+
+def plot_price_distribution(df: pd.DataFrame, output_path: str = output_path) -> None:
+    """
+    Plots a histogram (with KDE) of the listing prices and saves it.
+
+    :param df: cleaned real estate data with a 'listing_price' column
+    :param output_path: path of the image to write
+    """
+    # Price Distribution Histogram
+    plt.figure(figsize=(10, 6))
+    sns.histplot(df["listing_price"], bins=50, kde=True, color='skyblue')
+    plt.xlabel("Listing Price")
+    plt.ylabel("Frequency")
+    plt.title("Distribution of Listing Prices")
+    plt.savefig(output_path, dpi=300)
+    plt.close()
+
+
+def main(file_path: str = file_path, output_path: str = output_path) -> None:
+    # Load the cleaned dataset
+    df = load_dataset(file_path, columns=columns)
+    plot_price_distribution(df, output_path)
+    print("Figure created successfully! You can open 'price_distribution' to view it.")
+
 
-# Load the cleaned dataset
-df = pd.read_csv(file_path)
-
-# Price Distribution Histogram
-plt.figure(figsize=(10, 6))
-sns.histplot(df["listing_price"], bins=50, kde=True, color='skyblue')
-plt.xlabel("Listing Price")
-plt.ylabel("Frequency")
-plt.title("Distribution of Listing Prices")
-plt.savefig(os.path.join(base_dir, 'visualization_images', 'price_distribution'), dpi=300)
-print("Figure created successfully! You can open 'price_distribution' to view it.")
+if __name__ == "__main__":
+    main()
@@ -6,87 +6,289 @@ and distance to the subway. It uses data from the TTC. The visualization shows t
 no strong correlation between the two variables, therefore distance to the subway was not included
 in our model.
 
+Listings are drawn in one of several modes (`--mode`):
+- markers: one circle marker with its own popup per listing; the page grows with every listing
+- cluster: the listings as one compact array of numbers, clustered and drawn in the browser (FastMarkerCluster),
+  with popups built only when opened
+- grid: listings aggregated into square cells (count, median price, mean subway distance), with coarser cells when
+  zoomed out; the page size depends on the area covered, not on the number of listings
+- auto (default): markers for small datasets, cluster up to 200,000 listings, grid beyond
+
+Usage:
+    python -m src.visualization.real_estate_with_distance [--mode {auto,markers,cluster,grid}]
+
 Author: Lillian Toe
 Date: 2025-03-01
 Generated with assistance from ChatGPT (OpenAI)
 """
+import argparse
 import os
 import pandas as pd
 import geopandas as gpd
 import folium
-from shapely.geometry import Point, LineString
+import numpy as np
+from branca.element import MacroElement, Template
+from folium.plugins import FastMarkerCluster
+from shapely.geometry import LineString
+
+from src.data_processing.storage import load_dataset
 
 # Get the absolute path of the current script (app.py) and define the correct model path
 base_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(base_dir, "..", ".."))
 real_estate_file_path = os.path.join(project_root, "data", "real_estate_data_with_subway_distance.csv")
+subway_file_path = os.path.join(project_root, "data", "DMTI2012_Subway.shp")
+output_path = os.path.join(base_dir, 'visualization_images', 'real_estate_subway_map.html')
 
-# Load real estate data
-real_estate_df = pd.read_csv(real_estate_file_path)
+# Columns needed for the map
+columns = ['listing_price', 'size_group', 'num_beds', 'num_baths', 'distance_to_subway', 'latitude', 'longitude']
+
+# Price ranges of the marker colors: green below LOW_PRICE, orange below HIGH_PRICE, red above
+LOW_PRICE = 500000
+HIGH_PRICE = 1000000
+
+MAP_MODES = ["auto", "markers", "cluster", "grid"]
+
+# Largest number of listings drawn with one marker each ("markers") or clustered in the browser ("cluster") when the
+# mode is "auto"; larger datasets are drawn as aggregated grid cells
+MAX_MARKERS = 5000
+MAX_CLUSTERED = 200000
+
+# Grid cells of the "grid" mode: (cell size in degrees, lowest zoom level, highest zoom level)
+GRID_LEVELS = [(0.04, 0, 11), (0.01, 12, 13), (0.0025, 14, 18)]
+
+# Draws a clustered listing from its compact row [lat, lng, price, size group, beds, baths, distance]; the popup is
+# built only when it is opened
+CLUSTER_CALLBACK = f"""
+function (row) {{
+    var price = row[2];
+    var color = price < {LOW_PRICE} ? 'green' : (price < {HIGH_PRICE} ? 'orange' : 'red');
+    var marker = L.circleMarker(new L.LatLng(row[0], row[1]),
+                                {{radius: 3, color: color, fill: true, fillColor: color, fillOpacity: 0.6}});
+    marker.bindPopup(function () {{
+        return 'Listing_Price: $' + price.toLocaleString() + '<br>Size: ' + row[3] + ' sqft<br>Beds: ' + row[4]
+               + '<br>Baths: ' + row[5] + '<br>Distance to TTC: ' + row[6] + 'm';
+    }});
+    return marker;
+}}
+"""
+
+
+class ZoomLevels(MacroElement):
+    """
+    Shows each layer only between its zoom levels.
+
+    :param levels: list of (layer, lowest zoom level, highest zoom level)
+    """
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function () {
+            var map = {{ this._parent.get_name() }};
+            var levels = [{% for layer, min_zoom, max_zoom in this.levels %}
+                [{{ layer.get_name() }}, {{ min_zoom }}, {{ max_zoom }}],{% endfor %}
+            ];
+            function update() {
+                var zoom = map.getZoom();
+                levels.forEach(function (level) {
+                    if (zoom >= level[1] && zoom <= level[2]) { map.addLayer(level[0]); }
+                    else { map.removeLayer(level[0]); }
+                });
+            }
+            map.on('zoomend', update);
+            update();
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, levels: list):
+        super().__init__()
+        self._name = "ZoomLevels"
+        self.levels = levels
+
+
+def price_color(price: float) -> str:
+    """
+    :return: marker color of a listing price
+    """
+    if price < LOW_PRICE:
+        return 'green'
+    elif LOW_PRICE <= price < HIGH_PRICE:
+        return 'orange'
+    return 'red'
 
-# Get the absolute path of the current script (app.py) and define the correct model path
-base_dir = os.path.dirname(os.path.abspath(__file__))
-project_root = os.path.abspath(os.path.join(base_dir, "..", ".."))
-subway_file_path = os.path.join(project_root, "data", "DMTI2012_Subway.shp")
 
-# Load subway station data
-subway_stations_gdf = gpd.read_file(subway_file_path)
+def add_subway_lines(toronto_map: folium.Map, subway_stations_gdf: gpd.GeoDataFrame) -> None:
+    """
+    Draws the subway lines by connecting their stations.
 
-# Convert real estate data into a GeoDataFrame
-real_estate_gdf = gpd.GeoDataFrame(real_estate_df,
-                                   geometry=gpd.points_from_xy(real_estate_df.longitude, real_estate_df.latitude))
+    :param toronto_map: the folium map
+    :param subway_stations_gdf: TTC subway data
+    """
+    subway_stations_gdf = subway_stations_gdf[subway_stations_gdf.geometry.type == "Point"]
 
-# **Filter only Point geometries**
-real_estate_gdf = real_estate_gdf[real_estate_gdf.geometry.type == "Point"]
-subway_stations_gdf = subway_stations_gdf[subway_stations_gdf.geometry.type == "Point"]
+    # Assuming 'LINE' column in subway data indicates which subway line a station belongs to
+    if 'LINE' in subway_stations_gdf.columns:
+        grouped_lines = subway_stations_gdf.groupby('LINE')
 
-# Define the Toronto map
-toronto_map = folium.Map(location=[43.7, -79.4], zoom_start=12)
+        for line, stations in grouped_lines:
+            # Sort stations based on approximate order (you may need a better sorting method if available)
+            stations = stations.sort_values(by='geometry', key=lambda g: g.y)
 
-# **Step 1: Draw subway lines by connecting stations**
-# Assuming 'LINE' column in subway data indicates which subway line a station belongs to
-if 'LINE' in subway_stations_gdf.columns:
-    grouped_lines = subway_stations_gdf.groupby('LINE')
+            # Create a LineString from station points
+            line_geom = LineString(stations.geometry.tolist())
 
-    for line, stations in grouped_lines:
-        # Sort stations based on approximate order (you may need a better sorting method if available)
-        stations = stations.sort_values(by='geometry', key=lambda g: g.y)
+            # Add to folium map
+            folium.PolyLine(locations=[(point.y, point.x) for point in line_geom.coords],
+                            color="red", weight=5, opacity=0.8).add_to(toronto_map)
 
-        # Create a LineString from station points
-        line_geom = LineString(stations.geometry.tolist())
 
-        # Convert to GeoDataFrame
-        line_gdf = gpd.GeoDataFrame(geometry=[line_geom])
+def add_listing_markers(toronto_map: folium.Map, real_estate_df: pd.DataFrame) -> None:
+    """
+    Adds one marker, with its own popup, per listing (for small datasets: the page grows with every listing).
+    """
+    # Convert real estate data into a GeoDataFrame
+    real_estate_gdf = gpd.GeoDataFrame(real_estate_df,
+                                       geometry=gpd.points_from_xy(real_estate_df.longitude, real_estate_df.latitude))
 
-        # Add to folium map
-        folium.PolyLine(locations=[(point.y, point.x) for point in line_geom.coords],
-                        color="red", weight=5, opacity=0.8).add_to(toronto_map)
+    # **Filter only Point geometries**
+    real_estate_gdf = real_estate_gdf[real_estate_gdf.geometry.type == "Point"]
 
-# **Step 2: Add real estate properties to the map**
-for _, row in real_estate_gdf.iterrows():
-    price = row['listing_price']
+    for _, row in real_estate_gdf.iterrows():
+        price = row['listing_price']
+        color = price_color(price)
 
-    # Assign color based on price range
-    if price < 500000:
-        color = 'green'
-    elif 500000 <= price < 1000000:
-        color = 'orange'
+        folium.CircleMarker(
+            location=[row.geometry.y, row.geometry.x],
+            radius=3,  # Keeping it small to prevent overlaps
+            color=color,
+            fill=True,
+            fill_color=color,
+            fill_opacity=0.6,
+            popup=f"Listing_Price: ${price:,.0f}\nSize: {row['size_group']} sqft\nBeds: {row['num_beds']}\n"
+                  f"Baths: {row['num_baths']}\nDistance to TTC: {row['distance_to_subway']}m",
+        ).add_to(toronto_map)
+
+
+def add_listing_clusters(toronto_map: folium.Map, real_estate_df: pd.DataFrame) -> None:
+    """
+    Adds the listings as one compact array, clustered and drawn in the browser (FastMarkerCluster): each listing
+    costs one short row of numbers in the page instead of a marker object with its own popup.
+    """
+    listings = real_estate_df.dropna(subset=['latitude', 'longitude'])
+    rows = pd.DataFrame({
+        'latitude': listings['latitude'].round(5), 'longitude': listings['longitude'].round(5),
+        'listing_price': listings['listing_price'].round(), 'size_group': listings['size_group'],
+        'num_beds': listings['num_beds'], 'num_baths': listings['num_baths'],
+        'distance_to_subway': listings['distance_to_subway'].round(),
+    }).astype('float64')
+    FastMarkerCluster(rows.to_numpy().tolist(), callback=CLUSTER_CALLBACK, name="Listings").add_to(toronto_map)
+
+
+def aggregate_cells(real_estate_df: pd.DataFrame, cell_size: float) -> pd.DataFrame:
+    """
+    Aggregates the listings into square grid cells.
+
+    :param real_estate_df: real estate data with subway distances
+    :param cell_size: cell side (degrees)
+    :return: one row per non-empty cell: south-west corner, number of listings, median price and mean subway distance
+    """
+    listings = real_estate_df.dropna(subset=['latitude', 'longitude'])
+    cells = pd.DataFrame({'row': np.floor(listings['latitude'].to_numpy() / cell_size).astype(np.int64),
+                          'column': np.floor(listings['longitude'].to_numpy() / cell_size).astype(np.int64),
+                          'listing_price': listings['listing_price'].to_numpy(),
+                          'distance_to_subway': listings['distance_to_subway'].to_numpy()})
+    cells = cells.groupby(['row', 'column']).agg(listings=('listing_price', 'size'),
+                                                  median_price=('listing_price', 'median'),
+                                                  mean_distance=('distance_to_subway', 'mean')).reset_index()
+    cells['south'] = cells['row'] * cell_size
+    cells['west'] = cells['column'] * cell_size
+    return cells
+
+
+def add_listing_grid(toronto_map: folium.Map, real_estate_df: pd.DataFrame, levels: list = GRID_LEVELS) -> None:
+    """
+    Adds the listings as pre-aggregated grid cells, one grid per zoom range (coarser cells when zoomed out). The
+    number of cells depends on the area covered and the cell sizes, not on the number of listings.
+    """
+    layers = []
+    for cell_size, min_zoom, max_zoom in levels:
+        cells = aggregate_cells(real_estate_df, cell_size)
+        features = [
+            {"type": "Feature",
+             "geometry": {"type": "Polygon",
+                          "coordinates": [[[west, south], [west + cell_size, south],
+                                           [west + cell_size, south + cell_size], [west, south + cell_size],
+                                           [west, south]]]},
+             "properties": {"listings": int(count), "median_price": f"${price:,.0f}",
+                            "mean_distance": f"{distance:,.0f}m", "color": price_color(price)}}
+            for south, west, count, price, distance in zip(cells['south'].round(6), cells['west'].round(6),
+                                                           cells['listings'], cells['median_price'],
+                                                           cells['mean_distance'])
+        ]
+        layer = folium.FeatureGroup(name=f"Listings ({cell_size:g}° cells)")
+        folium.GeoJson(
+            {"type": "FeatureCollection", "features": features},
+            style_function=lambda feature: {"color": feature["properties"]["color"], "weight": 1,
+                                            "fillColor": feature["properties"]["color"], "fillOpacity": 0.5},
+            tooltip=folium.GeoJsonTooltip(fields=["listings", "median_price", "mean_distance"],
+                                          aliases=["Listings", "Median price", "Mean distance to TTC"]),
+        ).add_to(layer)
+        layer.add_to(toronto_map)
+        layers.append((layer, min_zoom, max_zoom))
+    ZoomLevels(layers).add_to(toronto_map)
+
+
+def build_subway_map(real_estate_df: pd.DataFrame, subway_stations_gdf: gpd.GeoDataFrame,
+                     mode: str = "auto") -> folium.Map:
+    """
+    Builds a map of Toronto with the subway lines and the real estate listings, colored by price range.
+
+    :param real_estate_df: real estate data with subway distances
+    :param subway_stations_gdf: TTC subway data
+    :param mode: how listings are drawn: "markers" (one marker per listing), "cluster" (compact array clustered in the
+                 browser), "grid" (pre-aggregated cells per zoom range, bounded size) or "auto" (by listing count)
+    :return: the folium map
+    """
+    if mode == "auto":
+        mode = ("markers" if len(real_estate_df) <= MAX_MARKERS
+                else "cluster" if len(real_estate_df) <= MAX_CLUSTERED else "grid")
+
+    # Define the Toronto map
+    toronto_map = folium.Map(location=[43.7, -79.4], zoom_start=12)
+
+    # **Step 1: Draw subway lines by connecting stations**
+    add_subway_lines(toronto_map, subway_stations_gdf)
+
+    # **Step 2: Add real estate properties to the map**
+    if mode == "markers":
+        add_listing_markers(toronto_map, real_estate_df)
+    elif mode == "cluster":
+        add_listing_clusters(toronto_map, real_estate_df)
+    elif mode == "grid":
+        add_listing_grid(toronto_map, real_estate_df)
     else:
-        color = 'red'
-
-    folium.CircleMarker(
-        location=[row.geometry.y, row.geometry.x],
-        radius=3,  # Keeping it small to prevent overlaps
-        color=color,
-        fill=True,
-        fill_color=color,
-        fill_opacity=0.6,
-        popup=f"Listing_Price: ${price:,.0f}\nSize: {row['size_group']} sqft\nBeds: {row['num_beds']}\n"
-              f"Baths: {row['num_baths']}\nDistance to TTC: {row['distance_to_subway']}m",
-    ).add_to(toronto_map)
-
-# Save map as HTML file
-toronto_map.save(os.path.join(base_dir, 'visualization_images', 'real_estate_subway_map.html'))
-
-# Display message
-print("Map created successfully! You can open 'real_estate_subway_map.html' to view it.")
+        raise ValueError(f"Unknown map mode: {mode!r} (expected one of {', '.join(MAP_MODES)})")
+
+    return toronto_map
+
+
+def main(real_estate_file_path: str = real_estate_file_path, subway_file_path: str = subway_file_path,
+         output_path: str = output_path, mode: str = "auto") -> None:
+    # Load real estate data and subway station data
+    real_estate_df = load_dataset(real_estate_file_path, columns=columns)
+    subway_stations_gdf = gpd.read_file(subway_file_path)
+
+    # Save map as HTML file
+    build_subway_map(real_estate_df, subway_stations_gdf, mode).save(output_path)
+
+    # Display message
+    print("Map created successfully! You can open 'real_estate_subway_map.html' to view it.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Map the real estate listings and the subway lines.")
+    parser.add_argument("--mode", default="auto", choices=MAP_MODES,
+                        help="markers (one per listing), cluster (clustered in the browser), grid (aggregated "
+                             "cells, bounded size) or auto (by the number of listings)")
+    args = parser.parse_args()
+    main(mode=args.mode)
@@ -0,0 +1,214 @@
+"""
+Render All Visualizations
+
+Every visualization script re-reads the cleaned dataset to draw a single figure, and the model comparison retrains
+all six models to draw its bar chart. This script renders all of these figures in one run and does only the work
+whose inputs changed.
+
+Steps:
+1. Load the cleaned dataset once, with every column the figures need.
+2. Get the model evaluation results from the evaluation cache (see evaluate_models.py); the models are trained only
+   if the data or the model definitions changed since the results were cached.
+3. Hash each figure's input (its columns of the data, or the evaluation results) together with its plotting
+   parameters (the source of the module drawing it, the plotting function and the output path). A figure whose hash
+   matches its last render, and whose image has not been changed since, is skipped.
+4. Render the remaining figures in parallel worker processes, with the non-interactive Agg backend. Each worker
+   receives only the columns its figure needs.
+5. Record the hashes of the rendered figures in `data/.render_cache.json`.
+
+The subway map (real_estate_with_distance.py) is an interactive HTML map of another dataset, not a matplotlib
+figure, and is still built by its own script.
+
+Usage:
+    python -m src.visualization.render_all [--force] [--workers N] [--cv N]
+"""
+import argparse
+import hashlib
+import importlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+import matplotlib
+
+# Render without a display, in this process and in the workers it starts
+matplotlib.use("Agg")
+
+import pandas as pd  # noqa: E402
+
+from src.data_processing.storage import load_dataset  # noqa: E402
+from src.hashing import code_hash, output_signature  # noqa: E402
+from src.models.model_artifact import data_hash  # noqa: E402
+from src.visualization import evaluate_models  # noqa: E402
+
+# Get the absolute path of the current script (app.py) and define the correct model path
+base_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(base_dir, "..", ".."))
+file_path = os.path.join(project_root, "data", "cleaned_real_estate_data_numerical.csv")
+output_dir = os.path.join(base_dir, "visualization_images")
+cache_path = os.path.join(project_root, "data", ".render_cache.json")
+
+# Input of the model comparison figure: the evaluation results instead of columns of the data
+EVALUATION = "evaluation"
+
+
+@dataclass
+class Figure:
+    """
+    One figure rendered by render_all.
+
+    :param name: unique figure name
+    :param target: plotting function, as 'package.module:function', called with (input, output path)
+    :param image: image file name in the output directory
+    :param columns: columns of the dataset the figure needs (all columns if None), or EVALUATION
+    """
+    name: str
+    target: str
+    image: str
+    columns: object = None
+
+
+FIGURES = [
+    Figure("baths_price_variation", "src.visualization.baths_price_variation:plot_baths_price_variation",
+           "baths_price_variation.png", ["num_baths", "listing_price"]),
+    Figure("bedrooms_price_variation", "src.visualization.bedrooms_price_variation:plot_bedrooms_price_variation",
+           "bedrooms_price_variation.png", ["num_beds", "listing_price"]),
+    Figure("correlation_matrix", "src.visualization.correlation_matrix:plot_correlation_matrix",
+           "correlation_matrix.png"),
+    Figure("maintenance_price_variation",
+           "src.visualization.maintenance_price_variation:plot_maintenance_price_variation",
+           "maintenance_price_variation.png", ["monthly_maintenance_fee", "listing_price"]),
+    Figure("price_distribution", "src.visualization.price_distribution:plot_price_distribution",
+           "price_distribution.png", ["listing_price"]),
+    Figure("size_price_variation", "src.visualization.size_price_variation:plot_size_price_variation",
+           "size_price_variation.png", ["size_group", "listing_price"]),
+    Figure("ward_price_variation", "src.visualization.ward_price_variation:plot_ward_price_variation",
+           "wards_price_variation.png", ["ward_num", "listing_price"]),
+    Figure("model_evaluation", "src.visualization.render_all:plot_model_evaluation", "model_evaluation.png",
+           EVALUATION),
+]
+
+
+def plot_model_evaluation(results: pd.DataFrame, output_path: str) -> None:
+    """
+    Draws the model comparison chart and writes the evaluation scores next to it.
+
+    :param results: model evaluation results (see evaluate_models.load_or_evaluate)
+    :param output_path: path of the chart; the scores file is written in the same directory
+    """
+    evaluate_models.plot_model_comparison(results, os.path.dirname(output_path))
+    evaluate_models.save_scores_in_file(results, os.path.dirname(output_path))
+
+
+def figure_outputs(figure: Figure, output_dir: str) -> list:
+    """
+    :return: the files written when the figure is rendered
+    """
+    outputs = [os.path.join(output_dir, figure.image)]
+    if figure.columns == EVALUATION:
+        outputs.append(os.path.join(output_dir, "model_evaluation_scores.txt"))
+    return outputs
+
+
+def figure_hash(figure: Figure, data: pd.DataFrame, output_path: str) -> str:
+    """
+    Hashes the input data of a figure, its plotting parameters and the source of its plotting code (the module and the
+    `src` modules it imports).
+
+    :param figure: figure
+    :param data: the input passed to its plotting function
+    :param output_path: path of the image
+    :return: hex digest
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps([figure.target, output_path]).encode())
+    digest.update(code_hash(figure.target.split(":")[0]).encode())
+    digest.update(data_hash(data.reset_index()).encode())
+    return digest.hexdigest()
+
+
+def render_figure(target: str, data: pd.DataFrame, output_path: str) -> None:
+    # Runs in a worker process (or in this process with a single worker)
+    module_name, function_name = target.split(":")
+    getattr(importlib.import_module(module_name), function_name)(data, output_path)
+
+
+def _init_worker() -> None:
+    matplotlib.use("Agg")
+
+
+def render_all(file_path: str = file_path, output_dir: str = output_dir, force: bool = False,
+               max_workers: Optional[int] = None, cv_folds: Optional[int] = None,
+               cache_path: str = cache_path) -> dict:
+    """
+    Renders every figure whose input data or plotting parameters changed since it was last rendered.
+
+    :param file_path: Path to the cleaned real estate dataset (CSV export or typed columnar dataset directory).
+    :param output_dir: directory the images are written to
+    :param force: render every figure, even if it is up to date
+    :param max_workers: number of figures rendered at the same time (the number of cores if None)
+    :param cv_folds: draw the model comparison from cross-validation results with this many folds
+    :param cache_path: JSON file recording the hash of each rendered figure
+    :return: mapping of figure name to 'skipped' or 'rendered'
+    """
+    # Load the dataset once for every figure
+    df = load_dataset(file_path)
+    evaluation = evaluate_models.load_or_evaluate(file_path, cv_folds, df=df)
+
+    cache = {}
+    if os.path.exists(cache_path):
+        with open(cache_path, encoding="utf-8") as f:
+            cache = json.load(f)
+
+    os.makedirs(output_dir, exist_ok=True)
+    status, pending = {}, []
+    for figure in FIGURES:
+        data = evaluation if figure.columns == EVALUATION else df if figure.columns is None else df[figure.columns]
+        outputs = figure_outputs(figure, output_dir)
+        key = figure_hash(figure, data, outputs[0])
+        cached = cache.get(figure.name, {})
+        if not force and cached.get("key") == key and cached.get("outputs") == output_signature(outputs):
+            status[figure.name] = "skipped"
+            print(f"[render_all] {figure.name}: up to date")
+        else:
+            pending.append((figure, data, outputs, key))
+
+    max_workers = min(max_workers or os.cpu_count() or 1, max(len(pending), 1))
+    if max_workers == 1:
+        for figure, data, outputs, _ in pending:
+            render_figure(figure.target, data, outputs[0])
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as executor:
+            futures = [executor.submit(render_figure, figure.target, data, outputs[0])
+                       for figure, data, outputs, _ in pending]
+            for future in futures:
+                future.result()
+
+    for figure, _, outputs, key in pending:
+        status[figure.name] = "rendered"
+        cache[figure.name] = {"key": key, "outputs": output_signature(outputs)}
+        print(f"[render_all] {figure.name}: rendered")
+
+    with open(cache_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(cache_path + ".tmp", cache_path)
+    return status
+
+
+def main(file_path: str = file_path, output_dir: str = output_dir, force: bool = False,
+         max_workers: Optional[int] = None, cv_folds: Optional[int] = None) -> None:
+    status = render_all(file_path, output_dir, force, max_workers, cv_folds)
+    rendered = sum(value == "rendered" for value in status.values())
+    print(f"{rendered} figure(s) rendered, {len(status) - rendered} up to date, in: {output_dir}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render every visualization from one load of the dataset.")
+    parser.add_argument("--force", action="store_true", help="render every figure, even if it is up to date")
+    parser.add_argument("--workers", type=int, default=None, help="number of figures rendered at the same time")
+    parser.add_argument("--cv", type=int, default=None, metavar="N",
+                        help="draw the model comparison from N-fold cross-validation results")
+    args = parser.parse_args()
+    main(force=args.force, max_workers=args.workers, cv_folds=args.cv)
@@ -9,20 +9,30 @@ Date: 2025-03-01
 Generated with assistance from ChatGPT (OpenAI)
 """
 import os
-import pandas as pd
+
 import matplotlib.pyplot as plt
+import pandas as pd
 import seaborn as sns
 
+from src.data_processing.storage import load_dataset
+
 # Get the absolute path of the current script (app.py) and define the correct model path
 base_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(base_dir, "..", ".."))
 file_path = os.path.join(project_root, "data", "cleaned_real_estate_data_numerical.csv")
+output_path = os.path.join(base_dir, 'visualization_images', 'size_price_variation.png')
+
+# Columns needed for the figure
+columns = ['size_group', 'listing_price']
 
-# Load the dataset from the correct location
-df = pd.read_csv(file_path)
 
-# Ensure 'size_group' and 'listing_price' exist before analysis
-if 'size_group' in df.columns and 'listing_price' in df.columns:
+def plot_size_price_variation(df: pd.DataFrame, output_path: str = output_path) -> None:
+    """
+    Creates a boxplot (with whiskers and outliers) of listing prices by property size group and saves it.
+
+    :param df: cleaned real estate data with 'size_group' and 'listing_price' columns
+    :param output_path: path of the image to write
+    """
     plt.figure(figsize=(12, 6))
 
     # Create a boxplot of price by property size group (whiskers + outliers)
@@ -34,7 +44,16 @@ if 'size_group' in df.columns and 'listing_price' in df.columns:
     plt.title("Price Variations by Property Size Group")
 
     # Save plot
-    plt.savefig(os.path.join(base_dir, 'visualization_images', 'maintenance_price_variation'), dpi=300)
-    print("Figure created successfully! You can open 'maintenance_price_variation' to view it.")
-else:
-    print("Error: 'size_group' or 'listing_price' column not found in the dataset.")
+    plt.savefig(output_path, dpi=300)
+    plt.close()
+
+
+def main(file_path: str = file_path, output_path: str = output_path) -> None:
+    # Load the dataset from the correct location
+    df = load_dataset(file_path, columns=columns)
+    plot_size_price_variation(df, output_path)
+    print("Figure created successfully! You can open 'size_price_variation' to view it.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import os
+
+import pandas as pd
+
+from src.data_processing.cleaning_engine import clean_file
+from src.data_processing.incremental_ingest import ingest_new_listings, load_state
+
+HEADER = "id_,ward,beds,baths,DEN,size,parking,exposure,D_mkt,building_age,maint,price,lt,lg\n"
+ROWS = [
+    "219129,W13,3,3,No,1500-1999 sqft,N,No,16,9,1087,1821000,43.61799707222609,-79.3923829334807\n",
+    "757581,W13,1,1,YES,500-999 sqft,Yes,We,23,3,469,613000,43.64896846286158,-79.39003091322324\n",
+]
+NO_ID_ROW = ",W10,2,2,No,800-899 sqft,Yes,South,5,4,600,700000,43.65,-79.38\n"
+REPEATED_ROW = "757581,W13,1,1,YES,500-999 sqft,Yes,We,30,3,469,599000,43.64896846286158,-79.39003091322324\n"
+
+
+def _ingest(tmp_path, lines):
+    raw_path = tmp_path / "raw.csv"
+    raw_path.write_text(HEADER + "".join(lines))
+    outputs = {name: str(tmp_path / f"{name}.csv") for name in ("cleaned", "numerical", "subway")}
+    summary = ingest_new_listings(str(raw_path), outputs["cleaned"], outputs["numerical"], outputs["subway"],
+                                  directory=str(tmp_path / "state"))
+    return summary, outputs
+
+
+def test_rows_without_id_are_dropped_and_the_watermark_saved(tmp_path):
+    summary, outputs = _ingest(tmp_path, ROWS + [NO_ID_ROW])
+
+    assert summary["rows_appended"] == 2
+    assert pd.read_csv(outputs["numerical"])["id"].tolist() == [219129, 757581]
+    assert load_state(str(tmp_path / "state"))["byte_offset"] > 0
+
+    # The next run starts after the row without an id instead of failing on it again
+    summary, outputs = _ingest(tmp_path, ROWS + [NO_ID_ROW, REPEATED_ROW])
+    assert summary == {"rows_read": 1, "rows_appended": 1, "rows_changed": 1}
+
+
+def test_first_run_matches_the_full_clean(tmp_path):
+    lines = ROWS + [NO_ID_ROW, REPEATED_ROW]
+    _, outputs = _ingest(tmp_path, lines)
+
+    expected_path = tmp_path / "full_clean.csv"
+    clean_file(str(tmp_path / "raw.csv"), str(expected_path), numerical=True)
+    pd.testing.assert_frame_equal(pd.read_csv(outputs["numerical"]), pd.read_csv(expected_path))
+
+
+def test_saved_empty_state_is_not_a_first_run(tmp_path):
+    _ingest(tmp_path, [NO_ID_ROW])
+    assert os.path.exists(tmp_path / "state" / "watermark.json")
+    assert len(load_state(str(tmp_path / "state"))["ids"]) == 0
+
+    # Outputs written since (here by a full clean) are appended to, not rebuilt
+    earlier_path = tmp_path / "earlier.csv"
+    earlier_path.write_text(HEADER + ROWS[0])
+    clean_file(str(earlier_path), str(tmp_path / "numerical.csv"), numerical=True)
+    _ingest(tmp_path, [NO_ID_ROW, ROWS[1]])
+    assert pd.read_csv(tmp_path / "numerical.csv")["id"].tolist() == [219129, 757581]